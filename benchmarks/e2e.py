@@ -0,0 +1,527 @@
+"""
+End-to-end replay of main.main() with local stand-ins for Twitch, yt-dlp and
+YouTube, so whole-pipeline throughput can be measured offline.
+
+    python -m benchmarks.e2e --jobs 6 --length 300
+    python -m benchmarks.e2e --jobs 4 --mode clips --no-subtitles
+    python -m benchmarks.e2e --recording my_helix.json   # replay captured responses
+    python -m benchmarks.e2e --jobs 6 --broadcasters 6 --nodes 3   # sharded workers
+
+- Helix: a local HTTP server replays recorded responses (users, videos,
+  games, clips, streams) to the real TwitchClient via TWITCH_HELIX_URL.
+  Without --recording, one is generated for the synthetic inputs.
+- yt-dlp: downloads are replaced by copying synthetic media into vod_dir
+  under the real file naming, so the download cache paths are exercised.
+- YouTube: upload_video streams the rendered file to the same server.
+
+Everything else (analysis, dedup, render, subtitles) is the real code, run
+in an isolated cache directory. Per-stage latency comes from the metrics
+spans each job writes.
+
+With --nodes N, N worker processes run concurrently as shard nodes
+(SHARD_NODE_ID 0..N-1) against the same services and cache root, each
+taking its share of --jobs.
+"""
+
+import argparse
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional
+from urllib.parse import parse_qs, urlparse
+
+from src.sharding import owned_broadcasters
+from src.utils import read_json, safe_filename, sha1, utc_ts, write_json
+
+from .synth import SyntheticMedia, make_overlay_png, make_synthetic_vod
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_BASELINE = os.path.join(BENCH_DIR, "e2e_baseline.json")
+
+
+def _user_id(b: int) -> str:
+    return str(900000 + b)
+
+
+def _broadcasters_for(broadcasters: int, nodes: int) -> int:
+    """
+    Fewest synthetic broadcasters (at least the requested count) that leave
+    no shard node idle; with fewer ids than nodes some node would own none.
+    """
+    n = max(broadcasters, nodes, 1)
+    while nodes > 1:
+        ids = [_user_id(b) for b in range(n)]
+        if all(owned_broadcasters(ids, k, nodes) for k in range(nodes)):
+            break
+        n += 1
+    return n
+
+
+def make_recording(
+    broadcasters: int, vods_per: int, media: List[SyntheticMedia]
+) -> Dict[str, Any]:
+    """
+    Helix responses shaped like the real API for synthetic broadcasters.
+    Video ids map to media by index (media_index) for the fake downloader.
+    """
+    now = datetime.now(timezone.utc)
+    rec: Dict[str, Any] = {"users": {}, "videos": {}, "clips": {}, "games": {}}
+    rec["games"]["509658"] = {"id": "509658", "name": "Just Chatting"}
+    n = 0
+    for b in range(broadcasters):
+        uid = _user_id(b)
+        rec["users"][uid] = {
+            "id": uid,
+            "login": f"bench_streamer_{b}",
+            "display_name": f"BenchStreamer{b}",
+        }
+        videos, clips = [], []
+        for v in range(vods_per):
+            m = media[n % len(media)]
+            vid = str(2000000000 + n)
+            created = (now - timedelta(hours=v * 24 + 1)).strftime("%Y-%m-%dT%H:%M:%SZ")
+            videos.append(
+                {
+                    "id": vid,
+                    "user_id": uid,
+                    "title": f"Synthetic stream {n}",
+                    "url": f"https://www.twitch.tv/videos/{vid}",
+                    "created_at": created,
+                    "duration": f"{int(m.duration_sec) // 60}m{int(m.duration_sec) % 60}s",
+                    "type": "archive",
+                    "game_id": "509658",
+                    "media_index": n % len(media),
+                }
+            )
+            a, _ = m.bursts[0] if m.bursts else (0.0, 0.0)
+            clips.append(
+                {
+                    "id": f"BenchClip{n}",
+                    "url": f"https://clips.twitch.tv/BenchClip{n}",
+                    "broadcaster_id": uid,
+                    "video_id": vid,
+                    "vod_offset": int(a),
+                    "title": f"Synthetic clip {n}",
+                    "view_count": 1000 - n,
+                    "created_at": created,
+                    "duration": 30.0,
+                    "game_name": "Just Chatting",
+                    "media_index": n % len(media),
+                }
+            )
+            n += 1
+        rec["videos"][uid] = videos
+        rec["clips"][uid] = clips
+    return rec
+
+
+class FakeServices:
+    """
+    One local HTTP server standing in for id.twitch.tv, the Helix API and the
+    YouTube upload endpoint.
+    """
+
+    def __init__(self, recording: Dict[str, Any]) -> None:
+        self.recording = recording
+        self.uploads = 0
+        self.upload_bytes = 0
+        self._lock = threading.Lock()
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}"
+
+    def start(self) -> "FakeServices":
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self) -> None:
+        self.server.shutdown()
+
+    def _helix(self, path: str, q: Dict[str, List[str]]) -> List[Dict[str, Any]]:
+        rec = self.recording
+        first = int(q.get("first", ["20"])[0])
+        if path == "users":
+            return [rec["users"][i] for i in q.get("id", []) if i in rec["users"]]
+        if path == "videos":
+            return rec["videos"].get(q.get("user_id", [""])[0], [])[:first]
+        if path == "clips":
+            return rec["clips"].get(q.get("broadcaster_id", [""])[0], [])[:first]
+        if path == "games":
+            return [rec["games"][i] for i in q.get("id", []) if i in rec["games"]]
+        return []  # streams: nobody is live
+
+    def _handler(self) -> type:
+        svc = self
+
+        class _Handler(BaseHTTPRequestHandler):
+            def do_GET(self) -> None:  # noqa: N802
+                u = urlparse(self.path)
+                if not u.path.startswith("/helix/"):
+                    self._json(404, {})
+                    return
+                data = svc._helix(u.path[len("/helix/") :], parse_qs(u.query))
+                self._json(200, {"data": data})
+
+            def do_POST(self) -> None:  # noqa: N802
+                length = int(self.headers.get("Content-Length") or 0)
+                if self.path.startswith("/oauth2/token"):
+                    self.rfile.read(length)
+                    self._json(200, {"access_token": "bench", "expires_in": 3600})
+                elif self.path.startswith("/upload"):
+                    got = 0
+                    while got < length:
+                        chunk = self.rfile.read(min(1 << 20, length - got))
+                        if not chunk:
+                            break
+                        got += len(chunk)
+                    with svc._lock:
+                        svc.uploads += 1
+                        svc.upload_bytes += got
+                        vid = f"bench{svc.uploads:05d}"
+                    self._json(200, {"id": vid})
+                else:
+                    self._json(404, {})
+
+            def _json(self, code: int, body: Dict[str, Any]) -> None:
+                data = json.dumps(body).encode("utf-8")
+                self.send_response(code)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, format: str, *args: Any) -> None:
+                return
+
+        return _Handler
+
+
+def _install_fakes(
+    main_mod: Any, services: FakeServices, media: List[SyntheticMedia]
+) -> None:
+    """
+    Swap the network-bound calls main uses for local stand-ins.
+    """
+    import requests
+
+    from src import downloader
+    from src.downloader import DownloadResult
+    from src.metrics import annotate, timed
+
+    by_url: Dict[str, Dict[str, Any]] = {}
+    for items in list(services.recording["videos"].values()) + list(
+        services.recording["clips"].values()
+    ):
+        for it in items:
+            by_url[it["url"]] = it
+
+    @timed("downloader.vod")
+    def fake_download_vod(
+        vod_url: str,
+        out_dir: str,
+        prefer_height: int = 720,
+        manifest_path: Optional[str] = None,
+    ) -> DownloadResult:
+        item = by_url[vod_url]
+        src = media[int(item.get("media_index", 0))]
+        os.makedirs(out_dir, exist_ok=True)
+        path = os.path.join(
+            out_dir, safe_filename(f"{sha1(vod_url)}_{item['title']}.mp4")
+        )
+        if not os.path.exists(path):
+            shutil.copyfile(src.video_path, path)  # stands in for the transfer
+        annotate(source_sec=src.duration_sec)
+        downloader._record_vod(out_dir, vod_url, path, src.duration_sec, manifest_path)
+        return DownloadResult(vod_path=path, vod_url=vod_url)
+
+    @timed("downloader.clip")
+    def fake_download_clip(clip_url: str, out_dir: str) -> DownloadResult:
+        item = by_url[clip_url]
+        src = media[int(item.get("media_index", 0))]
+        os.makedirs(out_dir, exist_ok=True)
+        path = os.path.join(
+            out_dir, safe_filename(f"{sha1(clip_url)}_{item['title']}.mp4")
+        )
+        cmd = [
+            "ffmpeg",
+            "-y",
+            "-v",
+            "error",
+            "-ss",
+            str(item.get("vod_offset") or 0),
+            "-i",
+            src.video_path,
+            "-t",
+            str(item.get("duration", 30.0)),
+            "-c",
+            "copy",
+            path,
+        ]
+        p = subprocess.run(cmd, capture_output=True, text=True)
+        if p.returncode != 0:
+            raise RuntimeError(f"fake clip download failed:\n{p.stderr}")
+        annotate(source_sec=float(item.get("duration", 30.0)))
+        return DownloadResult(vod_path=path, vod_url=clip_url)
+
+    def fake_upload_video(
+        file_path: str,
+        title: str,
+        description: str,
+        tags: Optional[List[str]] = None,
+        privacy: str = "public",
+        resume_uri: Optional[str] = None,
+        on_session: Any = None,
+    ) -> Dict[str, Any]:
+        with open(file_path, "rb") as f:
+            r = requests.post(f"{services.url}/upload", data=f, timeout=600)
+        r.raise_for_status()
+        return r.json()
+
+    main_mod.download_twitch_vod = fake_download_vod
+    main_mod.download_twitch_clip = fake_download_clip
+    main_mod.upload_video = fake_upload_video
+
+
+def _stage_latency(metrics_paths: List[str]) -> Dict[str, Dict[str, float]]:
+    walls: Dict[str, List[float]] = {}
+    for path in metrics_paths:
+        if not os.path.exists(path):
+            continue
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                rec = json.loads(line)
+                walls.setdefault(rec["stage"], []).append(float(rec["wall_sec"]))
+
+    out: Dict[str, Dict[str, float]] = {}
+    for stage, w in walls.items():
+        w.sort()
+        out[stage] = {
+            "count": len(w),
+            "mean_sec": round(statistics.mean(w), 3),
+            "p50_sec": round(w[len(w) // 2], 3),
+            "p95_sec": round(w[min(int(len(w) * 0.95), len(w) - 1)], 3),
+            "max_sec": round(w[-1], 3),
+            "total_sec": round(sum(w), 3),
+        }
+    return out
+
+
+def _run_jobs(main_mod: Any, jobs: int, label: str = "") -> Dict[str, Any]:
+    job_walls: List[float] = []
+    failures: List[str] = []
+    for j in range(jobs):
+        print(f"\n🏁 {label}Job {j + 1}/{jobs}")
+        t0 = time.perf_counter()
+        try:
+            main_mod.main()
+        except Exception as e:
+            failures.append(f"{label}job {j + 1}: {type(e).__name__}: {e}"[:300])
+            print("❌ Job failed:", e)
+        job_walls.append(time.perf_counter() - t0)
+    return {"job_walls": job_walls, "failures": failures}
+
+
+def _run_node(args: argparse.Namespace, media: List[SyntheticMedia]) -> int:
+    """
+    Worker side of --nodes: the parent has set up the environment and the
+    services; this process only runs its share of the jobs.
+    """
+    os.environ["SHARD_NODE_ID"] = str(args.node_id)
+    services = FakeServices.__new__(FakeServices)  # client side only
+    services.recording = read_json(args.recording, {})
+    services.url = args.services_url
+
+    import src.main as main_mod
+
+    _install_fakes(main_mod, services, media)
+    write_json(args.out, _run_jobs(main_mod, args.jobs, f"[node {args.node_id}] "))
+    return 0
+
+
+def _spawn_nodes(args: argparse.Namespace, run_dir: str, url: str) -> Dict[str, Any]:
+    """
+    Run args.nodes worker processes concurrently and merge their results.
+    """
+    procs = []
+    for n in range(args.nodes):
+        jobs = args.jobs // args.nodes + (1 if n < args.jobs % args.nodes else 0)
+        cmd = [
+            sys.executable,
+            "-m",
+            "benchmarks.e2e",
+            *("--node-id", str(n), "--nodes", str(args.nodes)),
+            *("--jobs", str(jobs), "--length", str(args.length)),
+            *("--sources", str(args.sources), "--mode", args.mode),
+            *("--recording", os.path.join(run_dir, "recording.json")),
+            *("--services-url", url),
+            *("--out", os.path.join(run_dir, f"node_{n}.json")),
+        ]
+        procs.append(subprocess.Popen(cmd, cwd=os.path.dirname(BENCH_DIR)))
+
+    merged: Dict[str, Any] = {"job_walls": [], "failures": []}
+    for n, p in enumerate(procs):
+        if p.wait() != 0:
+            merged["failures"].append(f"node {n}: exited {p.returncode}")
+        res = read_json(os.path.join(run_dir, f"node_{n}.json"), {})
+        merged["job_walls"] += res.get("job_walls", [])
+        merged["failures"] += res.get("failures", [])
+    return merged
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    ap = argparse.ArgumentParser(prog="python -m benchmarks.e2e")
+    ap.add_argument("--jobs", type=int, default=4)
+    ap.add_argument("--length", type=int, default=300, help="synthetic VOD seconds")
+    ap.add_argument("--sources", type=int, default=2, help="distinct synthetic VODs")
+    ap.add_argument("--broadcasters", type=int, default=2)
+    ap.add_argument("--mode", choices=("vods", "clips"), default="vods")
+    ap.add_argument("--no-subtitles", action="store_true")
+    ap.add_argument(
+        "--dedup",
+        action="store_true",
+        help="keep near-duplicate checks on (synthetic inputs look alike)",
+    )
+    ap.add_argument("--recording", default="", help="recorded Helix responses JSON")
+    ap.add_argument("--baseline", default=DEFAULT_BASELINE)
+    ap.add_argument("--save-baseline", action="store_true")
+    ap.add_argument("--tolerance", type=float, default=0.15)
+    ap.add_argument("--out", default="")
+    ap.add_argument("--nodes", type=int, default=1, help="sharded worker processes")
+    ap.add_argument("--node-id", type=int, default=-1, help=argparse.SUPPRESS)
+    ap.add_argument("--services-url", default="", help=argparse.SUPPRESS)
+    args = ap.parse_args(argv)
+
+    if args.node_id >= 0:
+        bench_root = os.path.join(os.path.dirname(BENCH_DIR), "cache", "bench")
+        media = [
+            make_synthetic_vod(
+                os.path.join(bench_root, "media"), args.length, seed=i + 1
+            )
+            for i in range(max(args.sources, 1))
+        ]
+        return _run_node(args, media)
+
+    root = os.path.abspath(os.path.join(BENCH_DIR, ".."))
+    bench_root = os.path.join(root, "cache", "bench")
+    run_dir = os.path.join(bench_root, "e2e", utc_ts().replace(":", ""))
+    assets = os.path.join(run_dir, "assets")
+    make_overlay_png(os.path.join(assets, "logo.png"))
+    make_overlay_png(os.path.join(assets, "subscribe.png"), colour="red")
+
+    print(f"🧪 Preparing {args.sources} synthetic {args.length}s source(s)...")
+    media = [
+        make_synthetic_vod(os.path.join(bench_root, "media"), args.length, seed=i + 1)
+        for i in range(max(args.sources, 1))
+    ]
+    if not args.recording:
+        broadcasters = _broadcasters_for(args.broadcasters, args.nodes)
+        if broadcasters != args.broadcasters:
+            print(
+                f"⚠️ {args.broadcasters} broadcaster(s) would leave a node idle; "
+                f"using {broadcasters}"
+            )
+        args.broadcasters = broadcasters
+    vods_per = -(-args.jobs // max(args.broadcasters, 1))
+    recording = (
+        read_json(args.recording, {})
+        if args.recording
+        else make_recording(args.broadcasters, vods_per, media)
+    )
+    services = FakeServices(recording).start()
+
+    # settings and module-level config are read from the environment, so this
+    # has to happen before src.main is imported
+    os.environ.update(
+        {
+            "TWITCH_CLIENT_ID": "bench",
+            "TWITCH_CLIENT_SECRET": "bench",
+            "TWITCH_BROADCASTER_IDS": ",".join(recording["users"]),
+            "TWITCH_HELIX_URL": f"{services.url}/helix",
+            "TWITCH_OAUTH_URL": f"{services.url}/oauth2",
+            "TWITCH_MODE": args.mode,
+            "STREAMFLARE_CACHE_DIR": os.path.join(run_dir, "cache"),
+            "STREAMFLARE_ASSETS_DIR": assets,
+            "ENABLE_SUBTITLES": "false" if args.no_subtitles else "true",
+            "DEDUP_ENABLED": "true" if args.dedup else "false",
+            "CLIPS_LOOKBACK_HOURS": str(24 * (vods_per + 1)),
+            "SHARD_NODE_COUNT": str(max(args.nodes, 1)),
+        }
+    )
+    os.environ.pop("CHAT_SOURCE", None)
+    os.environ.pop("STREAMFLARE_SHARD_DIR", None)
+
+    t_start = time.perf_counter()
+    if args.nodes > 1:
+        write_json(os.path.join(run_dir, "recording.json"), recording)
+        results = _spawn_nodes(args, run_dir, services.url)
+    else:
+        import src.main as main_mod
+
+        _install_fakes(main_mod, services, media)
+        results = _run_jobs(main_mod, args.jobs)
+    job_walls, failures = results["job_walls"], results["failures"]
+    total = time.perf_counter() - t_start
+    services.stop()
+
+    ok = args.jobs - len(failures)
+    stages = _stage_latency(
+        [
+            os.path.join(dirpath, "metrics.jsonl")
+            for dirpath, _, files in os.walk(os.path.join(run_dir, "cache"))
+            if "metrics.jsonl" in files
+        ]
+    )
+    report = {
+        "created_at": utc_ts(),
+        "mode": args.mode,
+        "jobs": args.jobs,
+        "nodes": args.nodes,
+        "ok": ok,
+        "failures": failures,
+        "length_sec": args.length,
+        "subtitles": not args.no_subtitles,
+        "wall_sec": round(total, 3),
+        "jobs_per_hour": round(ok / total * 3600, 3) if total else 0.0,
+        "job_p50_sec": round(statistics.median(job_walls), 3) if job_walls else 0.0,
+        "uploads": services.uploads,
+        "upload_bytes": services.upload_bytes,
+        "stages": stages,
+        "cpu_count": os.cpu_count(),
+    }
+
+    print(
+        f"\n📊 {ok}/{args.jobs} jobs in {total:.1f}s → {report['jobs_per_hour']:.2f} jobs/h"
+    )
+    for stage, st in sorted(stages.items(), key=lambda kv: -kv[1]["total_sec"]):
+        print(
+            f"   {stage:<28} n={st['count']:<3} p50={st['p50_sec']:>8.2f}s "
+            f"p95={st['p95_sec']:>8.2f}s"
+        )
+
+    out = args.out or os.path.join(bench_root, f"e2e_{utc_ts().replace(':', '')}.json")
+    write_json(out, report)
+    print("\n📄 Results:", out)
+
+    if args.save_baseline:
+        write_json(args.baseline, report)
+        print("📌 Baseline saved:", args.baseline)
+        return 0
+
+    baseline = read_json(args.baseline, {})
+    if baseline.get("jobs_per_hour"):
+        ratio = report["jobs_per_hour"] / baseline["jobs_per_hour"]
+        print(f"📈 {ratio:.2f}x jobs/h vs baseline")
+        if ratio < 1.0 - args.tolerance:
+            print("❌ End-to-end throughput regressed beyond tolerance")
+            return 1
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
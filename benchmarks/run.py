@@ -0,0 +1,520 @@
+"""
+Offline micro-benchmarks for the analysis, render and transcription stages.
+
+    python -m benchmarks.run                         # 60s, 300s, 900s inputs
+    python -m benchmarks.run --lengths 60 --only audio_features,scene_change
+    python -m benchmarks.run --save-baseline         # record benchmarks/baseline.json
+
+Inputs are generated locally with ffmpeg (see synth.py), so runs are
+reproducible on any host. Every result is reported as a realtime multiple
+(source seconds processed per wall second). When a baseline exists, each
+result is compared against it and the exit code is 1 if any benchmark
+regressed by more than --tolerance.
+"""
+
+import argparse
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import time
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional
+
+from src.config import get_settings
+from src.utils import read_json, utc_ts, write_json
+
+from .synth import (
+    SyntheticMedia,
+    make_overlay_png,
+    make_synthetic_chat,
+    make_synthetic_vod,
+)
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_BASELINE = os.path.join(BENCH_DIR, "baseline.json")
+
+WINDOW_SEC = 60
+HOP_SEC = 2
+# untimed warm-up runs absorb lazy imports, JIT and page-cache effects
+WARMUP = 1
+
+
+@dataclass(frozen=True)
+class Runs:
+    repeat: int = 3
+    warmup: int = WARMUP
+
+
+def _child_cpu() -> float:
+    try:
+        import resource
+    except ImportError:  # pragma: no cover
+        return 0.0
+    ch = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return float(ch.ru_utime + ch.ru_stime)
+
+
+def _measure(fn: Callable[[], Any], runs: Runs) -> Dict[str, Any]:
+    for _ in range(runs.warmup):
+        fn()
+
+    walls: List[float] = []
+    cpus: List[float] = []
+    last = None
+    for _ in range(runs.repeat):
+        c0 = time.process_time() + _child_cpu()
+        t0 = time.perf_counter()
+        last = fn()
+        walls.append(time.perf_counter() - t0)
+        cpus.append(time.process_time() + _child_cpu() - c0)
+    return {
+        "wall_sec": round(statistics.median(walls), 4),
+        "wall_min_sec": round(min(walls), 4),
+        "wall_max_sec": round(max(walls), 4),
+        "cpu_sec": round(statistics.median(cpus), 4),
+        "_last": last,
+    }
+
+
+def _analysed_sec(media: SyntheticMedia) -> float:
+    # analysis helpers only look at the first 15 minutes
+    return min(media.duration_sec, 900.0)
+
+
+def bench_audio_extract(media: SyntheticMedia, work: str, runs: Runs) -> Dict[str, Any]:
+    from src.highlight_picker import _extract_audio_wav
+
+    wav = os.path.join(work, "extract.wav")
+    res = _measure(lambda: _extract_audio_wav(media.video_path, wav), runs)
+    res["source_sec"] = _analysed_sec(media)
+    return res
+
+
+def bench_audio_features_wav(
+    media: SyntheticMedia, work: str, runs: Runs
+) -> Dict[str, Any]:
+    from src.highlight_picker import _audio_feature_series, _extract_audio_wav
+
+    wav = os.path.join(work, "features.wav")
+    if not os.path.exists(wav):
+        _extract_audio_wav(media.video_path, wav)
+    res = _measure(lambda: _audio_feature_series(wav), runs)
+    res["source_sec"] = _analysed_sec(media)
+    return res
+
+
+def bench_audio_features(
+    media: SyntheticMedia, work: str, runs: Runs
+) -> Dict[str, Any]:
+    from src.highlight_picker import _audio_feature_series
+
+    res = _measure(
+        lambda: _audio_feature_series(None, video_path=media.video_path), runs
+    )
+    res["source_sec"] = _analysed_sec(media)
+    return res
+
+
+def bench_scene_change(media: SyntheticMedia, work: str, runs: Runs) -> Dict[str, Any]:
+    from src.highlight_picker import _scene_series
+
+    res = _measure(lambda: _scene_series(media.video_path), runs)
+    res["source_sec"] = _analysed_sec(media)
+    return res
+
+
+def bench_best_window(media: SyntheticMedia, work: str, runs: Runs) -> Dict[str, Any]:
+    from src.highlight_picker import DEFAULT_WEIGHTS, _best_window, _range_series
+
+    # signals are computed once; only the cut search is timed
+    ranges = [(0.0, _analysed_sec(media))]
+    parts = [
+        _range_series(media.video_path, None, 0.0, b, DEFAULT_WEIGHTS, None)
+        for _, b in ranges
+    ]
+    res = _measure(
+        lambda: _best_window(ranges, parts, DEFAULT_WEIGHTS, 40, WINDOW_SEC), runs
+    )
+    res["source_sec"] = _analysed_sec(media)
+    res["picked_start_sec"] = res["_last"][1]
+    return res
+
+
+def bench_pick_best_highlight(
+    media: SyntheticMedia, work: str, runs: Runs
+) -> Dict[str, Any]:
+    from src.highlight_picker import pick_best_highlight
+
+    res = _measure(
+        lambda: pick_best_highlight(media.video_path, None, 40, WINDOW_SEC), runs
+    )
+    hl = res["_last"]
+    # coarse-to-fine covers the whole input
+    res["source_sec"] = media.duration_sec
+    res["picked_start_sec"] = hl.start_sec
+    res["picked_duration_sec"] = hl.duration_sec
+    # quality check: does the picked window overlap an injected loud burst?
+    end = hl.start_sec + hl.duration_sec
+    res["hit_burst"] = any(a < end and hl.start_sec < b for a, b in media.bursts)
+    return res
+
+
+def bench_pick_best_highlight_exhaustive(
+    media: SyntheticMedia, work: str, runs: Runs
+) -> Dict[str, Any]:
+    from src.highlight_picker import pick_best_highlight
+
+    res = _measure(
+        lambda: pick_best_highlight(
+            media.video_path, None, 40, WINDOW_SEC, candidates=0
+        ),
+        runs,
+    )
+    hl = res["_last"]
+    res["source_sec"] = _analysed_sec(media)
+    res["picked_start_sec"] = hl.start_sec
+    end = hl.start_sec + hl.duration_sec
+    res["hit_burst"] = any(a < end and hl.start_sec < b for a, b in media.bursts)
+    return res
+
+
+def bench_pick_best_highlight_chat(
+    media: SyntheticMedia, work: str, runs: Runs
+) -> Dict[str, Any]:
+    from src.chat_signal import chat_density, load_chat_offsets
+    from src.highlight_picker import pick_best_highlight
+
+    chat_path = make_synthetic_chat(os.path.dirname(media.video_path), media)
+    chat = chat_density(load_chat_offsets(chat_path), media.duration_sec)
+
+    res = _measure(
+        lambda: pick_best_highlight(media.video_path, None, 40, WINDOW_SEC, chat=chat),
+        runs,
+    )
+    hl = res["_last"]
+    # the whole VOD is covered by chat, but only candidate regions are decoded
+    res["source_sec"] = media.duration_sec
+    res["picked_start_sec"] = hl.start_sec
+    end = hl.start_sec + hl.duration_sec
+    res["hit_burst"] = any(a < end and hl.start_sec < b for a, b in media.bursts)
+    return res
+
+
+def bench_render_shorts(media: SyntheticMedia, work: str, runs: Runs) -> Dict[str, Any]:
+    from src.editor import render_shorts
+
+    logo = make_overlay_png(os.path.join(work, "..", "logo.png"))
+    sub = make_overlay_png(os.path.join(work, "..", "subscribe.png"), colour="red")
+    dur = float(min(WINDOW_SEC, media.duration_sec))
+    out = os.path.join(work, "render.mp4")
+
+    res = _measure(
+        lambda: render_shorts(
+            input_path=media.video_path,
+            output_path=out,
+            start_sec=0.0,
+            duration_sec=dur,
+            logo_path=logo,
+            subscribe_path=sub,
+        ),
+        runs,
+    )
+    res["source_sec"] = dur
+    res["output_bytes"] = os.path.getsize(out)
+    return res
+
+
+def bench_render_multi(media: SyntheticMedia, work: str, runs: Runs) -> Dict[str, Any]:
+    from src.editor import render_shorts
+
+    logo = make_overlay_png(os.path.join(work, "..", "logo.png"))
+    sub = make_overlay_png(os.path.join(work, "..", "subscribe.png"), colour="red")
+    dur = float(min(WINDOW_SEC, media.duration_sec))
+    extras = {
+        "square": os.path.join(work, "render_square.mp4"),
+        "landscape": os.path.join(work, "render_landscape.mp4"),
+    }
+
+    def _render(extra: Optional[Dict[str, str]]) -> Any:
+        return render_shorts(
+            input_path=media.video_path,
+            output_path=os.path.join(work, "render_multi.mp4"),
+            start_sec=0.0,
+            duration_sec=dur,
+            logo_path=logo,
+            subscribe_path=sub,
+            extra_outputs=extra,
+        )
+
+    # vertical alone is the reference: each extra layout should only add its
+    # own encode on top of it, not another decode
+    single = _measure(lambda: _render(None), runs)
+    res = _measure(lambda: _render(extras), runs)
+    res["source_sec"] = dur
+    res["outputs"] = 1 + len(extras)
+    res["vertical_only_wall_sec"] = single["wall_sec"]
+    res["extra_cost_x"] = round(res["wall_sec"] / max(single["wall_sec"], 1e-9), 3)
+    return res
+
+
+POOL_CLIP_SEC = 10.0
+
+
+def _pool_settings(budget: int) -> List[Dict[str, int]]:
+    # jobs x threads splits of the budget, plus every job at ffmpeg's default
+    # threading to show what oversubscription costs
+    settings = []
+    jobs = 1
+    while jobs <= budget:
+        settings.append({"jobs": jobs, "threads": max(budget // jobs, 1)})
+        jobs *= 2
+    settings.append({"jobs": settings[-1]["jobs"], "threads": 0})
+    return settings
+
+
+def bench_render_pool(media: SyntheticMedia, work: str, runs: Runs) -> Dict[str, Any]:
+    from src.render_pool import RenderExecutor, plan
+
+    logo = make_overlay_png(os.path.join(work, "..", "logo.png"))
+    sub = make_overlay_png(os.path.join(work, "..", "subscribe.png"), colour="red")
+    _, budget = plan(jobs=1)  # RENDER_THREAD_BUDGET or all cores
+    settings = _pool_settings(budget)
+    n_clips = max(2, 2 * max(st["jobs"] for st in settings))
+    dur = float(min(POOL_CLIP_SEC, media.duration_sec))
+    span_sec = max(media.duration_sec - dur, 0.0)
+
+    def _run_batch(jobs: int, threads: int) -> None:
+        with RenderExecutor(jobs=jobs, threads=threads) as ex:
+            futures = [
+                ex.submit(
+                    input_path=media.video_path,
+                    output_path=os.path.join(work, f"pool_{i}.mp4"),
+                    start_sec=span_sec * i / n_clips,
+                    duration_sec=dur,
+                    logo_path=logo,
+                    subscribe_path=sub,
+                )
+                for i in range(n_clips)
+            ]
+            for f in futures:
+                f.result()
+
+    sweep = []
+    for st in settings:
+        r = _measure(lambda: _run_batch(st["jobs"], st["threads"]), runs)
+        r.pop("_last", None)
+        r.update(st)
+        r["realtime_x"] = round(n_clips * dur / max(r["wall_sec"], 1e-9), 3)
+        sweep.append(r)
+        print(
+            f"   jobs={st['jobs']:<3} threads={st['threads'] or 'default':<8} "
+            f"{r['realtime_x']:>8.2f}x realtime"
+        )
+
+    best = max(sweep, key=lambda r: r["realtime_x"])
+    return {
+        "wall_sec": best["wall_sec"],
+        "cpu_sec": best["cpu_sec"],
+        "source_sec": n_clips * dur,
+        "thread_budget": budget,
+        "clips": n_clips,
+        "best_jobs": best["jobs"],
+        "best_threads": best["threads"],
+        "sweep": sweep,
+    }
+
+
+def bench_transcribe_to_srt(
+    media: SyntheticMedia, work: str, runs: Runs, vad: bool = True
+) -> Dict[str, Any]:
+    from src.subtitles import _get_model, transcribe_to_srt
+
+    clip = os.path.join(work, "transcribe_src.mp4")
+    dur = float(min(WINDOW_SEC, media.duration_sec))
+    if not os.path.exists(clip):
+        cmd = [
+            "ffmpeg",
+            "-y",
+            "-i",
+            media.video_path,
+            "-t",
+            str(dur),
+            "-c",
+            "copy",
+            clip,
+        ]
+        subprocess.run(cmd, capture_output=True, check=True)
+
+    _get_model()  # model load is a one-off per process; keep it out of the timing
+    srt = os.path.join(work, "transcribe.srt")
+    res = _measure(lambda: transcribe_to_srt(clip, srt, vad=vad), runs)
+    res["source_sec"] = dur
+    res["vad"] = vad
+    return res
+
+
+def bench_transcribe_to_srt_no_vad(
+    media: SyntheticMedia, work: str, runs: Runs
+) -> Dict[str, Any]:
+    return bench_transcribe_to_srt(media, work, runs, vad=False)
+
+
+BENCHES: Dict[str, Callable[[SyntheticMedia, str, Runs], Dict[str, Any]]] = {
+    "audio_extract": bench_audio_extract,
+    "audio_features": bench_audio_features,
+    "audio_features_wav": bench_audio_features_wav,
+    "scene_change": bench_scene_change,
+    "best_window": bench_best_window,
+    "pick_best_highlight": bench_pick_best_highlight,
+    "pick_best_highlight_exhaustive": bench_pick_best_highlight_exhaustive,
+    "pick_best_highlight_chat": bench_pick_best_highlight_chat,
+    "render_shorts": bench_render_shorts,
+    "render_multi": bench_render_multi,
+    "render_pool": bench_render_pool,
+    "transcribe_to_srt": bench_transcribe_to_srt,
+    "transcribe_to_srt_no_vad": bench_transcribe_to_srt_no_vad,
+}
+
+
+def _host_info() -> Dict[str, Any]:
+    ffmpeg_version = ""
+    if shutil.which("ffmpeg"):
+        p = subprocess.run(["ffmpeg", "-version"], capture_output=True, text=True)
+        ffmpeg_version = (p.stdout.splitlines() or [""])[0]
+    return {
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+        "cpu_count": os.cpu_count(),
+        "python": sys.version.split()[0],
+        "ffmpeg": ffmpeg_version,
+    }
+
+
+def _key(r: Dict[str, Any]) -> str:
+    return f"{r['bench']}@{r['length_sec']}"
+
+
+def compare(
+    results: List[Dict[str, Any]], baseline: Dict[str, Any], tolerance: float
+) -> List[str]:
+    """
+    Annotate results with speedup vs baseline; return regression messages.
+    """
+    base = {_key(r): r for r in baseline.get("results", []) if "realtime_x" in r}
+    regressions = []
+    ran = {(r["bench"], r["length_sec"]) for r in results}
+    benches = {b for b, _ in ran}
+    lengths = {n for _, n in ran}
+    for key, b in base.items():
+        # only pairs this run selected (--only / --lengths) can be missing
+        if b["bench"] in benches and b["length_sec"] in lengths:
+            if (b["bench"], b["length_sec"]) not in ran:
+                regressions.append(f"{key}: in baseline but no result")
+    for r in results:
+        b = base.get(_key(r))
+        if not b or "realtime_x" not in r or not b["realtime_x"]:
+            continue
+        speedup = r["realtime_x"] / b["realtime_x"]
+        r["baseline_realtime_x"] = b["realtime_x"]
+        r["speedup"] = round(speedup, 3)
+        if speedup < 1.0 - tolerance:
+            regressions.append(
+                f"{_key(r)}: {r['realtime_x']:.2f}x realtime vs baseline "
+                f"{b['realtime_x']:.2f}x ({speedup:.2f}x)"
+            )
+    return regressions
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    ap = argparse.ArgumentParser(prog="python -m benchmarks.run")
+    ap.add_argument("--lengths", default="60,300,900", help="input lengths in seconds")
+    ap.add_argument("--only", default="", help="comma-separated benchmark names")
+    ap.add_argument("--repeat", type=int, default=3)
+    ap.add_argument("--warmup", type=int, default=WARMUP)
+    ap.add_argument("--seed", type=int, default=1)
+    ap.add_argument("--baseline", default=DEFAULT_BASELINE)
+    ap.add_argument("--save-baseline", action="store_true")
+    ap.add_argument("--tolerance", type=float, default=0.15)
+    ap.add_argument("--out", default="", help="results JSON (default: cache/bench/)")
+    args = ap.parse_args(argv)
+
+    runs = Runs(repeat=args.repeat, warmup=max(args.warmup, 0))
+
+    s = get_settings()
+    bench_root = os.path.join(s.cache_dir, "bench")
+    media_dir = os.path.join(bench_root, "media")
+
+    names = [n.strip() for n in args.only.split(",") if n.strip()] or list(BENCHES)
+    unknown = [n for n in names if n not in BENCHES]
+    if unknown:
+        ap.error(f"unknown benchmarks: {unknown}; choose from {list(BENCHES)}")
+
+    lengths = [int(x) for x in args.lengths.split(",") if x.strip()]
+    results: List[Dict[str, Any]] = []
+
+    for length in lengths:
+        print(f"\n🧪 Generating {length}s synthetic input...")
+        media = make_synthetic_vod(media_dir, length, seed=args.seed)
+
+        for name in names:
+            work = os.path.join(bench_root, "work", f"{length}s")
+            os.makedirs(work, exist_ok=True)
+            row: Dict[str, Any] = {"bench": name, "length_sec": length}
+            try:
+                row.update(BENCHES[name](media, work, runs))
+                row.pop("_last", None)
+                row["realtime_x"] = round(
+                    row["source_sec"] / max(row["wall_sec"], 1e-9), 3
+                )
+                print(
+                    f"⏱ {name:<22} {length:>5}s  "
+                    f"{row['wall_sec']:>8.3f}s  {row['realtime_x']:>8.2f}x realtime"
+                )
+            except Exception as e:
+                row["error"] = f"{type(e).__name__}: {e}"[:300]
+                print(f"❌ {name:<22} {length:>5}s  failed: {row['error']}")
+            results.append(row)
+
+    report = {
+        "created_at": utc_ts(),
+        "host": _host_info(),
+        "repeat": args.repeat,
+        "warmup": runs.warmup,
+        "seed": args.seed,
+        "window_sec": WINDOW_SEC,
+        "hop_sec": HOP_SEC,
+        "results": results,
+    }
+
+    # a benchmark that raises is a failure, not a skip
+    regressions = [f"{_key(r)}: {r['error']}" for r in results if "error" in r]
+    baseline = read_json(args.baseline, default={})
+    if baseline:
+        regressions += compare(results, baseline, args.tolerance)
+        for r in results:
+            if "speedup" in r:
+                print(f"📈 {_key(r):<28} {r['speedup']:.2f}x vs baseline")
+
+    out = args.out or os.path.join(
+        bench_root, f"results_{utc_ts().replace(':', '')}.json"
+    )
+    write_json(out, report)
+    print("\n📄 Results:", out)
+
+    if args.save_baseline:
+        write_json(args.baseline, report)
+        print("📌 Baseline saved:", args.baseline)
+
+    if regressions:
+        print("\n❌ Failed or regressed beyond tolerance:")
+        for msg in regressions:
+            print("  -", msg)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
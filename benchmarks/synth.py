@@ -0,0 +1,157 @@
+import json
+import os
+import random
+import subprocess
+from dataclasses import asdict, dataclass, field
+from typing import List, Tuple
+
+from src.utils import read_json, write_json
+
+
+@dataclass
+class SyntheticMedia:
+    video_path: str
+    duration_sec: float
+    # ground truth so benchmarks can check *what* was picked, not only how fast
+    bursts: List[Tuple[float, float]] = field(default_factory=list)
+    cuts: List[float] = field(default_factory=list)
+
+
+def _run(cmd: List[str], what: str) -> None:
+    p = subprocess.run(cmd, capture_output=True, text=True)
+    if p.returncode != 0:
+        raise RuntimeError(f"ffmpeg {what} failed:\n{p.stderr[-2000:]}")
+
+
+def _plan(seconds: int, seed: int) -> Tuple[List[Tuple[float, float]], List[float]]:
+    """
+    Deterministic loud bursts (~one per 5 min, min 1) and scene cuts (~one per 20s).
+    """
+    rng = random.Random(seed * 1000003 + seconds)
+
+    n_bursts = max(1, seconds // 300)
+    bursts = []
+    for i in range(n_bursts):
+        lo = i * seconds / n_bursts
+        hi = (i + 1) * seconds / n_bursts
+        start = round(rng.uniform(lo, max(lo, hi - 25)), 1)
+        bursts.append((start, round(min(start + 20.0, seconds), 1)))
+
+    cuts = sorted(
+        round(rng.uniform(1, seconds - 1), 1) for _ in range(max(1, seconds // 20))
+    )
+    return bursts, cuts
+
+
+def make_synthetic_vod(
+    out_dir: str,
+    seconds: int,
+    seed: int = 1,
+    size: str = "1280x720",
+    fps: int = 30,
+) -> SyntheticMedia:
+    """
+    testsrc2 video with full-frame colour flashes at scene-cut times, and a quiet
+    sine bed with loud warbling bursts. Cached by (seconds, seed, size, fps).
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    name = f"synth_{seconds}s_{seed}_{size}_{fps}"
+    video_path = os.path.join(out_dir, name + ".mp4")
+    truth_path = os.path.join(out_dir, name + ".json")
+
+    bursts, cuts = _plan(seconds, seed)
+    media = SyntheticMedia(video_path, float(seconds), bursts, cuts)
+    truth = json.loads(json.dumps(asdict(media)))  # tuples -> lists, as stored
+    if os.path.exists(video_path) and read_json(truth_path, {}) == truth:
+        return media
+
+    # each cut = 0.5s solid colour frame block → large frame diff on entry/exit
+    colours = ["red", "blue", "green", "yellow", "white"]
+    boxes = ",".join(
+        f"drawbox=c={colours[i % len(colours)]}:t=fill:enable='between(t,{c},{c + 0.5})'"
+        for i, c in enumerate(cuts)
+    )
+    vf = f"testsrc2=size={size}:rate={fps}:duration={seconds}"
+    if boxes:
+        vf += "," + boxes
+
+    loud = "+".join(f"between(t,{a},{b})" for a, b in bursts) or "0"
+    af = (
+        f"aevalsrc='0.03*sin(2*PI*440*t)"
+        f"+0.8*({loud})*sin(2*PI*(220+80*sin(9*t))*t)'"
+        f":s=44100:d={seconds}"
+    )
+
+    cmd = [
+        "ffmpeg",
+        "-y",
+        "-f",
+        "lavfi",
+        "-i",
+        vf,
+        "-f",
+        "lavfi",
+        "-i",
+        af,
+        "-c:v",
+        "libx264",
+        "-preset",
+        "ultrafast",
+        "-g",
+        str(fps * 2),
+        "-c:a",
+        "aac",
+        "-shortest",
+        video_path,
+    ]
+    _run(cmd, "synthetic vod")
+    write_json(truth_path, asdict(media))
+    return media
+
+
+def make_synthetic_chat(
+    out_dir: str, media: SyntheticMedia, seed: int = 1, base_rate: float = 0.5
+) -> str:
+    """
+    Chat replay JSON (rechat shape) with a steady trickle of messages and a
+    burst that starts a few seconds after each injected loud burst.
+    """
+    rng = random.Random(seed)
+    offsets: List[float] = []
+    t = 0.0
+    while t < media.duration_sec:
+        t += rng.expovariate(base_rate)
+        offsets.append(t)
+    for a, b in media.bursts:
+        for _ in range(int((b - a) * 8)):
+            offsets.append(rng.uniform(a + 3.0, b + 10.0))
+    offsets = sorted(o for o in offsets if o < media.duration_sec)
+
+    name = os.path.splitext(os.path.basename(media.video_path))[0]
+    path = os.path.join(out_dir, f"{name}_chat.json")
+    comments = [
+        {"content_offset_seconds": round(o, 3), "message": {"body": "PogChamp"}}
+        for o in offsets
+    ]
+    write_json(path, {"comments": comments})
+    return path
+
+
+def make_overlay_png(path: str, size: str = "256x256", colour: str = "orange") -> str:
+    if not os.path.exists(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        _run(
+            [
+                "ffmpeg",
+                "-y",
+                "-f",
+                "lavfi",
+                "-i",
+                f"color=c={colour}:s={size}",
+                "-frames:v",
+                "1",
+                path,
+            ],
+            "overlay png",
+        )
+    return path
@@ -0,0 +1,151 @@
+"""
+fp32 vs int8 Whisper on CPU: transcription speed and transcript agreement.
+
+    python -m benchmarks.whisper_int8 --audio talk1.mp4,talk2.mp4
+    python -m benchmarks.whisper_int8 --models tiny,base,small --threads 2
+
+Each input is decoded once to 16 kHz PCM and transcribed by every
+(model, inference) pair through the path transcribe_to_srt uses, VAD
+included. Agreement is the word error rate of the int8 transcript against
+the fp32 transcript of the same model size. Without --audio the synthetic
+benchmark clip is used; it has no speech, so only the speed numbers mean
+anything there.
+"""
+
+import argparse
+import os
+import sys
+import time
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from src.config import get_settings
+from src.utils import utc_ts, write_json
+
+from . import run as bench_run
+from .synth import make_synthetic_vod
+
+
+def word_error_rate(ref: str, hyp: str) -> float:
+    """
+    Word-level Levenshtein distance over the reference length.
+    """
+    r, h = ref.lower().split(), hyp.lower().split()
+    if not r:
+        return 0.0 if not h else 1.0
+    prev = list(range(len(h) + 1))
+    for i, rw in enumerate(r, start=1):
+        cur = [i] + [0] * len(h)
+        for j, hw in enumerate(h, start=1):
+            cur[j] = min(prev[j] + 1, cur[j - 1] + 1, prev[j - 1] + (rw != hw))
+        prev = cur
+    return prev[-1] / len(r)
+
+
+def _decode(path: str) -> np.ndarray:
+    from src.audio_stream import iter_ffmpeg_pcm
+    from src.subtitles import WHISPER_SR
+
+    blocks = list(iter_ffmpeg_pcm(path, sr=WHISPER_SR))
+    return np.concatenate(blocks) if blocks else np.zeros(0, dtype=np.float32)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    ap = argparse.ArgumentParser(prog="python -m benchmarks.whisper_int8")
+    ap.add_argument("--audio", default="", help="comma-separated media with speech")
+    ap.add_argument("--models", default="base", help="comma-separated model sizes")
+    ap.add_argument("--threads", type=int, default=0, help="torch threads (0 = all)")
+    ap.add_argument("--repeat", type=int, default=3)
+    ap.add_argument("--warmup", type=int, default=bench_run.WARMUP)
+    ap.add_argument("--length", type=int, default=60, help="synthetic clip seconds")
+    ap.add_argument("--out", default="", help="results JSON (default: cache/bench/)")
+    args = ap.parse_args(argv)
+
+    from src import subtitles
+
+    runs = bench_run.Runs(repeat=args.repeat, warmup=max(args.warmup, 0))
+    bench_root = os.path.join(get_settings().cache_dir, "bench")
+
+    inputs = [p.strip() for p in args.audio.split(",") if p.strip()]
+    if not inputs:
+        print("⚠️ No --audio given: synthetic clip, speed only")
+        media = make_synthetic_vod(os.path.join(bench_root, "media"), args.length)
+        inputs = [media.video_path]
+    pcms = {path: _decode(path) for path in inputs}
+
+    results: List[Dict[str, Any]] = []
+    for name in [m.strip() for m in args.models.split(",") if m.strip()]:
+        reference: Dict[str, str] = {}
+        for inference in ("fp32", "int8"):
+            t0 = time.perf_counter()
+            subtitles._model = subtitles.load_model(
+                name, inference, threads=args.threads
+            )
+            load_sec = time.perf_counter() - t0
+
+            for path, pcm in pcms.items():
+                res = bench_run._measure(lambda: subtitles._transcribe_pcm(pcm), runs)
+                segments, speech_sec = res.pop("_last")
+                text = " ".join(s["text"] for s in segments)
+                audio_sec = pcm.size / subtitles.WHISPER_SR
+                row: Dict[str, Any] = {
+                    "model": name,
+                    "inference": inference,
+                    "input": os.path.basename(path),
+                    "audio_sec": round(audio_sec, 3),
+                    "speech_sec": round(speech_sec, 3),
+                    "load_sec": round(load_sec, 3),
+                    **res,
+                    "realtime_x": round(audio_sec / max(res["wall_sec"], 1e-9), 3),
+                    "segments": len(segments),
+                    "words": len(text.split()),
+                }
+                if inference == "fp32":
+                    reference[path] = text
+                else:
+                    base = next(
+                        r
+                        for r in results
+                        if r["model"] == name
+                        and r["inference"] == "fp32"
+                        and r["input"] == row["input"]
+                    )
+                    row["speedup_vs_fp32"] = round(
+                        base["wall_sec"] / max(row["wall_sec"], 1e-9), 3
+                    )
+                    row["wer_vs_fp32"] = round(
+                        word_error_rate(reference[path], text), 4
+                    )
+                results.append(row)
+
+                extra = ""
+                if "speedup_vs_fp32" in row:
+                    extra = (
+                        f"  {row['speedup_vs_fp32']:.2f}x vs fp32"
+                        f"  WER {row['wer_vs_fp32'] * 100:.1f}%"
+                    )
+                print(
+                    f"⏱ {name:<8} {inference:<5} {row['input'][:28]:<28} "
+                    f"{row['wall_sec']:>8.2f}s  {row['realtime_x']:>6.2f}x realtime{extra}"
+                )
+        subtitles._model = None
+
+    report = {
+        "created_at": utc_ts(),
+        "host": bench_run._host_info(),
+        "threads": args.threads,
+        "repeat": args.repeat,
+        "warmup": runs.warmup,
+        "results": results,
+    }
+    out = args.out or os.path.join(
+        bench_root, f"whisper_int8_{utc_ts().replace(':', '')}.json"
+    )
+    write_json(out, report)
+    print("\n📄 Results:", out)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,327 @@
+import os
+import subprocess
+import tempfile
+from typing import Iterable, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from .subproc import reap
+
+# Analysis only needs loudness/onset detail up to voice band, so decode at a
+# lower rate than playback. 16 kHz also matches Whisper's input rate.
+ANALYSIS_SR = int(os.getenv("AUDIO_ANALYSIS_SR", "16000"))
+BLOCK_SEC = 10
+
+
+def iter_ffmpeg_pcm(
+    video_path: str,
+    sr: int = ANALYSIS_SR,
+    start_sec: float = 0.0,
+    max_sec: Optional[float] = None,
+    block_sec: int = BLOCK_SEC,
+) -> Iterator[np.ndarray]:
+    """
+    Decode mono float32 PCM through an ffmpeg pipe, yielding fixed-size blocks
+    (the last one may be short). Memory stays at one block regardless of length.
+    """
+    cmd = ["ffmpeg", "-nostdin", "-v", "error"]
+    if start_sec > 0:
+        cmd += ["-ss", str(start_sec)]
+    cmd += ["-i", video_path, "-vn", "-ac", "1", "-ar", str(sr)]
+    if max_sec is not None:
+        cmd += ["-t", str(max_sec)]
+    cmd += ["-f", "f32le", "pipe:1"]
+
+    block_bytes = int(sr * block_sec) * 4
+
+    # stderr to a temp file so a chatty ffmpeg can never fill a pipe and stall us
+    with tempfile.TemporaryFile() as err:
+        p = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=err)
+        assert p.stdout is not None
+        try:
+            while True:
+                buf = p.stdout.read(block_bytes)
+                if not buf:
+                    break
+                usable = len(buf) - (len(buf) % 4)
+                yield np.frombuffer(buf[:usable], dtype=np.float32)
+        finally:
+            p.stdout.close()
+            if reap(p, block=False) is None:
+                p.kill()
+            rc = reap(p)
+
+        if rc != 0:
+            err.seek(0)
+            msg = err.read().decode("utf-8", "replace")[-4000:]
+            raise RuntimeError(f"ffmpeg audio decode failed:\n{msg}")
+
+
+def wav_samplerate(wav_path: str) -> int:
+    import soundfile as sf
+
+    return int(sf.info(wav_path).samplerate)
+
+
+def iter_wav_blocks(
+    wav_path: str,
+    max_sec: Optional[float] = None,
+    block_sec: int = BLOCK_SEC,
+    start_sec: float = 0.0,
+) -> Iterator[np.ndarray]:
+    """
+    Block reads from a cached WAV via soundfile (downmixed to mono float32).
+    """
+    import soundfile as sf
+
+    sr = wav_samplerate(wav_path)
+    frames = -1 if max_sec is None else int(max_sec * sr)
+    for block in sf.blocks(
+        wav_path,
+        blocksize=int(sr * block_sec),
+        dtype="float32",
+        frames=frames,
+        start=int(start_sec * sr),
+    ):
+        if block.ndim > 1:
+            block = block.mean(axis=1)
+        yield np.ascontiguousarray(block, dtype=np.float32)
+
+
+# ---------------------------------------------------------------------------
+# Multi-feature pass: one STFT shared by flux, loudness and voice activity
+# ---------------------------------------------------------------------------
+
+FEATURES = ("rms", "flux", "loudness", "voice")
+
+N_FFT = 512
+FRAME_HOP = 256
+VOICE_BAND_HZ = (300.0, 3400.0)
+VOICE_BAND_RATIO = 0.6
+VOICE_MIN_MS = 1e-5  # ~ -50 dBFS; below this a frame is silence, not speech
+
+
+def _a_weighting_gain(freqs: np.ndarray) -> np.ndarray:
+    """
+    IEC 61672 A-weighting as a power gain per frequency bin.
+    """
+    f2 = np.maximum(freqs, 1.0) ** 2
+    ra = (12194.0**2 * f2**2) / (
+        (f2 + 20.6**2) * np.sqrt((f2 + 107.7**2) * (f2 + 737.9**2)) * (f2 + 12194.0**2)
+    )
+    gain = (ra / 0.7943) ** 2  # normalise to ~0 dB at 1 kHz
+    gain[freqs <= 0] = 0.0
+    return gain
+
+
+class SecondFeatureExtractor:
+    """
+    Push-based single STFT pass over PCM. push() takes any block size and
+    returns the per-second feature rows
+    [rms mean-square, spectral flux, A-weighted loudness dB, voiced-frame ratio]
+    for every second closed by that block. State carried between pushes is one
+    frame of samples and one spectrum, so memory does not grow with input length.
+    """
+
+    def __init__(self, sr: int, n_fft: int = N_FFT, hop: int = FRAME_HOP) -> None:
+        self.sr = sr
+        self.n_fft = n_fft
+        self.hop = hop
+        self.window = np.hanning(n_fft).astype(np.float32)
+        freqs = np.fft.rfftfreq(n_fft, 1.0 / sr)
+        self.a_gain = _a_weighting_gain(freqs)
+        self.vb = (freqs >= VOICE_BAND_HZ[0]) & (freqs <= VOICE_BAND_HZ[1])
+        self.win_pow = float(np.sum(self.window * self.window))
+
+        self.buf = np.zeros(0, dtype=np.float32)
+        self.buf_start = 0  # absolute sample index of buf[0]
+        self.total = 0
+        self.prev_logmag: Optional[np.ndarray] = None
+        # sec -> [ms, flux, loud_pow, voiced, frames]
+        self.sums: dict[int, np.ndarray] = {}
+        self.next_emit = 0
+
+    def _emit(self, upto: int) -> List[np.ndarray]:
+        out = []
+        while self.next_emit < upto:
+            acc = self.sums.pop(self.next_emit, None)
+            self.next_emit += 1
+            if acc is None or acc[4] == 0:
+                out.append(np.array([0.0, 0.0, -100.0, 0.0]))
+                continue
+            cnt = acc[4]
+            out.append(
+                np.array(
+                    [
+                        acc[0] / cnt,
+                        acc[1] / cnt,
+                        10.0 * np.log10(acc[2] / cnt + 1e-12),
+                        acc[3] / cnt,
+                    ]
+                )
+            )
+        return out
+
+    def push(self, block: np.ndarray) -> List[np.ndarray]:
+        n_fft, hop = self.n_fft, self.hop
+        self.total += block.size
+        buf = np.concatenate([self.buf, block]) if self.buf.size else block
+        if buf.size < n_fft:
+            self.buf = buf.copy()
+            return []
+
+        n_frames = 1 + (buf.size - n_fft) // hop
+        frames = np.lib.stride_tricks.sliding_window_view(buf, n_fft)[::hop][:n_frames]
+
+        raw_ms = np.mean(frames.astype(np.float64) ** 2, axis=1)
+        power = np.abs(np.fft.rfft(frames * self.window, axis=1)) ** 2 / self.win_pow
+
+        logmag = np.log1p(np.sqrt(power) * 10.0)
+        prev = logmag[0] if self.prev_logmag is None else self.prev_logmag
+        diffs = np.diff(np.vstack([prev[None, :], logmag]), axis=0)
+        flux = np.mean(np.maximum(diffs, 0.0), axis=1)
+        self.prev_logmag = logmag[-1]
+
+        loud_pow = power @ self.a_gain / power.shape[1]
+        band_ratio = power[:, self.vb].sum(axis=1) / (power.sum(axis=1) + 1e-12)
+        voiced = ((band_ratio > VOICE_BAND_RATIO) & (raw_ms > VOICE_MIN_MS)).astype(
+            np.float64
+        )
+
+        centers = self.buf_start + np.arange(n_frames) * hop + n_fft // 2
+        secs = centers // self.sr
+        for sec in np.unique(secs):
+            m = secs == sec
+            acc = self.sums.setdefault(int(sec), np.zeros(5))
+            acc += (
+                raw_ms[m].sum(),
+                flux[m].sum(),
+                loud_pow[m].sum(),
+                voiced[m].sum(),
+                m.sum(),
+            )
+
+        consumed = n_frames * hop
+        self.buf = buf[consumed:].copy()
+        self.buf_start += consumed
+
+        # every later frame is centred at or after this second
+        return self._emit((self.buf_start + n_fft // 2) // self.sr)
+
+    def flush(self) -> List[np.ndarray]:
+        # trailing partial second is dropped, same as the hop-energy path
+        return self._emit(self.total // self.sr)
+
+
+def iter_second_features(
+    blocks: Iterable[np.ndarray],
+    sr: int,
+    n_fft: int = N_FFT,
+    hop: int = FRAME_HOP,
+) -> Iterator[np.ndarray]:
+    """
+    Per-second feature rows (see SecondFeatureExtractor), emitted as soon as
+    each second is closed.
+    """
+    ex = SecondFeatureExtractor(sr, n_fft=n_fft, hop=hop)
+    for block in blocks:
+        yield from ex.push(block)
+    yield from ex.flush()
+
+
+def windowed_mean(series: np.ndarray, window_sec: int, hop_sec: int) -> np.ndarray:
+    """
+    Mean of every window_sec window starting every hop_sec (prefix sums).
+    Not normalised.
+    """
+    n = len(series)
+    window_sec = max(int(window_sec), 1)
+    hop_sec = max(int(hop_sec), 1)
+    if n <= window_sec:
+        return np.array([0.0], dtype=np.float32)
+
+    csum = np.concatenate([[0.0], np.cumsum(series, dtype=np.float64)])
+    starts = np.arange(0, n - window_sec, hop_sec)
+    return ((csum[starts + window_sec] - csum[starts]) / window_sec).astype(np.float32)
+
+
+def above_baseline(series: np.ndarray, span_sec: int = 180) -> np.ndarray:
+    """
+    How far each second sits above a centred moving average, clipped at 0.
+    Steady background music has no excess; a sudden hype moment does.
+    """
+    n = len(series)
+    if n == 0:
+        return series.astype(np.float32)
+    half = max(span_sec // 2, 1)
+    csum = np.concatenate([[0.0], np.cumsum(series, dtype=np.float64)])
+    idx = np.arange(n)
+    lo = np.maximum(idx - half, 0)
+    hi = np.minimum(idx + half + 1, n)
+    base = (csum[hi] - csum[lo]) / (hi - lo)
+    return np.maximum(series - base, 0.0).astype(np.float32)
+
+
+# ---------------------------------------------------------------------------
+# Voice activity: frame energy above the clip's noise floor + voice-band share
+# ---------------------------------------------------------------------------
+
+VAD_FRAME_SEC = 0.03
+VAD_MARGIN_DB = float(os.getenv("VAD_MARGIN_DB", "10"))
+VAD_MIN_DB = -50.0
+VAD_MIN_SPEECH_SEC = 0.25
+VAD_MERGE_GAP_SEC = float(os.getenv("VAD_MERGE_GAP_SEC", "0.6"))
+VAD_PAD_SEC = 0.3
+
+
+def speech_regions(
+    pcm: np.ndarray,
+    sr: int,
+    margin_db: float = VAD_MARGIN_DB,
+    merge_gap_sec: float = VAD_MERGE_GAP_SEC,
+    pad_sec: float = VAD_PAD_SEC,
+) -> List[Tuple[float, float]]:
+    """
+    (start, end) seconds of likely speech in a mono buffer. A 30 ms frame is
+    speech when it is margin_db above the clip's noise floor (10th percentile)
+    and most of its energy sits in the voice band. Runs closer than
+    merge_gap_sec are joined, blips under VAD_MIN_SPEECH_SEC dropped, and
+    each region padded by pad_sec so word edges are not clipped.
+    """
+    n = max(int(sr * VAD_FRAME_SEC), 1)
+    frames = pcm[: pcm.size // n * n].reshape(-1, n).astype(np.float64)
+    if not frames.size:
+        return []
+
+    db = 10.0 * np.log10(np.mean(frames * frames, axis=1) + 1e-12)
+    # a clip with no pauses has no floor; fall back to its median level
+    thr = max(min(np.percentile(db, 10) + margin_db, np.median(db)), VAD_MIN_DB)
+
+    power = np.abs(np.fft.rfft(frames * np.hanning(n), axis=1)) ** 2
+    freqs = np.fft.rfftfreq(n, 1.0 / sr)
+    vb = (freqs >= VOICE_BAND_HZ[0]) & (freqs <= VOICE_BAND_HZ[1])
+    band_ratio = power[:, vb].sum(axis=1) / (power.sum(axis=1) + 1e-12)
+    speech = (db > thr) & (band_ratio > VOICE_BAND_RATIO)
+
+    # frame runs -> seconds
+    edges = np.diff(np.concatenate([[0], speech.astype(np.int8), [0]]))
+    runs = zip(np.flatnonzero(edges == 1), np.flatnonzero(edges == -1))
+    regions: List[List[float]] = []
+    for a, b in runs:
+        start, end = a * VAD_FRAME_SEC, b * VAD_FRAME_SEC
+        if regions and start - regions[-1][1] < merge_gap_sec:
+            regions[-1][1] = end
+        else:
+            regions.append([start, end])
+
+    total = pcm.size / sr
+    out: List[Tuple[float, float]] = []
+    for start, end in regions:
+        if end - start < VAD_MIN_SPEECH_SEC:
+            continue
+        start, end = max(start - pad_sec, 0.0), min(end + pad_sec, total)
+        if out and start <= out[-1][1]:
+            out[-1] = (out[-1][0], end)
+        else:
+            out.append((start, end))
+    return out
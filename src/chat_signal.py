@@ -0,0 +1,114 @@
+import json
+from typing import Any, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+_OFFSET_KEYS = ("content_offset_seconds", "offset", "time_in_seconds", "t")
+
+
+def _offset_of(item: Any) -> Optional[float]:
+    if isinstance(item, (int, float)):
+        return float(item)
+    if isinstance(item, dict):
+        for key in _OFFSET_KEYS:
+            if key in item:
+                try:
+                    return float(item[key])
+                except (TypeError, ValueError):
+                    return None
+    return None
+
+
+def load_chat_offsets(path: str) -> List[float]:
+    """
+    Message offsets (seconds from VOD start) from a chat replay file.
+
+    Accepts yt-dlp rechat / TwitchDownloader JSON ({"comments": [...]} with
+    content_offset_seconds), a plain JSON list of numbers or dicts, or JSON lines.
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        text = f.read()
+
+    items: Iterable[Any]
+    try:
+        data = json.loads(text)
+        if isinstance(data, dict):
+            items = data.get("comments") or data.get("messages") or []
+        else:
+            items = data
+    except json.JSONDecodeError:
+        items = [json.loads(line) for line in text.splitlines() if line.strip()]
+
+    offsets = [o for o in (_offset_of(it) for it in items) if o is not None and o >= 0]
+    offsets.sort()
+    return offsets
+
+
+def chat_density(
+    offsets: List[float], duration_sec: Optional[float] = None
+) -> np.ndarray:
+    """
+    Messages per second, indexed by whole second from VOD start.
+    """
+    if duration_sec is None:
+        duration_sec = (offsets[-1] + 1.0) if offsets else 0.0
+    n = int(np.ceil(duration_sec))
+    if n <= 0:
+        return np.zeros(0, dtype=np.float32)
+    secs = np.asarray(offsets, dtype=np.float64)
+    secs = secs[secs < n].astype(np.int64)
+    return np.bincount(secs, minlength=n).astype(np.float32)
+
+
+def chat_spike_regions(
+    density: np.ndarray,
+    window_sec: int,
+    top_n: int = 5,
+    pad_before_sec: Optional[int] = None,
+    pad_after_sec: Optional[int] = None,
+) -> List[Tuple[float, float]]:
+    """
+    Top-N chat bursts as (start, end) regions worth decoding. Each region is the
+    busiest chat window around a peak, padded so the fine pass can still slide
+    within it. Chat reacts after the moment, so the default padding is a full
+    window before the burst and a quarter window after. Overlaps merge.
+    """
+    n = len(density)
+    window_sec = max(int(window_sec), 1)
+    if n == 0 or top_n <= 0:
+        return []
+    if pad_before_sec is None:
+        pad_before_sec = window_sec
+    if pad_after_sec is None:
+        pad_after_sec = window_sec // 4
+
+    # busiest window starting at each second
+    csum = np.concatenate([[0.0], np.cumsum(density, dtype=np.float64)])
+    last = max(n - window_sec, 0)
+    starts = np.arange(0, last + 1)
+    busy = csum[np.minimum(starts + window_sec, n)] - csum[starts]
+
+    picked: List[int] = []
+    order = np.argsort(-busy, kind="stable")
+    for s in order:
+        if busy[s] <= 0 or len(picked) >= top_n:
+            break
+        # non-maximum suppression: keep peaks at least one window apart
+        if all(abs(int(s) - p) >= window_sec for p in picked):
+            picked.append(int(s))
+
+    regions = sorted(
+        (
+            float(max(s - pad_before_sec, 0)),
+            float(min(s + window_sec + pad_after_sec, n)),
+        )
+        for s in picked
+    )
+
+    merged: List[Tuple[float, float]] = []
+    for a, b in regions:
+        if merged and a <= merged[-1][1]:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], b))
+        else:
+            merged.append((a, b))
+    return merged
@@ -0,0 +1,172 @@
+# src/checkpoint.py
+"""
+Checkpoints for in-flight jobs, kept in state.json under "jobs" (one job per
+broadcaster).
+
+Each stage records what later stages need once it completes (source, download,
+highlight, render, subtitles, burn, upload). A run that finds an unfinished
+job resumes it at the first incomplete stage. The source is only added to
+used_vods / used_clips when the job finishes, or when it is given up on after
+JOB_MAX_ATTEMPTS runs.
+
+Every write re-reads state.json first, so keys owned by others (last_index,
+used_*) are never overwritten with stale copies.
+"""
+
+import os
+from typing import Any, Callable, Dict, List, Optional
+
+from .utils import read_json, utc_ts, write_json
+
+STAGES = ("source", "download", "highlight", "render", "subtitles", "burn", "upload")
+MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "3"))
+
+# mode -> (state key of used source ids, how many to keep)
+USED_KEYS = {"vods": ("used_vods", 100), "clips": ("used_clips", 150)}
+
+
+def update_state(
+    state_path: str, fn: Callable[[Dict[str, Any]], None]
+) -> Dict[str, Any]:
+    """
+    Read-modify-write of state.json.
+    """
+    state = read_json(state_path, {})
+    fn(state)
+    state["updated_at"] = utc_ts()
+    write_json(state_path, state)
+    return state
+
+
+def _add_used(state: Dict[str, Any], mode: str, ids: List[str]) -> None:
+    key, keep = USED_KEYS.get(mode, USED_KEYS["vods"])
+    ids = [i for i in ids if i]
+    used = [i for i in state.get(key, []) if i not in ids]
+    state[key] = (used + ids)[-keep:]
+
+
+def mark_used(state_path: str, mode: str, ids: List[str]) -> None:
+    update_state(state_path, lambda state: _add_used(state, mode, ids))
+
+
+class JobCheckpoint:
+    """
+    One broadcaster's in-flight job. Stage data is written through to
+    state.json on every change.
+    """
+
+    def __init__(self, state_path: str, broadcaster_id: str, job: Dict[str, Any]):
+        self.state_path = state_path
+        self.broadcaster_id = broadcaster_id
+        self.job = job
+
+    @classmethod
+    def start(
+        cls, state_path: str, broadcaster_id: str, mode: str, **source: Any
+    ) -> "JobCheckpoint":
+        job = {
+            "mode": mode,
+            "started_at": utc_ts(),
+            "attempts": 1,
+            "stages": {"source": {"done": True, **source}},
+        }
+        ck = cls(state_path, broadcaster_id, job)
+        ck._write()
+        return ck
+
+    @classmethod
+    def resume(
+        cls, state_path: str, mode: str, broadcaster_id: Optional[str] = None
+    ) -> Optional["JobCheckpoint"]:
+        """
+        The oldest unfinished job for this mode (and broadcaster, if given),
+        with its attempt counter bumped.
+
+        Jobs left by another mode count the run against their attempts too, so
+        one whose mode no longer runs is given up on (source marked used) after
+        MAX_ATTEMPTS instead of sitting in state.json forever.
+        """
+        jobs = read_json(state_path, {}).get("jobs", {})
+        if not any(not broadcaster_id or bid == broadcaster_id for bid in jobs):
+            return None
+
+        picked: Dict[str, Dict[str, Any]] = {}
+
+        def _resume(state: Dict[str, Any]) -> None:
+            jobs = state.get("jobs", {})
+            mine = {
+                bid: job
+                for bid, job in jobs.items()
+                if not broadcaster_id or bid == broadcaster_id
+            }
+            pending = [
+                (job.get("started_at") or "", bid)
+                for bid, job in mine.items()
+                if job.get("mode") == mode
+            ]
+            if pending:
+                bid = min(pending)[1]
+                picked[bid] = mine[bid]
+            for bid, job in mine.items():
+                if job.get("mode") == mode and bid not in picked:
+                    continue
+                job["attempts"] = int(job.get("attempts", 1)) + 1
+                # the picked job's cap is checked by the caller
+                if bid in picked or job["attempts"] <= MAX_ATTEMPTS:
+                    continue
+                source_id = str(job["stages"].get("source", {}).get("id") or "")
+                print(f"🪦 Giving up on {job.get('mode')} job {source_id}")
+                del jobs[bid]
+                _add_used(state, job.get("mode", ""), [source_id])
+
+        update_state(state_path, _resume)
+        if not picked:
+            return None
+        ((bid, job),) = picked.items()
+        return cls(state_path, bid, job)
+
+    @property
+    def attempts(self) -> int:
+        return int(self.job.get("attempts", 1))
+
+    @property
+    def next_stage(self) -> str:
+        for stage in STAGES:
+            if not self.done(stage):
+                return stage
+        return "finished"
+
+    def done(self, stage: str) -> bool:
+        return bool(self.data(stage).get("done"))
+
+    def data(self, stage: str) -> Dict[str, Any]:
+        return self.job["stages"].get(stage, {})
+
+    def note(self, stage: str, **data: Any) -> None:
+        """
+        Record progress within a stage without completing it.
+        """
+        self.job["stages"].setdefault(stage, {}).update(data)
+        self._write()
+
+    def complete(self, stage: str, **data: Any) -> None:
+        self.job["stages"].setdefault(stage, {}).update(data, done=True)
+        self._write()
+
+    def finish(self) -> None:
+        """
+        Drop the job and mark its source used (also used to give up on it).
+        """
+        source_id = str(self.data("source").get("id") or "")
+
+        def _finish(state: Dict[str, Any]) -> None:
+            state.get("jobs", {}).pop(self.broadcaster_id, None)
+            _add_used(state, self.job.get("mode", ""), [source_id])
+
+        update_state(self.state_path, _finish)
+
+    def _write(self) -> None:
+        def _put(state: Dict[str, Any]) -> None:
+            state.setdefault("jobs", {})[self.broadcaster_id] = self.job
+
+        update_state(self.state_path, _put)
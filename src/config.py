@@ -2,6 +2,8 @@ import os
 from dataclasses import dataclass
 from dotenv import load_dotenv
 
+from .sharding import owned_broadcasters
+
 load_dotenv()
 
 
@@ -9,16 +11,21 @@ load_dotenv()
 class Settings:
     twitch_client_id: str
     twitch_client_secret: str
-    broadcaster_ids: list[str]
+    broadcaster_ids: list[str]  # owned by this node (all of them unsharded)
+    all_broadcaster_ids: list[str]
+    node_id: int
+    node_count: int
 
     highlight_min_sec: int
     highlight_max_sec: int
+    highlight_weights: dict[str, float]
 
     brand_name: str
 
     root_dir: str
     assets_dir: str
     cache_dir: str
+    shard_dir: str
     twitch_cache_dir: str
     vod_dir: str
     audio_dir: str
@@ -29,6 +36,11 @@ class Settings:
     subscribe_path: str
     interval_hours: int
 
+    metrics_textfile: str
+    profile_stages: list[str]
+    profile_mode: str
+    profile_tracemalloc: bool
+
 
 def _split_csv(value: str) -> list[str]:
     items = []
@@ -39,32 +51,63 @@ def _split_csv(value: str) -> list[str]:
     return items
 
 
+def _parse_weights(value: str) -> dict[str, float]:
+    """
+    "flux=0.3,scene=0.35" -> {"flux": 0.3, "scene": 0.35}
+    """
+    out: dict[str, float] = {}
+    for item in _split_csv(value):
+        key, sep, num = item.partition("=")
+        if not sep:
+            raise ValueError(f"Bad weight {item!r}, expected name=value")
+        out[key.strip()] = float(num)
+    return out
+
+
 def get_settings() -> Settings:
     root = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
 
-    cache_dir = os.path.join(root, "cache")
+    # both overridable so a run can be isolated (e.g. benchmarks/e2e.py)
+    cache_dir = os.getenv("STREAMFLARE_CACHE_DIR") or os.path.join(root, "cache")
+
+    # sharded: per-broadcaster state under shard_dir, everything else per node
+    node_count = max(int(os.getenv("SHARD_NODE_COUNT", "1")), 1)
+    node_id = int(os.getenv("SHARD_NODE_ID", "0"))
+    if not 0 <= node_id < node_count:
+        raise ValueError(f"SHARD_NODE_ID {node_id} not in 0..{node_count - 1}")
+    shard_dir = os.getenv("STREAMFLARE_SHARD_DIR") or os.path.join(cache_dir, "shards")
+    if node_count > 1:
+        cache_dir = os.path.join(cache_dir, "nodes", str(node_id))
+
     twitch_cache = os.path.join(cache_dir, "twitch")
     vod_dir = os.path.join(twitch_cache, "vods")
     audio_dir = os.path.join(twitch_cache, "audio")
     renders_dir = os.path.join(cache_dir, "renders")
     logs_dir = os.path.join(cache_dir, "logs")
-    assets_dir = os.path.join(root, "assets")
+    assets_dir = os.getenv("STREAMFLARE_ASSETS_DIR") or os.path.join(root, "assets")
 
     os.makedirs(vod_dir, exist_ok=True)
     os.makedirs(audio_dir, exist_ok=True)
     os.makedirs(renders_dir, exist_ok=True)
     os.makedirs(logs_dir, exist_ok=True)
 
+    broadcaster_ids = _split_csv(os.getenv("TWITCH_BROADCASTER_IDS", ""))
+
     return Settings(
         twitch_client_id=os.getenv("TWITCH_CLIENT_ID", "").strip(),
         twitch_client_secret=os.getenv("TWITCH_CLIENT_SECRET", "").strip(),
-        broadcaster_ids=_split_csv(os.getenv("TWITCH_BROADCASTER_IDS", "")),
+        broadcaster_ids=owned_broadcasters(broadcaster_ids, node_id, node_count),
+        all_broadcaster_ids=broadcaster_ids,
+        node_id=node_id,
+        node_count=node_count,
         highlight_min_sec=int(os.getenv("HIGHLIGHT_MIN_SEC", "40")),
         highlight_max_sec=int(os.getenv("HIGHLIGHT_MAX_SEC", "60")),
+        highlight_weights=_parse_weights(os.getenv("HIGHLIGHT_WEIGHTS", "")),
         brand_name=os.getenv("BRAND_NAME", "Stream Flare").strip(),
         root_dir=root,
         assets_dir=assets_dir,
         cache_dir=cache_dir,
+        shard_dir=shard_dir,
         twitch_cache_dir=twitch_cache,
         vod_dir=vod_dir,
         audio_dir=audio_dir,
@@ -73,4 +116,10 @@ def get_settings() -> Settings:
         logo_path=os.path.join(assets_dir, "logo.png"),
         subscribe_path=os.path.join(assets_dir, "subscribe.png"),
         interval_hours=int(os.getenv("UPLOAD_INTERVAL_HOURS", "15")),
+        metrics_textfile=os.getenv(
+            "METRICS_TEXTFILE", os.path.join(logs_dir, "streamflare.prom")
+        ).strip(),
+        profile_stages=_split_csv(os.getenv("PROFILE_STAGES", "")),
+        profile_mode=os.getenv("PROFILE_MODE", "cprofile").strip().lower(),
+        profile_tracemalloc=os.getenv("PROFILE_TRACEMALLOC", "false").lower() == "true",
     )
@@ -0,0 +1,300 @@
+# src/dedup.py
+"""
+Near-duplicate detection for published shorts.
+
+Every published short gets a compact fingerprint of its *source* range (the
+rendered file has crops and overlays, so hashing the source keeps clips, VOD
+cuts and earlier shorts comparable):
+
+- one 64-bit dHash per second of video (frames averaged over the second)
+- one 32-bit band-energy hash per second of audio (sign of adjacent band
+  differences, as in Haitsma/Kalker, without the temporal term)
+
+Frame hashes go into a BK-tree so a candidate is matched by Hamming radius
+lookups instead of a scan of every stored second; audio confirms the hit.
+"""
+
+import os
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from .audio_stream import iter_ffmpeg_pcm
+from .metrics import annotate, timed
+from .utils import read_json, utc_ts, write_json
+
+FRAME_RADIUS = int(os.getenv("DEDUP_FRAME_RADIUS", "10"))  # of 64 bits
+AUDIO_RADIUS = int(os.getenv("DEDUP_AUDIO_RADIUS", "11"))  # of 32 bits
+MIN_OVERLAP = float(os.getenv("DEDUP_MIN_OVERLAP", "0.5"))
+MIN_MATCH_SEC = 5
+MAX_ENTRIES = int(os.getenv("DEDUP_MAX_ENTRIES", "2000"))
+
+FRAMES_PER_SEC = 4
+AUDIO_SR = 8000
+AUDIO_BANDS = 33  # 33 bands -> 32 difference bits
+AUDIO_BAND_HZ = (300.0, 3000.0)
+AUDIO_FLOOR = 1e-4
+
+
+@dataclass
+class Fingerprint:
+    frames: List[int] = field(default_factory=list)  # 64-bit dHash per second
+    audio: List[int] = field(default_factory=list)  # 32-bit hash per second
+
+
+def hamming(a: int, b: int) -> int:
+    return (a ^ b).bit_count()
+
+
+def _dhash(gray: np.ndarray) -> int:
+    # gray is 8 rows x 9 cols; one bit per horizontal neighbour comparison
+    bits = (gray[:, 1:] > gray[:, :-1]).ravel()
+    return int(np.packbits(bits).view(">u8")[0])
+
+
+def _frame_hashes(video_path: str, start_sec: float, duration_sec: float) -> List[int]:
+    import cv2
+
+    cap = cv2.VideoCapture(video_path)
+    if not cap.isOpened():
+        raise RuntimeError(f"Cannot open video: {video_path}")
+
+    fps = cap.get(cv2.CAP_PROP_FPS) or 30.0
+    step = max(int(round(fps / FRAMES_PER_SEC)), 1)
+    if start_sec > 0:
+        cap.set(cv2.CAP_PROP_POS_MSEC, start_sec * 1000.0)
+
+    hashes: List[int] = []
+    acc = np.zeros((8, 9), dtype=np.float64)
+    n_acc = 0
+    total = int(duration_sec * fps)
+    for i in range(total):
+        if not cap.grab():
+            break
+        if i % step == 0:
+            ok, frame = cap.retrieve()
+            if ok:
+                gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+                acc += cv2.resize(gray, (9, 8), interpolation=cv2.INTER_AREA)
+                n_acc += 1
+        # averaging a whole second keeps hashes stable when two sources are
+        # sampled a fraction of a second apart
+        if (i + 1) % int(round(fps)) == 0 and n_acc:
+            hashes.append(_dhash(acc / n_acc))
+            acc[:] = 0.0
+            n_acc = 0
+
+    cap.release()
+    return hashes
+
+
+def _audio_hashes(video_path: str, start_sec: float, duration_sec: float) -> List[int]:
+    n_fft, hop = 512, 256
+    window = np.hanning(n_fft).astype(np.float32)
+    freqs = np.fft.rfftfreq(n_fft, 1.0 / AUDIO_SR)
+    edges = np.geomspace(AUDIO_BAND_HZ[0], AUDIO_BAND_HZ[1], AUDIO_BANDS + 1)
+    band_of = np.digitize(freqs, edges) - 1
+    in_band = (band_of >= 0) & (band_of < AUDIO_BANDS)
+
+    hashes: List[int] = []
+    weights = 1 << np.arange(AUDIO_BANDS - 2, -1, -1, dtype=np.int64)
+    # one-second blocks line up with the frame hashes
+    for block in iter_ffmpeg_pcm(
+        video_path, sr=AUDIO_SR, start_sec=start_sec, max_sec=duration_sec, block_sec=1
+    ):
+        if block.size < AUDIO_SR:
+            break
+        frames = np.lib.stride_tricks.sliding_window_view(block, n_fft)[::hop]
+        power = np.mean(np.abs(np.fft.rfft(frames * window, axis=1)) ** 2, axis=0)
+        energy = np.bincount(
+            band_of[in_band], weights=power[in_band], minlength=AUDIO_BANDS
+        )
+        # spectral shape only (no frame-to-frame term): a second averaged from
+        # a slightly different phase keeps nearly the same bits. The floor
+        # stops leakage-level noise in empty bands from flipping bits.
+        log_e = np.round(np.log10(energy + AUDIO_FLOOR), 1)
+        bits = log_e[:-1] > log_e[1:]
+        hashes.append(int(bits.astype(np.int64) @ weights))
+    return hashes
+
+
+@timed("dedup.fingerprint")
+def fingerprint_range(
+    video_path: str, start_sec: float = 0.0, duration_sec: float = 60.0
+) -> Fingerprint:
+    """
+    Per-second frame and audio hashes of [start_sec, start_sec + duration_sec).
+    """
+    fp = Fingerprint(
+        frames=_frame_hashes(video_path, start_sec, duration_sec),
+        audio=_audio_hashes(video_path, start_sec, duration_sec),
+    )
+    annotate(source_sec=len(fp.frames))
+    return fp
+
+
+class BKTree:
+    """
+    Burkhard-Keller tree over 64-bit hashes under Hamming distance. Radius
+    queries only descend into children whose edge distance can still be within
+    range (triangle inequality), so lookups touch a small part of the tree.
+    """
+
+    def __init__(self) -> None:
+        # node = [hash, payloads, {distance: child}]
+        self.root: Optional[List[Any]] = None
+        self.size = 0
+
+    def add(self, h: int, payload: Any) -> None:
+        self.size += 1
+        if self.root is None:
+            self.root = [h, [payload], {}]
+            return
+        node = self.root
+        while True:
+            d = hamming(h, node[0])
+            if d == 0:
+                node[1].append(payload)
+                return
+            child = node[2].get(d)
+            if child is None:
+                node[2][d] = [h, [payload], {}]
+                return
+            node = child
+
+    def search(self, h: int, radius: int) -> List[Tuple[int, Any]]:
+        """
+        (distance, payload) for every stored hash within radius of h.
+        """
+        out: List[Tuple[int, Any]] = []
+        stack = [self.root] if self.root is not None else []
+        while stack:
+            node = stack.pop()
+            d = hamming(h, node[0])
+            if d <= radius:
+                out.extend((d, p) for p in node[1])
+            for edge, child in node[2].items():
+                if d - radius <= edge <= d + radius:
+                    stack.append(child)
+        return out
+
+
+class DedupIndex:
+    """
+    Fingerprints of published shorts, persisted as JSON. Only the newest
+    max_entries are kept; the BK-tree is rebuilt on load.
+    """
+
+    def __init__(self, path: str, max_entries: int = MAX_ENTRIES) -> None:
+        self.path = path
+        self.max_entries = max_entries
+        self.entries: List[Dict[str, Any]] = read_json(path, {"entries": []}).get(
+            "entries", []
+        )[-max_entries:]
+        self.tree = BKTree()
+        for idx, e in enumerate(self.entries):
+            self._index(idx, e)
+
+    def _index(self, idx: int, entry: Dict[str, Any]) -> None:
+        for sec, hx in enumerate(entry.get("frames", [])):
+            self.tree.add(int(hx, 16), (idx, sec))
+
+    def find_source(
+        self, vod_id: str, start_sec: float, end_sec: float
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Entry cut from the same VOD range (overlap >= MIN_OVERLAP of the shorter).
+        Needs no media, so it can run before anything is downloaded.
+        """
+        if not vod_id or end_sec <= start_sec:
+            return None
+        for e in reversed(self.entries):
+            src = e.get("source") or {}
+            if str(src.get("vod_id") or "") != str(vod_id):
+                continue
+            a, b = float(src.get("start_sec", 0.0)), float(src.get("end_sec", 0.0))
+            overlap = min(b, end_sec) - max(a, start_sec)
+            shorter = min(b - a, end_sec - start_sec)
+            if shorter > 0 and overlap >= MIN_OVERLAP * shorter:
+                return e
+        return None
+
+    def find(self, fp: Fingerprint) -> Optional[Dict[str, Any]]:
+        """
+        Entry whose frames line up with fp for at least MIN_OVERLAP of the
+        shorter of the two (and MIN_MATCH_SEC seconds), confirmed by audio
+        where both sides have it.
+        """
+        if not fp.frames:
+            return None
+
+        # entry -> candidate second -> offsets (entry sec - candidate sec) hit
+        hits: Dict[int, Dict[int, set]] = {}
+        for i, h in enumerate(fp.frames):
+            for _, (idx, sec) in self.tree.search(h, FRAME_RADIUS):
+                hits.setdefault(idx, {}).setdefault(i, set()).add(sec - i)
+
+        best: Optional[Tuple[int, int, int]] = None  # (votes, idx, offset)
+        for idx, per_sec in hits.items():
+            offsets = set().union(*per_sec.values())
+            for off in offsets:
+                # +-1s slack: the two sources may be sampled out of phase
+                votes = sum(
+                    1 for offs in per_sec.values() if offs & {off - 1, off, off + 1}
+                )
+                if best is None or votes > best[0]:
+                    best = (votes, idx, off)
+
+        if best is None:
+            return None
+        votes, idx, off = best
+        entry = self.entries[idx]
+        shorter = min(len(fp.frames), len(entry.get("frames", [])))
+        if votes < max(MIN_MATCH_SEC, MIN_OVERLAP * shorter):
+            return None
+        if not self._audio_agrees(fp.audio, entry.get("audio", []), off):
+            return None
+        return entry
+
+    @staticmethod
+    def _audio_agrees(cand: List[int], stored: List[int], off: int) -> bool:
+        pairs = [
+            (cand[i], stored[i + off])
+            for i in range(len(cand))
+            if 0 <= i + off < len(stored)
+        ]
+        if not pairs:
+            return True  # no audio on one side; the frame match stands
+        close = sum(1 for a, b in pairs if hamming(a, b) <= AUDIO_RADIUS)
+        return close >= MIN_OVERLAP * len(pairs)
+
+    def add(
+        self,
+        short_id: str,
+        fp: Fingerprint,
+        vod_id: str = "",
+        start_sec: float = 0.0,
+        end_sec: float = 0.0,
+        **meta: Any,
+    ) -> None:
+        entry = {
+            "id": short_id,
+            "created_at": utc_ts(),
+            "source": {"vod_id": vod_id, "start_sec": start_sec, "end_sec": end_sec},
+            "frames": [f"{h:016x}" for h in fp.frames],
+            "audio": fp.audio,
+            **meta,
+        }
+        self.entries.append(entry)
+        if len(self.entries) > self.max_entries:
+            # indices shift when trimming, so rebuild rather than patch the tree
+            self.entries = self.entries[-self.max_entries :]
+            self.tree = BKTree()
+            for idx, e in enumerate(self.entries):
+                self._index(idx, e)
+        else:
+            self._index(len(self.entries) - 1, entry)
+
+    def save(self) -> None:
+        write_json(self.path, {"entries": self.entries})
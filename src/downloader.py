@@ -1,9 +1,21 @@
 import os
-import subprocess
+import re
 import sys
 from dataclasses import dataclass
+from typing import Optional
 
-from .utils import safe_filename, sha1
+from .metrics import annotate, timed
+from .subproc import run_tool
+from .utils import (
+    media_duration_sec,
+    read_json,
+    safe_filename,
+    sha1,
+    utc_ts,
+    write_json,
+)
+
+MANIFEST_NAME = "manifest.json"
 
 
 @dataclass
@@ -20,8 +32,12 @@ def _yt_dlp_cmd():
     return [sys.executable, "-m", "yt_dlp"]
 
 
+@timed("downloader.vod")
 def download_twitch_vod(
-    vod_url: str, out_dir: str, prefer_height: int = 720
+    vod_url: str,
+    out_dir: str,
+    prefer_height: int = 720,
+    manifest_path: Optional[str] = None,
 ) -> DownloadResult:
     os.makedirs(out_dir, exist_ok=True)
 
@@ -37,7 +53,7 @@ def download_twitch_vod(
         vod_url,
     ]
 
-    p = subprocess.run(cmd, capture_output=True, text=True)
+    p = run_tool(cmd, "download")
     if p.returncode != 0:
         raise RuntimeError(f"yt-dlp failed:\n{p.stderr}")
 
@@ -58,9 +74,87 @@ def download_twitch_vod(
         os.replace(downloaded, safe_path)
         downloaded = safe_path
 
+    duration = media_duration_sec(downloaded)
+    annotate(source_sec=duration)
+    _record_vod(out_dir, vod_url, downloaded, duration, manifest_path)
     return DownloadResult(vod_path=downloaded, vod_url=vod_url)
 
 
+def _twitch_video_id(vod_url: str) -> str:
+    m = re.search(r"/videos/(\d+)", vod_url)
+    return m.group(1) if m else ""
+
+
+def _record_vod(
+    out_dir: str,
+    vod_url: str,
+    path: str,
+    duration_sec: float,
+    manifest_path: Optional[str] = None,
+) -> None:
+    """
+    Remember which Twitch video a downloaded file is, so clips of that video
+    can be cut locally later (see find_cached_vod). manifest_path defaults to
+    out_dir/manifest.json; sharded runs keep one per broadcaster.
+    """
+    video_id = _twitch_video_id(vod_url)
+    if not video_id:
+        return
+    manifest_path = manifest_path or os.path.join(out_dir, MANIFEST_NAME)
+    manifest = read_json(manifest_path, {})
+    manifest[video_id] = {
+        "file": os.path.basename(path),
+        "path": os.path.abspath(path),
+        "url": vod_url,
+        "duration_sec": duration_sec,
+        "downloaded_at": utc_ts(),
+    }
+    write_json(manifest_path, manifest)
+
+
+def find_cached_vod(
+    video_id: str,
+    out_dir: str,
+    min_duration_sec: float = 0.0,
+    manifest_path: Optional[str] = None,
+) -> DownloadResult | None:
+    """
+    Already-downloaded VOD for a Twitch video id, from the download manifest or
+    by the file naming download_twitch_vod uses. No network I/O.
+
+    min_duration_sec rejects a copy that is too short, e.g. one downloaded while
+    the stream was still live. Unknown durations are trusted.
+    """
+    if not video_id or not os.path.isdir(out_dir):
+        return None
+
+    result = None
+    duration = 0.0
+    manifest_path = manifest_path or os.path.join(out_dir, MANIFEST_NAME)
+    entry = read_json(manifest_path, {}).get(str(video_id)) or {}
+    # the file may sit in another node's cache; only a path we can read counts
+    paths = [os.path.join(out_dir, entry.get("file", "")), entry.get("path", "")]
+    path = next((p for p in paths if p and os.path.isfile(p)), "")
+    if path:
+        result = DownloadResult(vod_path=path, vod_url=entry.get("url", ""))
+        duration = float(entry.get("duration_sec") or 0.0)
+    else:
+        # older downloads predate the manifest; they are keyed by the VOD URL
+        vod_url = f"https://www.twitch.tv/videos/{video_id}"
+        path = _find_cached(out_dir, sha1(vod_url))
+        if path and not path.endswith((".part", ".ytdl")):
+            result = DownloadResult(vod_path=path, vod_url=vod_url)
+
+    if result is None:
+        return None
+    if min_duration_sec > 0:
+        duration = duration or media_duration_sec(result.vod_path)
+        if duration and duration < min_duration_sec:
+            return None
+    return result
+
+
+@timed("downloader.clip")
 def download_twitch_clip(clip_url: str, out_dir: str) -> DownloadResult:
     os.makedirs(out_dir, exist_ok=True)
 
@@ -75,7 +169,7 @@ def download_twitch_clip(clip_url: str, out_dir: str) -> DownloadResult:
         clip_url,
     ]
 
-    p = subprocess.run(cmd, capture_output=True, text=True)
+    p = run_tool(cmd, "download_clip")
     if p.returncode != 0:
         raise RuntimeError(f"yt-dlp clip failed:\n{p.stderr}")
 
@@ -86,6 +180,72 @@ def download_twitch_clip(clip_url: str, out_dir: str) -> DownloadResult:
             safe_path = os.path.join(out_dir, safe)
             if safe_path != path:
                 os.replace(path, safe_path)
+            annotate(source_sec=media_duration_sec(safe_path))
             return DownloadResult(vod_path=safe_path, vod_url=clip_url)
 
     raise RuntimeError("Clip download failed")
+
+
+def _find_cached(out_dir: str, key: str, suffix: str = "") -> str | None:
+    for name in sorted(os.listdir(out_dir)):
+        if name.startswith(key + "_") and name.endswith(suffix):
+            return os.path.join(out_dir, name)
+    return None
+
+
+@timed("downloader.chat")
+def download_twitch_chat(vod_url: str, out_dir: str) -> str:
+    """
+    Fetch the VOD's chat replay (yt-dlp "rechat" subtitle track) as JSON.
+    Only the chat is downloaded, never the video. Cached by VOD URL.
+    """
+    os.makedirs(out_dir, exist_ok=True)
+
+    key = sha1(vod_url)
+    cached = _find_cached(out_dir, key, ".json")
+    if cached:
+        return cached
+
+    out_template = os.path.join(out_dir, f"{key}_%(id)s.%(ext)s")
+
+    cmd = _yt_dlp_cmd() + [
+        "--skip-download",
+        "--write-subs",
+        "--sub-langs",
+        "rechat",
+        "--sub-format",
+        "json",
+        "-o",
+        out_template,
+        vod_url,
+    ]
+
+    p = run_tool(cmd, "chat_download")
+    if p.returncode != 0:
+        raise RuntimeError(f"yt-dlp chat failed:\n{p.stderr}")
+
+    path = _find_cached(out_dir, key, ".json")
+    if not path:
+        raise RuntimeError("Chat replay not available for this VOD.")
+    return path
+
+
+def resolve_live_hls_url(channel_url: str, prefer_height: int = 720) -> str:
+    """
+    Media playlist URL of a live channel, for ffmpeg to record from.
+    """
+    cmd = _yt_dlp_cmd() + [
+        "-g",
+        "-f",
+        f"best[height<={prefer_height}]/best",
+        channel_url,
+    ]
+
+    p = run_tool(cmd, "live_resolve")
+    if p.returncode != 0:
+        raise RuntimeError(f"yt-dlp live resolve failed:\n{p.stderr}")
+
+    urls = [line.strip() for line in p.stdout.splitlines() if line.strip()]
+    if not urls:
+        raise RuntimeError("Live stream URL not found (channel offline?)")
+    return urls[0]
@@ -1,13 +1,45 @@
 import os
-import subprocess
-from dataclasses import dataclass
+import time
+from dataclasses import asdict, dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
 
+from .encode_policy import DEFAULT as DEFAULT_ENCODER, EncoderSettings
+from .metrics import annotate, timed
+from .subproc import run_tool
 from .utils import safe_filename
 
 
 @dataclass
 class RenderResult:
     output_path: str
+    # layout name -> path for outputs beyond the main vertical one
+    extra_paths: Dict[str, str] = field(default_factory=dict)
+    # encoder settings used plus measured wall time, speed and output size
+    encode: Dict[str, Any] = field(default_factory=dict)
+
+
+@dataclass(frozen=True)
+class Layout:
+    """
+    One output format: blurred fill + fitted foreground + logo/subscribe
+    overlays, with its own base CRF (the encoder settings adjust it).
+    """
+
+    name: str
+    width: int
+    height: int
+    fg_width: int
+    fg_height: int
+    crf: int = 20
+    logo_w: int = 170
+    sub_w: int = 220
+
+
+LAYOUTS: Dict[str, Layout] = {
+    "vertical": Layout("vertical", 1080, 1920, 940, 1680),
+    "square": Layout("square", 1080, 1080, 1000, 1000, crf=21),
+    "landscape": Layout("landscape", 1920, 1080, 1920, 1080, crf=21),
+}
 
 
 def _ffmpeg_escape_path(p: str) -> str:
@@ -15,6 +47,47 @@ def _ffmpeg_escape_path(p: str) -> str:
     return p.replace("\\", "/").replace(":", "\\:")
 
 
+def _layout_chain(
+    i: int, lay: Layout, src: str, logo: str, sub: str, subtitles_path: str | None
+) -> Tuple[str, str]:
+    """
+    Filter chain for one layout from already-split inputs; returns (chain, label).
+    """
+    w, h = lay.width, lay.height
+    chain = (
+        f"{src}split=2[bgsrc{i}][fgsrc{i}];"
+        f"[bgsrc{i}]scale={w}:{h}:force_original_aspect_ratio=increase,"
+        f"crop={w}:{h},gblur=sigma=25[bg{i}];"
+        f"[fgsrc{i}]scale={lay.fg_width}:{lay.fg_height}"
+        f":force_original_aspect_ratio=decrease[fg{i}];"
+        f"[bg{i}][fg{i}]overlay=(W-w)/2:(H-h)/2[base{i}];"
+        f"{logo}scale={lay.logo_w}:-1[logo{i}];"
+        f"{sub}scale={lay.sub_w}:-1[sub{i}];"
+        f"[base{i}][logo{i}]overlay=40:40[tmp{i}];"
+        f"[tmp{i}][sub{i}]overlay=W-w-40:H-h-60[v{i}]"
+    )
+    label = f"[v{i}]"
+
+    # If subtitles enabled, apply on [vN] and output as [vsN]
+    if subtitles_path:
+        sub_file = _ffmpeg_escape_path(subtitles_path)
+        chain += (
+            f";{label}subtitles='{sub_file}':"
+            "force_style='Fontsize=14,PrimaryColour=&HFFFFFF&,OutlineColour=&H000000&,Outline=2,Alignment=2'"
+            f"[vs{i}]"
+        )
+        label = f"[vs{i}]"
+    return chain, label
+
+
+def _split(label: str, name: str, n: int) -> Tuple[str, List[str]]:
+    if n == 1:
+        return "", [label]
+    outs = [f"[{name}{k}]" for k in range(n)]
+    return f"{label}split={n}{''.join(outs)};", outs
+
+
+@timed("editor.render")
 def render_shorts(
     input_path: str,
     output_path: str,
@@ -23,75 +96,112 @@ def render_shorts(
     logo_path: str,
     subscribe_path: str,
     subtitles_path: str | None = None,
+    threads: int = 0,
+    extra_outputs: Optional[Dict[str, str]] = None,
+    encoder: Optional[EncoderSettings] = None,
 ) -> RenderResult:
-    os.makedirs(os.path.dirname(output_path), exist_ok=True)
-
-    logo_w = 170
-    sub_w = 220
-
-    # Build base chain with labels
-    # End output labeled as [v]
-    base_vf = (
-        "[0:v]scale=1080:1920:force_original_aspect_ratio=increase,crop=1080:1920,"
-        "gblur=sigma=25[bg];"
-        "[0:v]scale=940:1680:force_original_aspect_ratio=decrease[fg];"
-        "[bg][fg]overlay=(W-w)/2:(H-h)/2[base];"
-        f"[1:v]scale={logo_w}:-1[logo];"
-        f"[2:v]scale={sub_w}:-1[sub];"
-        "[base][logo]overlay=40:40[tmp];"
-        "[tmp][sub]overlay=W-w-40:H-h-60[v]"
+    """
+    Render the vertical short to output_path, plus any extra_outputs
+    ({layout name: path}, see LAYOUTS) in the same ffmpeg run: the source is
+    decoded once and split into each layout's chain and encoder.
+
+    threads > 0 caps both the filter graph and libx264 at that many threads, so
+    several renders can share a host without oversubscribing it (see
+    render_pool). 0 keeps ffmpeg's defaults.
+
+    encoder picks preset / CRF offset / frame rate (see encode_policy); None
+    keeps the fixed defaults.
+    """
+    enc = encoder or DEFAULT_ENCODER
+    outputs = [(LAYOUTS["vertical"], output_path)]
+    for name, path in (extra_outputs or {}).items():
+        if name not in LAYOUTS:
+            raise ValueError(f"Unknown layout: {name}")
+        outputs.append((LAYOUTS[name], path))
+
+    for _, path in outputs:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+    annotate(
+        source_sec=float(duration_sec),
+        threads=threads,
+        outputs=len(outputs),
+        preset=enc.preset,
     )
 
-    # If subtitles enabled, apply on [v] and output as [vs]
-    vf = base_vf
-    map_label = "[v]"
+    n = len(outputs)
+    vf_src, srcs = _split("[0:v]", "src", n)
+    vf_logo, logos = _split("[1:v]", "lg", n)
+    vf_sub, subs = _split("[2:v]", "sb", n)
+    chains, labels = [], []
+    for i, (lay, _) in enumerate(outputs):
+        chain, label = _layout_chain(i, lay, srcs[i], logos[i], subs[i], subtitles_path)
+        chains.append(chain)
+        labels.append(label)
+    vf = vf_src + vf_logo + vf_sub + ";".join(chains)
 
-    if subtitles_path:
-        sub_file = _ffmpeg_escape_path(subtitles_path)
-        vf += (
-            f";{map_label}subtitles='{sub_file}':"
-            "force_style='Fontsize=14,PrimaryColour=&HFFFFFF&,OutlineColour=&H000000&,Outline=2,Alignment=2'[vs]"
-        )
-        map_label = "[vs]"
+    thread_args = []
+    if threads > 0:
+        thread_args = ["-filter_complex_threads", str(threads)]
 
     cmd = [
         "ffmpeg",
         "-y",
+        *thread_args,
         "-ss",
         str(start_sec),
+        # on the input, so the range is decoded once and ends every output
+        "-t",
+        str(duration_sec),
         "-i",
         input_path,
         "-i",
         logo_path,
         "-i",
         subscribe_path,
-        "-t",
-        str(duration_sec),
         "-filter_complex",
         vf,
-        "-map",
-        map_label,
-        "-map",
-        "0:a?",
-        "-r",
-        "30",
-        "-c:v",
-        "libx264",
-        "-preset",
-        "veryfast",
-        "-crf",
-        "20",
-        "-c:a",
-        "aac",
-        "-b:a",
-        "128k",
-        "-movflags",
-        "+faststart",
-        output_path,
     ]
+    for (lay, path), label in zip(outputs, labels):
+        cmd += [
+            "-map",
+            label,
+            "-map",
+            "0:a?",
+            "-r",
+            str(enc.fps),
+            "-c:v",
+            "libx264",
+            "-preset",
+            enc.preset,
+            "-crf",
+            str(lay.crf + enc.crf_offset),
+            "-c:a",
+            "aac",
+            "-b:a",
+            "128k",
+            "-movflags",
+            "+faststart",
+        ]
+        if threads > 0:
+            cmd += ["-threads", str(threads)]
+        cmd.append(path)
 
-    p = subprocess.run(cmd, capture_output=True, text=True)
+    t0 = time.perf_counter()
+    p = run_tool(cmd, "render", total_sec=float(duration_sec))
     if p.returncode != 0:
         raise RuntimeError(f"ffmpeg render failed:\n{p.stderr}")
+    wall = time.perf_counter() - t0
 
-    return RenderResult(output_path=output_path)
+    return RenderResult(
+        output_path=output_path,
+        extra_paths={lay.name: path for lay, path in outputs[1:]},
+        encode={
+            **asdict(enc),
+            "duration_sec": float(duration_sec),
+            "outputs": len(outputs),
+            "wall_sec": round(wall, 3),
+            # output seconds (all formats) per wall second
+            "speed_x": round(float(duration_sec) * len(outputs) / max(wall, 1e-9), 3),
+            "output_bytes": sum(os.path.getsize(path) for _, path in outputs),
+        },
+    )
@@ -0,0 +1,143 @@
+# src/encode_policy.py
+"""
+Per-job libx264 settings from the render backlog, a time-to-publish target
+and the encoder speed measured on this host.
+
+The ladder runs from small-and-slow to large-and-fast. A job gets the slowest
+rung whose predicted finish (everything queued ahead of it plus its own
+encode) still fits ENCODE_TARGET_SEC, so an idle host spends time on smaller
+files and a backed-up one catches up. Speeds are learned from finished
+renders as an EWMA of output seconds per wall second, per preset. Presets
+not measured yet are extrapolated from measured ones through
+RELATIVE_SPEED. With no measurements at all, the old fixed settings
+(veryfast, CRF 20, 30 fps) are used.
+
+    ENCODE_POLICY          "adaptive" (default) or "fixed"
+    ENCODE_TARGET_SEC      time-to-publish budget per job (default 600)
+    ENCODE_SLOWEST_PRESET  slowest preset the policy may pick (default medium)
+"""
+
+import os
+import threading
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional
+
+from .utils import read_json, utc_ts, write_json
+
+POLICY = os.getenv("ENCODE_POLICY", "adaptive").lower()
+TARGET_SEC = float(os.getenv("ENCODE_TARGET_SEC", "600"))
+SLOWEST_PRESET = os.getenv("ENCODE_SLOWEST_PRESET", "medium")
+EWMA_ALPHA = 0.3
+
+
+@dataclass(frozen=True)
+class EncoderSettings:
+    preset: str = "veryfast"
+    crf_offset: int = 0  # added to each layout's base CRF
+    fps: int = 30
+
+
+DEFAULT = EncoderSettings()
+
+# faster presets spend more bits at the same CRF, so the CRF is nudged up to
+# keep file sizes in check; the last rung also drops to 24 fps
+LADDER: List[EncoderSettings] = [
+    EncoderSettings("slow"),
+    EncoderSettings("medium"),
+    EncoderSettings("fast"),
+    EncoderSettings("faster"),
+    EncoderSettings("veryfast"),
+    EncoderSettings("superfast", crf_offset=1),
+    EncoderSettings("ultrafast", crf_offset=2),
+    EncoderSettings("ultrafast", crf_offset=3, fps=24),
+]
+
+# rough libx264 speed relative to veryfast at 1080p, for unmeasured presets
+RELATIVE_SPEED = {
+    "slow": 0.3,
+    "medium": 0.5,
+    "fast": 0.6,
+    "faster": 0.8,
+    "veryfast": 1.0,
+    "superfast": 1.5,
+    "ultrafast": 2.2,
+}
+
+
+class EncodePolicy:
+    """
+    Chooses EncoderSettings per job and learns preset speeds from results.
+    Speeds persist as JSON next to the other cache state.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        target_sec: float = TARGET_SEC,
+        slowest: str = SLOWEST_PRESET,
+        adaptive: bool = POLICY == "adaptive",
+    ) -> None:
+        self.path = path
+        self.target_sec = target_sec
+        self.adaptive = adaptive
+        names = [e.preset for e in LADDER]
+        self.start = names.index(slowest) if slowest in names else 0
+        self.speeds: Dict[str, float] = read_json(path, {}).get("speed_x", {})
+        self._lock = threading.Lock()
+
+    def speed(self, preset: str) -> Optional[float]:
+        """
+        Output seconds encoded per wall second (measured or extrapolated).
+        """
+        if preset in self.speeds:
+            return float(self.speeds[preset])
+        if not self.speeds:
+            return None
+        # scale the measured preset closest in relative speed
+        rel = RELATIVE_SPEED.get(preset, 1.0)
+        known, sx = min(
+            self.speeds.items(),
+            key=lambda kv: abs(RELATIVE_SPEED.get(kv[0], 1.0) - rel),
+        )
+        return float(sx) * rel / RELATIVE_SPEED.get(known, 1.0)
+
+    def predict_sec(self, enc: EncoderSettings, work_sec: float) -> Optional[float]:
+        sx = self.speed(enc.preset)
+        if not sx:
+            return None
+        return work_sec / sx * enc.fps / 30.0
+
+    def choose(
+        self, duration_sec: float, outputs: int = 1, backlog_sec: float = 0.0
+    ) -> EncoderSettings:
+        """
+        Settings for one render of duration_sec into `outputs` formats, with
+        backlog_sec seconds of output already queued ahead of it.
+        """
+        if not self.adaptive or not self.speeds:
+            return DEFAULT
+        work = backlog_sec + duration_sec * outputs
+        with self._lock:
+            for enc in LADDER[self.start :]:
+                predicted = self.predict_sec(enc, work)
+                if predicted is not None and predicted <= self.target_sec:
+                    return enc
+        return LADDER[-1]
+
+    def record(self, stats: Dict[str, Any]) -> None:
+        """
+        Fold a finished render (RenderResult.encode) into the preset's speed.
+        """
+        wall = float(stats.get("wall_sec") or 0.0)
+        if wall <= 0:
+            return
+        work = float(stats.get("duration_sec", 0.0)) * int(stats.get("outputs", 1))
+        # normalise to 30 fps so fps-reduced rungs don't inflate the estimate
+        sx = work / wall * int(stats.get("fps", 30)) / 30.0
+        preset = str(stats.get("preset", DEFAULT.preset))
+        with self._lock:
+            old = self.speeds.get(preset)
+            self.speeds[preset] = round(
+                sx if old is None else (1 - EWMA_ALPHA) * old + EWMA_ALPHA * sx, 4
+            )
+            write_json(self.path, {"speed_x": self.speeds, "updated_at": utc_ts()})
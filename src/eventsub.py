@@ -0,0 +1,232 @@
+# src/eventsub.py
+"""
+Twitch EventSub webhook receiver.
+
+Notifications are verified (HMAC-SHA256 over message id + timestamp + body
+with EVENTSUB_SECRET), stale or replayed messages are dropped, and every
+verified event is handed to a callback with its type and broadcaster id.
+
+Local test without Twitch:
+    python -m src.scheduler                      # SCHEDULER_TRIGGER=events
+    python -m src.eventsub send stream.offline 12345
+"""
+
+import argparse
+import hashlib
+import hmac
+import json
+import os
+import threading
+import uuid
+from collections import deque
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Deque, Dict, List, Optional, Set
+
+import requests
+
+SECRET = os.getenv("EVENTSUB_SECRET", "")
+PORT = int(os.getenv("EVENTSUB_PORT", "8080"))
+PATH = os.getenv("EVENTSUB_PATH", "/eventsub")
+MAX_AGE_SEC = 600  # Twitch: reject notifications older than 10 minutes
+
+# stream.offline: the VOD is complete. EventSub has no clip-created event, so
+# new clips are found by the scheduler's polling fallback.
+EVENT_TYPES = ("stream.offline",)
+
+Handler = Callable[[str, str, Dict[str, Any]], None]
+
+
+def sign(secret: str, message_id: str, timestamp: str, body: bytes) -> str:
+    mac = hmac.new(
+        secret.encode("utf-8"),
+        message_id.encode("utf-8") + timestamp.encode("utf-8") + body,
+        hashlib.sha256,
+    )
+    return "sha256=" + mac.hexdigest()
+
+
+def _age_sec(timestamp: str) -> float:
+    # RFC3339 with nanoseconds, e.g. 2024-01-01T00:00:00.123456789Z
+    ts = timestamp.rstrip("Z").split(".")[0]
+    sent = datetime.strptime(ts, "%Y-%m-%dT%H:%M:%S").replace(tzinfo=timezone.utc)
+    return (datetime.now(timezone.utc) - sent).total_seconds()
+
+
+class EventSubVerifier:
+    """
+    Signature, freshness and replay checks for incoming messages.
+    """
+
+    def __init__(self, secret: str, remember: int = 2000) -> None:
+        if not secret:
+            raise ValueError("Missing EVENTSUB_SECRET")
+        self.secret = secret
+        self._seen: Set[str] = set()
+        self._order: Deque[str] = deque()
+        self._remember = remember
+        self._lock = threading.Lock()
+
+    def verify(self, headers: Dict[str, str], body: bytes) -> Optional[str]:
+        """
+        None if the message is genuine and new, otherwise the reason to reject.
+        """
+        msg_id = headers.get("twitch-eventsub-message-id", "")
+        timestamp = headers.get("twitch-eventsub-message-timestamp", "")
+        signature = headers.get("twitch-eventsub-message-signature", "")
+        if not (msg_id and timestamp and signature):
+            return "missing headers"
+
+        expected = sign(self.secret, msg_id, timestamp, body)
+        if not hmac.compare_digest(expected, signature):
+            return "bad signature"
+        try:
+            if _age_sec(timestamp) > MAX_AGE_SEC:
+                return "stale"
+        except ValueError:
+            return "bad timestamp"
+
+        with self._lock:
+            if msg_id in self._seen:
+                return "duplicate"
+            self._seen.add(msg_id)
+            self._order.append(msg_id)
+            if len(self._order) > self._remember:
+                self._seen.discard(self._order.popleft())
+        return None
+
+
+def _make_handler(verifier: EventSubVerifier, on_event: Handler) -> type:
+    class _Handler(BaseHTTPRequestHandler):
+        def do_POST(self) -> None:  # noqa: N802 (http.server API)
+            if self.path.split("?")[0] != PATH:
+                self._reply(404)
+                return
+
+            body = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+            headers = {k.lower(): v for k, v in self.headers.items()}
+            reason = verifier.verify(headers, body)
+            if reason:
+                # duplicates are acknowledged so Twitch stops retrying them
+                self._reply(200 if reason == "duplicate" else 403)
+                if reason != "duplicate":
+                    print(f"⚠️ EventSub message rejected: {reason}")
+                return
+
+            payload = json.loads(body or b"{}")
+            kind = headers.get("twitch-eventsub-message-type", "")
+            if kind == "webhook_callback_verification":
+                self._reply(200, str(payload.get("challenge", "")))
+                return
+            if kind == "revocation":
+                sub = payload.get("subscription", {})
+                print(
+                    "⚠️ EventSub subscription revoked:",
+                    sub.get("type"),
+                    sub.get("status"),
+                )
+                self._reply(204)
+                return
+
+            self._reply(204)
+            if kind == "notification":
+                event_type = payload.get("subscription", {}).get("type", "")
+                event = payload.get("event", {})
+                broadcaster_id = str(event.get("broadcaster_user_id") or "")
+                if event_type in EVENT_TYPES and broadcaster_id:
+                    on_event(event_type, broadcaster_id, event)
+
+        def _reply(self, code: int, text: str = "") -> None:
+            data = text.encode("utf-8")
+            self.send_response(code)
+            self.send_header("Content-Type", "text/plain")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            if data:
+                self.wfile.write(data)
+
+        def log_message(self, format: str, *args: Any) -> None:
+            return  # keep the scheduler output readable
+
+    return _Handler
+
+
+def start_receiver(
+    on_event: Handler, secret: str = SECRET, port: int = PORT
+) -> ThreadingHTTPServer:
+    """
+    Serve the webhook on a daemon thread; call .shutdown() to stop. Port 0
+    binds a free port (see server.server_address).
+    """
+    server = ThreadingHTTPServer(
+        ("", port), _make_handler(EventSubVerifier(secret), on_event)
+    )
+    threading.Thread(target=server.serve_forever, name="eventsub", daemon=True).start()
+    print(f"📡 EventSub receiver on :{server.server_address[1]}{PATH}")
+    return server
+
+
+def subscribe(
+    twitch: Any, broadcaster_ids: List[str], callback_url: str, secret: str = SECRET
+) -> None:
+    """
+    Create stream.offline webhook subscriptions (existing ones are left alone).
+    """
+    for broadcaster_id in broadcaster_ids:
+        try:
+            twitch.create_eventsub_subscription(
+                "stream.offline",
+                {"broadcaster_user_id": broadcaster_id},
+                callback_url,
+                secret,
+            )
+            print(f"📡 Subscribed stream.offline for {broadcaster_id}")
+        except requests.HTTPError as e:
+            if e.response is not None and e.response.status_code == 409:
+                continue  # already subscribed
+            print(f"⚠️ EventSub subscribe failed for {broadcaster_id}:", e)
+
+
+def send_test_event(url: str, secret: str, event_type: str, broadcaster_id: str) -> int:
+    """
+    POST a correctly signed notification, as Twitch would. Returns the status.
+    """
+    body = json.dumps(
+        {
+            "subscription": {"type": event_type, "version": "1", "status": "enabled"},
+            "event": {
+                "broadcaster_user_id": broadcaster_id,
+                "broadcaster_user_login": broadcaster_id,
+            },
+        }
+    ).encode("utf-8")
+    msg_id = str(uuid.uuid4())
+    timestamp = datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%S.%fZ")
+    headers = {
+        "Content-Type": "application/json",
+        "Twitch-Eventsub-Message-Id": msg_id,
+        "Twitch-Eventsub-Message-Timestamp": timestamp,
+        "Twitch-Eventsub-Message-Signature": sign(secret, msg_id, timestamp, body),
+        "Twitch-Eventsub-Message-Type": "notification",
+    }
+    r = requests.post(url, data=body, headers=headers, timeout=10)
+    return r.status_code
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    ap = argparse.ArgumentParser(prog="python -m src.eventsub")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    send = sub.add_parser("send", help="send a signed test event to a receiver")
+    send.add_argument("type", choices=EVENT_TYPES)
+    send.add_argument("broadcaster_id")
+    send.add_argument("--url", default=f"http://127.0.0.1:{PORT}{PATH}")
+    args = ap.parse_args(argv)
+
+    if not SECRET:
+        raise SystemExit("Set EVENTSUB_SECRET (the receiver must use the same one)")
+    status = send_test_event(args.url, SECRET, args.type, args.broadcaster_id)
+    print(f"📨 {args.type} for {args.broadcaster_id}: HTTP {status}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,11 +1,48 @@
 import os
-import subprocess
 from dataclasses import dataclass
-from typing import Tuple
+from typing import Dict, Iterator, List, Optional, Tuple
 
 import numpy as np
 import cv2
-import librosa
+
+from .audio_stream import (
+    ANALYSIS_SR,
+    FEATURES,
+    above_baseline,
+    iter_ffmpeg_pcm,
+    iter_second_features,
+    iter_wav_blocks,
+    wav_samplerate,
+    windowed_mean,
+)
+from .chat_signal import chat_spike_regions
+from .metrics import annotate, timed
+from .subproc import run_tool
+
+ANALYSIS_MAX_SEC = 900  # limit analysis to first 15 mins by default
+
+# coarse pass: audio only, whole VOD, decoded at a low rate
+COARSE_SR = 8000
+
+# fine pass: every cut length in [min_sec, max_sec] is scored. A window's
+# score is its weighted mean x (length / max_sec) ** LENGTH_BIAS: 0 picks the
+# densest cut (usually min_sec), 1 the largest total (always max_sec)
+LENGTH_BIAS = float(os.getenv("HIGHLIGHT_LENGTH_BIAS", "0.2"))
+LENGTH_STEP_SEC = int(os.getenv("HIGHLIGHT_LENGTH_STEP_SEC", "1"))
+FINE_HOP_SEC = 1
+
+# per-second series -> window score; rms is the root of the mean power
+_WINDOW_POST = {"rms": np.sqrt}
+
+# audio features share the old 0.65 audio budget; scene keeps its 0.35
+DEFAULT_WEIGHTS: Dict[str, float] = {
+    "rms": 0.16,
+    "flux": 0.23,
+    "loudness": 0.13,
+    "voice": 0.13,
+    "scene": 0.35,
+    "chat": 0.3,  # only used when a chat replay is supplied
+}
 
 
 @dataclass
@@ -15,7 +52,10 @@ class Highlight:
     score: float
 
 
-def _extract_audio_wav(video_path: str, wav_path: str) -> None:
+@timed("highlight.audio_extract")
+def _extract_audio_wav(
+    video_path: str, wav_path: str, max_sec: float = ANALYSIS_MAX_SEC
+) -> None:
     os.makedirs(os.path.dirname(wav_path), exist_ok=True)
     cmd = [
         "ffmpeg",
@@ -26,67 +66,114 @@ def _extract_audio_wav(video_path: str, wav_path: str) -> None:
         "-ac",
         "1",
         "-ar",
-        "22050",
+        str(ANALYSIS_SR),
         "-t",
-        "900",  # limit analysis to first 15 mins by default
+        str(max_sec),
         wav_path,
     ]
-    p = subprocess.run(cmd, capture_output=True, text=True)
+    p = run_tool(cmd, "audio_extract")
     if p.returncode != 0:
         raise RuntimeError(f"ffmpeg audio extract failed:\n{p.stderr}")
 
 
-def _audio_energy_scores(
-    wav_path: str, window_sec: int, hop_sec: int
-) -> Tuple[np.ndarray, int]:
-    y, sr_raw = librosa.load(wav_path, sr=22050, mono=True)
-    sr = int(sr_raw)
-    win = int(window_sec * sr)
-    hop = int(hop_sec * sr)
-
-    if len(y) < win:
-        return np.array([0.0], dtype=np.float32), sr
-
-    scores = []
-    for i in range(0, len(y) - win, hop):
-        chunk = y[i : i + win]
-        rms = float(np.sqrt(np.mean(chunk * chunk)))
-        scores.append(rms)
-
-    arr = np.array(scores, dtype=np.float32)
-    if arr.max() > 0:
-        arr = arr / arr.max()
-    return arr, sr
-
-
-def _scene_change_scores(
-    video_path: str, window_sec: int, hop_sec: int, fps_sample: int = 2
-) -> np.ndarray:
+def _pcm_blocks(
+    wav_path: Optional[str],
+    video_path: Optional[str],
+    max_sec: Optional[float],
+    start_sec: float = 0.0,
+    sr: int = ANALYSIS_SR,
+) -> Tuple[Iterator[np.ndarray], int]:
+    if wav_path and os.path.exists(wav_path):
+        blocks = iter_wav_blocks(wav_path, max_sec=max_sec, start_sec=start_sec)
+        return blocks, wav_samplerate(wav_path)
+    if video_path:
+        blocks = iter_ffmpeg_pcm(
+            video_path, sr=sr, start_sec=start_sec, max_sec=max_sec
+        )
+        return blocks, sr
+    raise ValueError("Need an existing wav_path or a video_path")
+
+
+@timed("highlight.audio_features")
+def _audio_feature_series(
+    wav_path: Optional[str],
+    video_path: Optional[str] = None,
+    max_sec: Optional[float] = ANALYSIS_MAX_SEC,
+    start_sec: float = 0.0,
+    sr: int = ANALYSIS_SR,
+) -> Dict[str, np.ndarray]:
+    """
+    Per-second series for every audio feature from a single decode + STFT
+    pass; a window's mean of them (root mean for rms) is its score. Flux and
+    loudness are kept as excess over their local baseline, so constant music
+    does not look like hype.
+    """
+    blocks, sr = _pcm_blocks(wav_path, video_path, max_sec, start_sec=start_sec, sr=sr)
+    rows = list(iter_second_features(blocks, sr))
+    per_sec = np.array(rows, dtype=np.float64).reshape(-1, len(FEATURES))
+    annotate(source_sec=float(len(per_sec)), sample_rate=sr)
+
+    ms, flux, loud_db, voice = per_sec.T
+    return {
+        "rms": ms,
+        "flux": above_baseline(flux),
+        "loudness": above_baseline(loud_db),
+        "voice": voice,
+    }
+
+
+def _windowed(
+    series: Dict[str, np.ndarray], window_sec: int, hop_sec: int
+) -> Dict[str, np.ndarray]:
+    out = {}
+    for k, v in series.items():
+        w = windowed_mean(v, window_sec, hop_sec)
+        out[k] = _WINDOW_POST[k](w) if k in _WINDOW_POST else w
+    return out
+
+
+def frame_diffs(
+    video_path: str,
+    fps_sample: int = 2,
+    start_sec: float = 0.0,
+    max_sec: float = ANALYSIS_MAX_SEC,
+    prev: Optional[np.ndarray] = None,
+) -> Tuple[np.ndarray, np.ndarray, Optional[np.ndarray], float]:
     """
-    Sample frames at ~fps_sample and measure frame difference to estimate "action".
-    Analyze only first ~15 minutes for speed.
+    Mean grey-level difference between frames sampled at ~fps_sample.
+    Returns (diffs, their timestamps in seconds from start_sec, last sampled
+    frame, seconds read). Pass the last frame back as prev to continue the
+    series across files (e.g. live HLS segments).
     """
+    empty = np.zeros(0, dtype=np.float32)
     cap = cv2.VideoCapture(video_path)
     if not cap.isOpened():
-        return np.array([0.0], dtype=np.float32)
+        return empty, empty, prev, 0.0
 
     fps = cap.get(cv2.CAP_PROP_FPS) or 30.0
     step = max(int(fps / fps_sample), 1)
 
-    max_frames = int(15 * 60 * fps)  # first 15 minutes
+    if start_sec > 0:
+        cap.set(cv2.CAP_PROP_POS_MSEC, float(start_sec) * 1000.0)
+
+    max_frames = int(max_sec * fps)
     diffs = []
-    prev = None
+    times = []
     idx = 0
 
     while True:
-        ret, frame = cap.read()
-        if not ret:
+        # grab() demuxes/decodes without the BGR conversion; only sampled
+        # frames are retrieved
+        if not cap.grab():
             break
         idx += 1
         if idx > max_frames:
             break
         if idx % step != 0:
             continue
+        ret, frame = cap.retrieve()
+        if not ret:
+            break
 
         gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
         gray = cv2.resize(gray, (320, 180))
@@ -100,77 +187,312 @@ def _scene_change_scores(
         score = float(diff_arr.mean())
 
         diffs.append(score)
+        times.append((idx - 1) / fps)
         prev = gray
 
     cap.release()
+    return (
+        np.array(diffs, dtype=np.float32),
+        np.array(times, dtype=np.float32),
+        prev,
+        min(idx, max_frames) / fps,
+    )
 
-    if not diffs:
-        return np.array([0.0], dtype=np.float32)
-
-    diffs = np.array(diffs, dtype=np.float32)
-    if diffs.max() > 0:
-        diffs = diffs / diffs.max()
-
-    # Convert frame-diff series to windowed scores
-    # diffs is sampled at fps_sample, so hop_sec means hop_sec * fps_sample steps
-    hop_steps = max(int(hop_sec * fps_sample), 1)
-    win_steps = max(int(window_sec * fps_sample), 1)
-
-    if len(diffs) < win_steps:
-        return np.array([float(diffs.mean())], dtype=np.float32)
 
-    out = []
-    for i in range(0, len(diffs) - win_steps, hop_steps):
-        out.append(float(diffs[i : i + win_steps].mean()))
+@timed("highlight.scene_change")
+def _scene_series(
+    video_path: str,
+    fps_sample: int = 2,
+    start_sec: float = 0.0,
+    max_sec: float = ANALYSIS_MAX_SEC,
+) -> np.ndarray:
+    """
+    Mean frame difference per whole second read. Samples are bucketed by
+    timestamp: at 29.97 fps the sampling step gives ~2.14 samples a second,
+    not fps_sample. A second with no sample is interpolated from its
+    neighbours.
+    """
+    diffs, times, _, read_sec = frame_diffs(
+        video_path, fps_sample=fps_sample, start_sec=start_sec, max_sec=max_sec
+    )
+    annotate(source_sec=round(read_sec, 2))
+    n = int(read_sec)
+    secs = times.astype(np.int64)
+    keep = secs < n
+    if n <= 0 or not keep.any():
+        return np.zeros(0, dtype=np.float32)
+
+    secs, diffs = secs[keep], diffs[keep]
+    counts = np.bincount(secs, minlength=n)
+    sums = np.bincount(secs, weights=diffs, minlength=n)
+    filled = counts > 0
+    out = np.zeros(n, dtype=np.float32)
+    out[filled] = sums[filled] / counts[filled]
+    grid = np.arange(n)
+    out[~filled] = np.interp(grid[~filled], grid[filled], out[filled])
+    return out
+
+
+def _range_series(
+    video_path: str,
+    wav_path: Optional[str],
+    start_sec: float,
+    length_sec: float,
+    weights: Dict[str, float],
+    chat: Optional[np.ndarray],
+) -> Dict[str, np.ndarray]:
+    """
+    Raw per-second signals for one time range, index i = start_sec + i. Only
+    signals with a non-zero weight are computed.
+    """
+    signals: Dict[str, np.ndarray] = {}
+    if any(weights.get(k) for k in FEATURES):
+        signals.update(
+            _audio_feature_series(
+                wav_path,
+                video_path=video_path,
+                max_sec=length_sec,
+                start_sec=start_sec,
+            )
+        )
+    if weights.get("scene"):
+        signals["scene"] = _scene_series(
+            video_path, start_sec=start_sec, max_sec=length_sec
+        )
+    if chat is not None and weights.get("chat"):
+        signals["chat"] = chat[int(start_sec) : int(start_sec + length_sec)]
+    return signals
+
+
+def _weighted_totals(
+    parts: List[Dict[str, np.ndarray]], weights: Dict[str, float]
+) -> List[np.ndarray]:
+    """
+    Normalise each signal by its max across all ranges (so ranges compare
+    fairly), then take the weighted sum per range.
+    """
+    keys = {k for part in parts for k in part}
+    used = {k: w for k, w in weights.items() if w and k in keys}
+    if not used:
+        raise ValueError(f"No usable highlight weights in {weights}")
+
+    peak = {
+        k: max(float(p[k].max()) if k in p and p[k].size else 0.0 for p in parts)
+        for k in used
+    }
+
+    totals = []
+    for part in parts:
+        # Align lengths
+        n = min((len(part[k]) for k in used if k in part), default=0)
+        total = np.zeros(n, dtype=np.float32)
+        for k, w in used.items():
+            if k in part and peak[k] > 0:
+                total += w * part[k][:n] / peak[k]
+        totals.append(total / sum(used.values()))
+    return totals
+
+
+def _top_window_regions(
+    total: np.ndarray, window_sec: int, hop_sec: int, top_n: int
+) -> List[Tuple[float, float]]:
+    """
+    Top-N window starts from a coarse score (at least one window apart), each
+    widened by half a window on both sides so the fine pass can re-centre.
+    Regions start on the hop grid and overlapping regions merge.
+    """
+    picked: List[int] = []
+    for i in np.argsort(-total, kind="stable"):
+        if len(picked) >= top_n:
+            break
+        start = int(i) * hop_sec
+        if all(abs(start - p) >= window_sec for p in picked):
+            picked.append(start)
 
-    arr = np.array(out, dtype=np.float32)
-    if arr.max() > 0:
-        arr = arr / arr.max()
-    return arr
+    pad = (window_sec // 2) // hop_sec * hop_sec
+    regions = sorted(
+        (float(max(p - pad, 0)), float(p + window_sec + pad)) for p in picked
+    )
+    merged: List[Tuple[float, float]] = []
+    for a, b in regions:
+        if merged and a <= merged[-1][1]:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], b))
+        else:
+            merged.append((a, b))
+    return merged
+
+
+def _coarse_to_fine(
+    video_path: str,
+    window_sec: int,
+    hop_sec: int,
+    weights: Dict[str, float],
+    candidates: int,
+    scan_max_sec: Optional[float],
+) -> Tuple[List[Tuple[float, float]], List[Dict[str, np.ndarray]]]:
+    """
+    Coarse: one low-rate audio pass over the whole VOD scores every window.
+    Fine: seek straight to the top candidate regions and run scene scoring
+    there only, so video cost is ~candidates x window, not VOD length.
+    """
+    audio = _audio_feature_series(
+        None, video_path=video_path, max_sec=scan_max_sec, sr=COARSE_SR
+    )
+    coarse = _weighted_totals(
+        [_windowed(audio, window_sec, hop_sec)],
+        {k: weights.get(k, 0.0) for k in FEATURES},
+    )[0]
+    ranges = _top_window_regions(coarse, window_sec, hop_sec, candidates)
+
+    parts: List[Dict[str, np.ndarray]] = []
+    for a, b in ranges:
+        part = {k: v[int(a) : int(b)] for k, v in audio.items()}
+        if weights.get("scene"):
+            part["scene"] = _scene_series(video_path, start_sec=a, max_sec=b - a)
+        parts.append(part)
+    return ranges, parts
+
+
+def _best_window(
+    ranges: List[Tuple[float, float]],
+    parts: List[Dict[str, np.ndarray]],
+    weights: Dict[str, float],
+    min_sec: int,
+    max_sec: int,
+    hop_sec: int = FINE_HOP_SEC,
+) -> Tuple[float, float, float]:
+    """
+    (score, start, length) of the best cut over every length in
+    [min_sec, max_sec] (LENGTH_STEP_SEC apart) and every start on the hop
+    grid. Ranges shorter than min_sec are skipped; score is -1 when none is
+    long enough. Window means come from prefix sums of the per-second signals, so
+    the search is O(seconds / hop x lengths) and decodes nothing.
+    """
+    keys = {k for part in parts for k in part}
+    used = {k: w for k, w in weights.items() if w and k in keys}
+    if not used:
+        raise ValueError(f"No usable highlight weights in {weights}")
+    w_total = sum(used.values())
+
+    prefix = []
+    for part in parts:
+        n = min((len(part[k]) for k in used if k in part), default=0)
+        cs = {
+            k: np.concatenate([[0.0], np.cumsum(part[k][:n], dtype=np.float64)])
+            for k in used
+            if k in part
+        }
+        prefix.append((n, cs))
+
+    def _means(
+        n: int, cs: Dict[str, np.ndarray], length: int
+    ) -> Tuple[np.ndarray, Dict[str, np.ndarray]]:
+        starts = np.arange(0, n - length + 1, hop_sec)
+        out = {}
+        for k, c in cs.items():
+            m = (c[starts + length] - c[starts]) / length
+            out[k] = _WINDOW_POST[k](m) if k in _WINDOW_POST else m
+        return starts, out
+
+    # normalise each signal by its best shortest-length window across ranges:
+    # a longer window's mean never exceeds that, so scores stay within [0, 1]
+    peak = dict.fromkeys(used, 0.0)
+    for n, cs in prefix:
+        if n < min_sec:
+            continue
+        _, means = _means(n, cs, min_sec)
+        for k, m in means.items():
+            peak[k] = max(peak[k], float(m.max()) if m.size else 0.0)
+
+    lengths = list(range(min_sec, max_sec + 1, max(LENGTH_STEP_SEC, 1)))
+    if lengths[-1] != max_sec:
+        lengths.append(max_sec)
+
+    best = (-1.0, 0.0, float(max_sec))
+    for (range_start, _), (n, cs) in zip(ranges, prefix):
+        if n < min_sec:
+            continue  # too short for even the shortest cut
+        for length in lengths:
+            length = min(length, n)  # range shorter than the longest cut
+            starts, means = _means(n, cs, length)
+            total = np.zeros(len(starts), dtype=np.float64)
+            for k, m in means.items():
+                if peak[k] > 0:
+                    total += used[k] * m / peak[k]
+            score = total / w_total * (length / max_sec) ** LENGTH_BIAS
+            i = int(np.argmax(score))
+            if float(score[i]) > best[0]:
+                best = (float(score[i]), range_start + float(starts[i]), float(length))
+            if length == n:
+                break
+    return best
 
 
 def pick_best_highlight(
-    video_path: str, wav_cache_path: str, min_sec: int, max_sec: int
+    video_path: str,
+    wav_cache_path: Optional[str],
+    min_sec: int,
+    max_sec: int,
+    weights: Optional[Dict[str, float]] = None,
+    chat: Optional[np.ndarray] = None,
+    candidates: int = 5,
+    scan_max_sec: Optional[float] = None,
 ) -> Highlight:
     """
     Heuristic:
-    - Score windows using audio RMS (hype/loudness) + scene changes (action)
-    - Pick best start time in first ~15 mins (fast). You can increase later.
+    - Score windows with a weighted sum of audio features (RMS, spectral flux,
+      loudness, voice activity) + scene changes (action) + chat density
+    - Coarse-to-fine: a cheap audio pass over the whole VOD (or its first
+      scan_max_sec) picks the top `candidates` regions; video is only decoded
+      there. With a chat replay the regions come from chat bursts instead and
+      nothing is decoded outside them.
+    - candidates <= 0 restores the exhaustive scan of the first ~15 mins.
+    - Within the regions every cut from min_sec to max_sec long is scored
+      (see _best_window), so a tight 40s moment can beat a padded 60s one.
     """
-    duration = float(max_sec)
-
-    # 1) audio
-    if not os.path.exists(wav_cache_path):
-        _extract_audio_wav(video_path, wav_cache_path)
+    weights = weights or DEFAULT_WEIGHTS
+    max_sec = int(max_sec)
+    min_sec = max(min(int(min_sec), max_sec), 1)
 
-    window_sec = int(duration)
+    # candidate regions are sized for the longest cut
+    window_sec = max_sec
     hop_sec = 2
 
-    audio_scores, _ = _audio_energy_scores(
-        wav_cache_path, window_sec=window_sec, hop_sec=hop_sec
-    )
-    scene_scores = _scene_change_scores(
-        video_path, window_sec=window_sec, hop_sec=hop_sec
-    )
-
-    # Align lengths
-    n = min(len(audio_scores), len(scene_scores))
-    if n <= 0:
-        return Highlight(start_sec=0.0, duration_sec=duration, score=0.0)
-
-    audio_scores = audio_scores[:n]
-    scene_scores = scene_scores[:n]
-
-    # Weighted sum (tune if needed)
-    total = (0.65 * audio_scores) + (0.35 * scene_scores)
-
-    best_idx = int(np.argmax(total))
-    best_start = float(best_idx * hop_sec)
-
-    # Safety: clamp to min duration range if you want variable durations later
-    if duration < min_sec:
-        duration = float(min_sec)
-
-    return Highlight(
-        start_sec=best_start, duration_sec=float(duration), score=float(total[best_idx])
-    )
+    use_chat = chat is not None and chat.size > 0 and float(chat.sum()) > 0
+
+    if candidates > 0 and not use_chat:
+        ranges, parts = _coarse_to_fine(
+            video_path, window_sec, hop_sec, weights, candidates, scan_max_sec
+        )
+    else:
+        if use_chat and candidates > 0:
+            ranges = chat_spike_regions(chat, window_sec, top_n=candidates)
+            wav_path = None  # ranges can lie past the cached 15-minute WAV
+        else:
+            ranges = [(0.0, float(ANALYSIS_MAX_SEC))]
+            # 1) audio (wav cache is optional; without it PCM is streamed)
+            if wav_cache_path and not os.path.exists(wav_cache_path):
+                _extract_audio_wav(video_path, wav_cache_path)
+            wav_path = wav_cache_path
+
+        parts = [
+            _range_series(
+                video_path,
+                wav_path,
+                start_sec=a,
+                length_sec=b - a,
+                weights=weights,
+                chat=chat if use_chat else None,
+            )
+            for a, b in ranges
+        ]
+
+    annotate(ranges=len(ranges), video_sec=sum(b - a for a, b in ranges))
+
+    # Weighted sum (weights are relative; tune via HIGHLIGHT_WEIGHTS)
+    score, start, length = _best_window(ranges, parts, weights, min_sec, max_sec)
+    if score < 0:
+        return Highlight(start_sec=0.0, duration_sec=float(max_sec), score=0.0)
+
+    annotate(length_sec=length)
+    return Highlight(start_sec=start, duration_sec=length, score=score)
@@ -0,0 +1,547 @@
+# src/live.py
+"""
+Live mode: record a live stream into a bounded ring of HLS segments, score
+each new segment incrementally, and render a short when a window's score
+peaks above the threshold.
+
+    python -m src.live                          # first configured broadcaster that is live
+    python -m src.live --url <channel or .m3u8> # record any HLS source
+    python -m src.live --playlist dir/live.m3u8 # watch segments written by someone else
+
+Local test: run an ffmpeg HLS writer, e.g.
+    ffmpeg -re -f lavfi -i testsrc2=size=1280x720:rate=30 -f lavfi -i sine \\
+        -c:v libx264 -g 60 -c:a aac -f hls -hls_time 2 -hls_list_size 10 \\
+        -hls_flags delete_segments /tmp/hls/live.m3u8
+and point --url at /tmp/hls/live.m3u8.
+"""
+
+import argparse
+import contextlib
+import os
+import subprocess
+import time
+from collections import deque
+from concurrent.futures import Future
+from dataclasses import dataclass
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from .audio_stream import (
+    ANALYSIS_SR,
+    SecondFeatureExtractor,
+    above_baseline,
+    iter_ffmpeg_pcm,
+)
+from .config import Settings, get_settings
+from .editor import RenderResult
+from .encode_policy import EncodePolicy
+from .highlight_picker import DEFAULT_WEIGHTS, frame_diffs
+from .metrics import configure as configure_metrics, span
+from .render_pool import RenderExecutor
+from .sharding import shard_path_for
+from .subproc import run_tool
+from .utils import safe_filename, sha1, utc_ts, write_json
+
+SEGMENT_SEC = int(os.getenv("LIVE_SEGMENT_SEC", "4"))
+RING_SEC = int(os.getenv("LIVE_RING_SEC", "600"))
+THRESHOLD = float(os.getenv("LIVE_SCORE_THRESHOLD", "0.85"))
+MIN_PROMINENCE = float(os.getenv("LIVE_MIN_PROMINENCE", "0.3"))
+COOLDOWN_SEC = int(os.getenv("LIVE_COOLDOWN_SEC", "300"))
+MAX_PENDING_RENDERS = 2
+# live cuts should go out quickly, so the encode policy gets a tighter budget
+ENCODE_TARGET_SEC = float(os.getenv("LIVE_ENCODE_TARGET_SEC", "120"))
+POLL_SEC = 1.0
+# segment start vs. decoded audio clock beyond which the scorer rebases
+MAX_DRIFT_SEC = 1.0
+SILENT_ROW = np.array([0.0, 0.0, -100.0, 0.0])
+
+
+@dataclass
+class Segment:
+    seq: int
+    path: str
+    start_sec: float  # stream time since the session started
+    duration_sec: float
+
+
+def parse_playlist(path: str) -> Tuple[int, List[Tuple[float, str]], bool]:
+    """
+    (media sequence of first entry, [(duration, uri)], ended) of an HLS media playlist.
+    """
+    seq = 0
+    entries: List[Tuple[float, str]] = []
+    ended = False
+    dur: Optional[float] = None
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            lines = [line.strip() for line in f]
+    except OSError:
+        return 0, [], False
+
+    for line in lines:
+        if line.startswith("#EXT-X-MEDIA-SEQUENCE:"):
+            seq = int(line.split(":", 1)[1])
+        elif line.startswith("#EXTINF:"):
+            dur = float(line.split(":", 1)[1].split(",", 1)[0])
+        elif line.startswith("#EXT-X-ENDLIST"):
+            ended = True
+        elif line and not line.startswith("#") and dur is not None:
+            entries.append((dur, line))
+            dur = None
+    return seq, entries, ended
+
+
+class HlsRecorder:
+    """
+    ffmpeg stream copy into rolling HLS segments. delete_segments keeps only
+    the last ring_segments on disk, so disk use is bounded however long we run.
+    """
+
+    def __init__(self, source_url: str, out_dir: str, ring_segments: int) -> None:
+        self.source_url = source_url
+        self.out_dir = out_dir
+        self.ring_segments = ring_segments
+        self.playlist = os.path.join(out_dir, "live.m3u8")
+        self._proc: Optional[subprocess.Popen] = None
+
+    def start(self) -> None:
+        os.makedirs(self.out_dir, exist_ok=True)
+        cmd = [
+            "ffmpeg",
+            "-nostdin",
+            "-v",
+            "error",
+            "-y",
+            "-i",
+            self.source_url,
+            "-c",
+            "copy",
+            "-f",
+            "hls",
+            "-hls_time",
+            str(SEGMENT_SEC),
+            "-hls_list_size",
+            str(self.ring_segments),
+            "-hls_flags",
+            "delete_segments",
+            "-hls_segment_filename",
+            os.path.join(self.out_dir, "seg_%08d.ts"),
+            self.playlist,
+        ]
+        self._proc = subprocess.Popen(
+            cmd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+        )
+
+    def alive(self) -> bool:
+        return self._proc is not None and self._proc.poll() is None
+
+    def stop(self) -> None:
+        if self.alive():
+            assert self._proc is not None
+            self._proc.terminate()
+            try:
+                self._proc.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                self._proc.kill()
+
+
+class SegmentWatcher:
+    """
+    Polls a media playlist and returns segments not seen before, in order,
+    with their stream start time. Only the current playlist window is kept.
+    """
+
+    def __init__(self, playlist: str, keep: int) -> None:
+        self.playlist = playlist
+        self.base_dir = os.path.dirname(os.path.abspath(playlist))
+        self.next_seq: Optional[int] = None
+        self.next_start = 0.0
+        self.ended = False
+        self.recent: Deque[Segment] = deque(maxlen=keep)
+
+    def poll(self) -> List[Segment]:
+        seq0, entries, self.ended = parse_playlist(self.playlist)
+        # the last entry may still be written by a muxer that does not use
+        # temp files; hold it back until another segment follows or the list ends
+        if entries and not self.ended:
+            entries = entries[:-1]
+
+        new: List[Segment] = []
+        for i, (dur, uri) in enumerate(entries):
+            seq = seq0 + i
+            if self.next_seq is not None and seq < self.next_seq:
+                continue
+            if self.next_seq is not None and seq > self.next_seq:
+                # fell behind and the ring dropped segments; keep the clock right
+                self.next_start += (seq - self.next_seq) * SEGMENT_SEC
+            path = uri if os.path.isabs(uri) else os.path.join(self.base_dir, uri)
+            seg = Segment(seq, path, self.next_start, dur)
+            self.next_seq = seq + 1
+            self.next_start += dur
+            self.recent.append(seg)
+            new.append(seg)
+        return new
+
+    def covering(self, start_sec: float, end_sec: float) -> List[Segment]:
+        return [
+            s
+            for s in self.recent
+            if s.start_sec < end_sec and s.start_sec + s.duration_sec > start_sec
+        ]
+
+
+def _trailing_means(series: np.ndarray, window: int) -> np.ndarray:
+    # mean of every window_sec window, including the one ending at the newest second
+    csum = np.concatenate([[0.0], np.cumsum(series, dtype=np.float64)])
+    return (csum[window:] - csum[:-window]) / window
+
+
+class LiveScorer:
+    """
+    Per-second audio + scene features for the last ring_sec seconds, updated
+    one segment at a time. Fires (start_sec, window_sec, score) once the score
+    has risen above the threshold and dropped back below it.
+    """
+
+    def __init__(
+        self,
+        window_sec: int,
+        ring_sec: int = RING_SEC,
+        weights: Optional[Dict[str, float]] = None,
+        threshold: float = THRESHOLD,
+        cooldown_sec: int = COOLDOWN_SEC,
+    ) -> None:
+        self.window_sec = window_sec
+        self.weights = {
+            k: w
+            for k, w in (weights or DEFAULT_WEIGHTS).items()
+            if w and k in ("rms", "flux", "loudness", "voice", "scene")
+        }
+        self.threshold = threshold
+        self.cooldown_sec = cooldown_sec
+
+        self.audio: Deque[np.ndarray] = deque(maxlen=ring_sec)
+        self.scene: Deque[float] = deque(maxlen=ring_sec)
+        self.seconds = 0  # stream second the next ring row starts at
+        self.origin = 0  # stream second of the extractor's first sample
+        self.extractor = SecondFeatureExtractor(ANALYSIS_SR)
+        self.prev_gray: Optional[np.ndarray] = None
+
+        self.peak: Optional[int] = None  # first window start above threshold
+        self.blocked_until = 0
+        self.last_score = 0.0
+
+    def _rebase(self, start_sec: float) -> None:
+        # the watcher skips over dropped segments; keep the ring on stream time
+        # by restarting the extractor there and filling the hole with silence
+        at = self.origin + self.extractor.total / ANALYSIS_SR
+        if abs(start_sec - at) < MAX_DRIFT_SEC:
+            return
+        self.extractor = SecondFeatureExtractor(ANALYSIS_SR)
+        self.prev_gray = None
+        self.origin = max(int(round(start_sec)), self.seconds)
+        hole = min(self.origin - self.seconds, self.audio.maxlen or 0)
+        self.audio.extend([SILENT_ROW] * hole)
+        self.scene.extend([0.0] * hole)
+        self.seconds = self.origin
+
+    def add_segment(self, seg: Segment) -> Optional[Tuple[int, int, float]]:
+        self._rebase(seg.start_sec)
+        rows: List[np.ndarray] = []
+        for block in iter_ffmpeg_pcm(seg.path, sr=ANALYSIS_SR):
+            rows.extend(self.extractor.push(block))
+
+        diffs, _, self.prev_gray, _ = frame_diffs(
+            seg.path, max_sec=seg.duration_sec + 1.0, prev=self.prev_gray
+        )
+        # spread the segment's frame diffs over the audio seconds it closed
+        if rows:
+            if diffs.size:
+                scene = [
+                    float(c.mean()) if c.size else 0.0
+                    for c in np.array_split(diffs, len(rows))
+                ]
+            else:
+                scene = [0.0] * len(rows)
+            self.audio.extend(rows)
+            self.scene.extend(scene)
+            self.seconds += len(rows)
+
+        return self._check()
+
+    def window_scores(self) -> np.ndarray:
+        n = len(self.audio)
+        w = self.window_sec
+        if n < w:
+            return np.zeros(0, dtype=np.float32)
+
+        ms, flux, loud, voice = np.array(self.audio, dtype=np.float64).T
+        signals = {
+            "rms": np.sqrt(_trailing_means(ms, w)),
+            "flux": _trailing_means(above_baseline(flux), w),
+            "loudness": _trailing_means(above_baseline(loud), w),
+            "voice": _trailing_means(voice, w),
+            "scene": _trailing_means(np.array(self.scene, dtype=np.float64), w),
+        }
+        total = np.zeros(n - w + 1, dtype=np.float64)
+        for k, wt in self.weights.items():
+            peak = float(signals[k].max())
+            if peak > 0:
+                total += wt * signals[k] / peak
+        return (total / max(sum(self.weights.values()), 1e-9)).astype(np.float32)
+
+    def _check(self) -> Optional[Tuple[int, int, float]]:
+        # need some history before "unusual" means anything
+        if len(self.audio) < 2 * self.window_sec:
+            return None
+
+        total = self.window_scores()
+        score = float(total[-1])
+        self.last_score = score
+        start = self.seconds - self.window_sec
+        prominent = score - float(np.median(total)) >= MIN_PROMINENCE
+
+        if score >= self.threshold and prominent and start >= self.blocked_until:
+            if self.peak is None:
+                self.peak = start
+            return None
+
+        if self.peak is None:
+            return None
+
+        # scores are renormalised as the ring moves, so pick the best window of
+        # the whole run under the current scale instead of the first one seen
+        first = self.seconds - len(self.audio)  # stream second of total[0]
+        lo = max(self.peak - first, 0)
+        i = lo + int(np.argmax(total[lo:]))
+        best_start = first + i
+        self.peak = None
+        self.blocked_until = best_start + self.window_sec + self.cooldown_sec
+        return best_start, self.window_sec, float(total[i])
+
+
+def _concat_segments(segs: List[Segment], out_path: str) -> None:
+    list_path = out_path + ".txt"
+    with open(list_path, "w", encoding="utf-8") as f:
+        for s in segs:
+            f.write(f"file '{s.path}'\n")
+    cmd = [
+        "ffmpeg",
+        "-y",
+        "-nostdin",
+        "-v",
+        "error",
+        "-f",
+        "concat",
+        "-safe",
+        "0",
+        "-i",
+        list_path,
+        "-c",
+        "copy",
+        out_path,
+    ]
+    p = run_tool(cmd, "live_cut")
+    os.remove(list_path)
+    if p.returncode != 0:
+        raise RuntimeError(f"ffmpeg live cut failed:\n{p.stderr}")
+
+
+def _discard(path: str) -> None:
+    # done callbacks run on the render worker; a missing file is not an error
+    with contextlib.suppress(OSError):
+        os.remove(path)
+
+
+def _collect(fut: Future, outputs: List[str]) -> None:
+    try:
+        outputs.append(fut.result())
+    except Exception as e:
+        print("⚠️ Live render failed:", e)
+
+
+def _publish_cut(s: Settings, meta: Dict[str, Any], rr: RenderResult) -> str:
+    out_path = rr.output_path
+    meta["render_path"] = out_path
+    meta["encode"] = rr.encode
+    write_json(out_path + ".json", meta)
+    print("🎬 Live short:", out_path)
+
+    if os.getenv("LIVE_UPLOAD", "false").lower() == "true":
+        from .main import build_title_and_description
+        from .youtube_uploader import upload_video
+
+        title, desc, tags = build_title_and_description(
+            brand=s.brand_name,
+            broadcaster=meta["broadcaster_name"],
+            vod_title=meta.get("stream_title", ""),
+            game_name=meta.get("game_name", ""),
+        )
+        resp = upload_video(out_path, title, desc, tags=tags, privacy="public")
+        print("🎉 Uploaded to YouTube:", resp.get("id"))
+    return out_path
+
+
+def run_live(
+    s: Settings,
+    broadcaster_name: str,
+    source_url: Optional[str] = None,
+    playlist: Optional[str] = None,
+    max_minutes: float = 0.0,
+    stream_info: Optional[Dict[str, Any]] = None,
+    broadcaster_id: Optional[str] = None,
+) -> List[str]:
+    window_sec = int(s.highlight_max_sec)
+    ring_segments = max(RING_SEC // SEGMENT_SEC, 3)
+    live_dir = os.path.join(s.twitch_cache_dir, "live", safe_filename(broadcaster_name))
+    os.makedirs(live_dir, exist_ok=True)
+
+    recorder = None
+    if source_url:
+        recorder = HlsRecorder(
+            source_url, os.path.join(live_dir, "ring"), ring_segments
+        )
+        recorder.start()
+        playlist = recorder.playlist
+    if not playlist:
+        raise ValueError("Need a source_url or a playlist to watch")
+
+    watcher = SegmentWatcher(playlist, keep=ring_segments)
+    scorer = LiveScorer(window_sec, weights=s.highlight_weights or None)
+    renders = RenderExecutor(
+        policy=EncodePolicy(
+            shard_path_for(s, "encoder_speed.json", broadcaster_id),
+            target_sec=ENCODE_TARGET_SEC,
+        )
+    )
+    pending: List[Future] = []
+    outputs: List[str] = []
+    deadline = time.time() + max_minutes * 60 if max_minutes > 0 else None
+
+    print(f"🔴 Live: {broadcaster_name} (window={window_sec}s ring={RING_SEC}s)")
+    try:
+        while True:
+            # checked before polling so the last poll sees everything written
+            finished = watcher.ended or (recorder is not None and not recorder.alive())
+            new = watcher.poll()
+            for seg in new:
+                with span("live.segment", source_sec=seg.duration_sec):
+                    cut = scorer.add_segment(seg)
+                if not cut:
+                    continue
+
+                start, dur, score = cut
+                if renders.queue_depth >= MAX_PENDING_RENDERS:
+                    print("⚠️ Render backlog full, skipping live cut at", start)
+                    continue
+
+                segs = watcher.covering(start, start + dur)
+                if not segs:
+                    continue
+                ext = os.path.splitext(segs[0].path)[1] or ".ts"
+                cut_path = os.path.join(live_dir, f"cut_{segs[0].seq}{ext}")
+                with span("live.cut"):
+                    _concat_segments(segs, cut_path)
+                meta = {
+                    "created_at": utc_ts(),
+                    "mode": "live",
+                    "broadcaster_name": broadcaster_name,
+                    "stream_title": (stream_info or {}).get("title", ""),
+                    "game_name": (stream_info or {}).get("game_name", ""),
+                    "highlight": {
+                        "stream_start_sec": start,
+                        "duration_sec": dur,
+                        "score": round(score, 4),
+                    },
+                }
+                print(f"✨ Live highlight at {start}s (score {score:.2f})")
+                out_name = safe_filename(
+                    f"{broadcaster_name}_live_{sha1(cut_path + utc_ts())[:12]}.mp4"
+                )
+                fut = renders.submit(
+                    then=lambda rr, meta=meta: _publish_cut(s, meta, rr),
+                    input_path=cut_path,
+                    output_path=os.path.join(s.renders_dir, out_name),
+                    start_sec=start - segs[0].start_sec,
+                    duration_sec=dur,
+                    logo_path=s.logo_path,
+                    subscribe_path=s.subscribe_path,
+                )
+                fut.add_done_callback(lambda _f, p=cut_path: _discard(p))
+                pending.append(fut)
+
+            # a long session must not hold on to every finished render
+            for f in [f for f in pending if f.done()]:
+                pending.remove(f)
+                _collect(f, outputs)
+
+            if deadline and time.time() >= deadline:
+                break
+            if not new:
+                if finished:
+                    break
+                time.sleep(POLL_SEC)
+    finally:
+        if recorder is not None:
+            recorder.stop()
+        for f in pending:
+            _collect(f, outputs)
+        renders.shutdown(wait=True)
+
+    print(f"⏹ Live session ended after {scorer.seconds}s of stream")
+    return outputs
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    ap = argparse.ArgumentParser(prog="python -m src.live")
+    ap.add_argument("--url", help="channel URL or HLS URL/path to record")
+    ap.add_argument("--playlist", help="watch an existing HLS media playlist")
+    ap.add_argument("--name", default="", help="broadcaster name for outputs")
+    ap.add_argument("--max-minutes", type=float, default=0.0)
+    args = ap.parse_args(argv)
+
+    s = get_settings()
+    configure_metrics(s.logs_dir, prom_path=s.metrics_textfile, run_id=utc_ts())
+
+    if args.url or args.playlist:
+        source = args.url
+        if source and "twitch.tv/" in source:
+            from .downloader import resolve_live_hls_url
+
+            source = resolve_live_hls_url(source)
+        run_live(
+            s,
+            args.name or "live",
+            source_url=source,
+            playlist=args.playlist,
+            max_minutes=args.max_minutes,
+        )
+        return
+
+    from .twitch_client import TwitchClient
+    from .downloader import resolve_live_hls_url
+
+    twitch = TwitchClient(s.twitch_client_id, s.twitch_client_secret)
+    for broadcaster_id in s.broadcaster_ids:
+        stream = twitch.get_live_stream(broadcaster_id)
+        if not stream:
+            continue
+        name = stream.get("user_name") or stream.get("user_login") or broadcaster_id
+        login = stream.get("user_login") or name
+        hls = resolve_live_hls_url(f"https://www.twitch.tv/{login}")
+        run_live(
+            s,
+            name,
+            source_url=hls,
+            max_minutes=args.max_minutes,
+            stream_info=stream,
+            broadcaster_id=broadcaster_id,
+        )
+        return
+
+    print("💤 No configured broadcaster is live.")
+
+
+if __name__ == "__main__":
+    main()
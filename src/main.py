@@ -1,17 +1,34 @@
 # src/main.py
+import contextlib
 import os
-from typing import Any, Dict, List, Optional
+from dataclasses import asdict
+from typing import Any, Dict, List, Optional, Tuple
 
-from .config import get_settings
+from .config import Settings, get_settings
 from .twitch_client import TwitchClient
 from .vod_finder import pick_next_broadcaster_id, choose_vod
-from .downloader import download_twitch_vod, download_twitch_clip
+from .downloader import (
+    MANIFEST_NAME,
+    DownloadResult,
+    download_twitch_vod,
+    download_twitch_clip,
+    download_twitch_chat,
+    find_cached_vod,
+)
 from .highlight_picker import pick_best_highlight
-from .editor import render_shorts
+from .editor import LAYOUTS
+from .encode_policy import EncodePolicy
+from .render_pool import RenderExecutor
 from .utils import read_json, write_json, safe_filename, sha1, utc_ts
 from .clip_ranker import score_clip  # ✅ use score_clip so we can skip used clips
-from .subtitles import transcribe_to_srt
+from .subtitles import transcribe_range_to_srt
+from .chat_signal import chat_density, load_chat_offsets
+from .dedup import DedupIndex, Fingerprint, fingerprint_range
 from .youtube_uploader import upload_video
+from .metrics import configure as configure_metrics, span
+from .checkpoint import MAX_ATTEMPTS, JobCheckpoint, mark_used
+from .sharding import job_state_paths, shard_path_for, state_path_for
+from . import profiling
 
 # mode: "vods" or "clips"
 MODE = os.getenv("TWITCH_MODE", "vods").lower()
@@ -51,11 +68,6 @@ def _load_state(state_path: str) -> Dict[str, Any]:
     )
 
 
-def _save_state(state_path: str, state: Dict[str, Any]) -> None:
-    state["updated_at"] = utc_ts()
-    write_json(state_path, state)
-
-
 def _pick_best_unused_clip(
     clips: List[Dict[str, Any]], used_clip_ids: set[str]
 ) -> Optional[Dict[str, Any]]:
@@ -68,28 +80,166 @@ def _pick_best_unused_clip(
     return None
 
 
-def main() -> None:
+def _cached_clip_source(
+    clip: Dict[str, Any], vod_dir: str, duration_sec: float, manifest_path: str
+) -> Optional[DownloadResult]:
+    """
+    The clip's source VOD if we already have it, so the clip range can be cut
+    locally instead of downloading the clip.
+    """
+    video_id = str(clip.get("video_id") or "")
+    vod_offset = clip.get("vod_offset")
+    if not video_id or vod_offset is None:
+        return None
+    return find_cached_vod(
+        video_id,
+        vod_dir,
+        min_duration_sec=float(vod_offset) + duration_sec,
+        manifest_path=manifest_path,
+    )
+
+
+def _fetch_clip(
+    clip: Dict[str, Any], s: Settings, broadcaster_id: str, duration_sec: float
+) -> Tuple[DownloadResult, float]:
+    """
+    (source, start within it) for a clip: a local cut from the cached source
+    VOD when we have it (no network I/O), otherwise the downloaded clip.
+    """
+    manifest = shard_path_for(s, MANIFEST_NAME, broadcaster_id)
+    dl = _cached_clip_source(clip, s.vod_dir, duration_sec, manifest)
+    if dl is not None:
+        start = float(clip["vod_offset"])
+        print(f"✂️ Cutting clip from cached VOD @ {start:.1f}s")
+        return dl, start
+
+    with span("main.download"):
+        dl = download_twitch_clip(str(clip.get("url", "")), out_dir=s.vod_dir)
+    print("✅ Downloaded clip:", dl.vod_path)
+    return dl, 0.0
+
+
+def _extra_layouts() -> List[str]:
+    """
+    RENDER_LAYOUTS: extra output formats besides the vertical short,
+    e.g. "square,landscape" (see editor.LAYOUTS).
+    """
+    names = [n.strip().lower() for n in os.getenv("RENDER_LAYOUTS", "").split(",")]
+    for name in names:
+        if name and name not in LAYOUTS:
+            raise ValueError(f"Unknown layout in RENDER_LAYOUTS: {name}")
+    return [n for n in names if n and n != "vertical"]
+
+
+def _pending_render_sec(state_paths: List[str], broadcaster_id: str) -> float:
+    """
+    Seconds of short still to render for other broadcasters' unfinished jobs.
+    """
+    jobs = {}
+    for path in state_paths:
+        jobs.update(read_json(path, {}).get("jobs", {}))
+    return sum(
+        float(job["stages"]["highlight"].get("duration_sec", 0.0))
+        for bid, job in jobs.items()
+        if bid != broadcaster_id
+        and "highlight" in job.get("stages", {})
+        and not job["stages"].get("render", {}).get("done")
+    )
+
+
+def _fingerprint(
+    path: str, start_sec: float, duration_sec: float
+) -> Optional[Fingerprint]:
+    """
+    Dedup fingerprint of a cut, or None when the media cannot be read. Dedup
+    only saves work, so a failure here treats the cut as new.
+    """
+    try:
+        return fingerprint_range(path, start_sec, duration_sec)
+    except (RuntimeError, OSError) as e:
+        print("⚠️ Dedup fingerprint failed, treating as new:", e)
+        return None
+
+
+def _dedup_index(s: Settings, broadcaster_id: str) -> Optional[DedupIndex]:
+    if os.getenv("DEDUP_ENABLED", "true").lower() != "true":
+        return None
+    # sharded, the index moves with the broadcaster like state.json does
+    return DedupIndex(shard_path_for(s, "dedup_index.json", broadcaster_id))
+
+
+def main(broadcaster_id: Optional[str] = None) -> Optional[str]:
+    """
+    One pipeline run. broadcaster_id skips the round-robin pick (event-driven
+    runs). Returns the broadcaster that was processed.
+    """
     s = get_settings()
+    configure_metrics(s.logs_dir, prom_path=s.metrics_textfile, run_id=utc_ts())
+    profiling.configure(
+        s.logs_dir,
+        stages=s.profile_stages,
+        mode=s.profile_mode,
+        trace_memory=s.profile_tracemalloc,
+    )
+
+    with span("main.job", mode=MODE):
+        return _run(s, broadcaster_id)
+
 
+def _run(s: Settings, broadcaster_id: Optional[str] = None) -> Optional[str]:
     # -----------------------
     # Validate config/assets
     # -----------------------
     if not s.twitch_client_id or not s.twitch_client_secret:
         raise ValueError("Missing TWITCH_CLIENT_ID or TWITCH_CLIENT_SECRET")
-    if not s.broadcaster_ids:
+    if not s.all_broadcaster_ids:
         raise ValueError("Missing TWITCH_BROADCASTER_IDS")
+    if not s.broadcaster_ids:
+        print(f"🧩 Node {s.node_id}/{s.node_count} owns no broadcasters")
+        return None
     if not os.path.exists(s.logo_path):
         raise FileNotFoundError(f"Missing logo: {s.logo_path}")
     if not os.path.exists(s.subscribe_path):
         raise FileNotFoundError(f"Missing subscribe icon: {s.subscribe_path}")
 
-    state_path = os.path.join(s.cache_dir, "state.json")
-    state = _load_state(state_path)
+    # -----------------------
+    # ⏯️ Resume an unfinished job first
+    # -----------------------
+    ck = None
+    if broadcaster_id:
+        ck = JobCheckpoint.resume(
+            state_path_for(s, broadcaster_id), MODE, broadcaster_id
+        )
+    else:
+        for path in job_state_paths(s):
+            ck = JobCheckpoint.resume(path, MODE)
+            if ck is not None:
+                break
+    if ck is not None and ck.attempts > MAX_ATTEMPTS:
+        print(
+            f"🪦 Giving up on {ck.data('source').get('id')} "
+            f"after {MAX_ATTEMPTS} attempts"
+        )
+        ck.finish()
+        ck = None
+
+    if ck is not None:
+        broadcaster_id = ck.broadcaster_id
+        print(
+            f"⏯️ Resuming job {ck.data('source').get('id')} "
+            f"(attempt {ck.attempts}) at stage: {ck.next_stage}"
+        )
 
     # -----------------------
     # Round-robin broadcaster
     # -----------------------
-    broadcaster_id = pick_next_broadcaster_id(s.broadcaster_ids, state_path=state_path)
+    elif not broadcaster_id:
+        broadcaster_id = pick_next_broadcaster_id(
+            s.broadcaster_ids, state_path=state_path_for(s)
+        )
+
+    # used ids and the job checkpoint live in the broadcaster's shard
+    state_path = state_path_for(s, broadcaster_id)
 
     twitch = TwitchClient(s.twitch_client_id, s.twitch_client_secret)
     user = twitch.get_user(broadcaster_id)
@@ -98,111 +248,259 @@ def main() -> None:
     print(f"\n🎮 Broadcaster: {broadcaster_name}")
     print(f"⚙️ Mode: {MODE.upper()}")
 
-    # -----------------------
-    # Shared variables
-    # -----------------------
-    source_id = ""
-    source_title = ""
-    source_url = ""
-    game_name = ""
-
-    dl = None
-    highlight_start = 0.0
-    highlight_duration = 0.0
-    highlight_score = 0.0
+    # 🧬 near-duplicate index of published shorts (source VOD range + fingerprint)
+    dedup = _dedup_index(s, broadcaster_id)
 
     # =====================================================
     # 🎬 CLIPS MODE
     # =====================================================
     if MODE == "clips":
-        lookback_hours = int(os.getenv("CLIPS_LOOKBACK_HOURS", "48"))
-
-        clips = twitch.get_top_clips(
-            broadcaster_id=broadcaster_id,
-            lookback_hours=lookback_hours,
-            limit=20,  # ✅ a bit more so we can skip used clips
-        )
-
-        if not clips:
-            print("❌ No clips found.")
-            return
-
-        used_clips = set(state.get("used_clips", []))
-        clip = _pick_best_unused_clip(clips, used_clips)
-
-        if not clip:
-            print("🚫 All fetched clips have already been used — skipping this cycle.")
-            return
-
-        source_id = str(clip.get("id", ""))
-        source_title = str(clip.get("title", ""))
-        source_url = str(clip.get("url", ""))
-        game_name = str(clip.get("game_name", ""))
+        if ck is None:
+            lookback_hours = int(os.getenv("CLIPS_LOOKBACK_HOURS", "48"))
 
-        print(f"🔥 Clip: {source_title}")
-        print(f"🔗 URL: {source_url}")
-
-        dl = download_twitch_clip(source_url, out_dir=s.vod_dir)
-        print("✅ Downloaded clip:", dl.vod_path)
+            clips = twitch.get_top_clips(
+                broadcaster_id=broadcaster_id,
+                lookback_hours=lookback_hours,
+                limit=20,  # ✅ a bit more so we can skip used clips
+            )
 
-        highlight_start = 0.0
-        highlight_duration = min(
-            float(clip.get("duration", 60.0)), float(s.highlight_max_sec)
-        )
-        highlight_score = float(score_clip(clip))
+            if not clips:
+                print("❌ No clips found.")
+                return broadcaster_id
+
+            used_clips = set(_load_state(state_path).get("used_clips", []))
+            rejected: List[str] = []
+            fp: Optional[Fingerprint] = None
+
+            while True:
+                clip = _pick_best_unused_clip(clips, used_clips)
+                if not clip:
+                    break
+
+                source_id = str(clip.get("id", ""))
+                highlight_duration = min(
+                    float(clip.get("duration", 60.0)), float(s.highlight_max_sec)
+                )
+
+                # clips of a moment we already published are rejected before
+                # download (vod_offset is null when the VOD was deleted or
+                # still processing)
+                vod_offset = clip.get("vod_offset")
+                dedup_vod_id = (
+                    str(clip.get("video_id") or "") if vod_offset is not None else ""
+                )
+                dedup_vod_start = float(vod_offset or 0.0)
+                if dedup is not None and dedup_vod_id:
+                    dup = dedup.find_source(
+                        dedup_vod_id,
+                        dedup_vod_start,
+                        dedup_vod_start + highlight_duration,
+                    )
+                    if dup:
+                        print(
+                            f"♻️ Clip {source_id} overlaps published short {dup['id']}"
+                        )
+                        used_clips.add(source_id)
+                        rejected.append(source_id)
+                        continue
+
+                print(f"🔥 Clip: {clip.get('title', '')}")
+                print(f"🔗 URL: {clip.get('url', '')}")
+                dl, highlight_start = _fetch_clip(
+                    clip, s, broadcaster_id, highlight_duration
+                )
+
+                # ...and near-duplicates (other viewers' clips, VOD cuts) before render
+                if dedup is not None:
+                    fp = _fingerprint(dl.vod_path, highlight_start, highlight_duration)
+                    dup = dedup.find(fp) if fp is not None else None
+                    if dup:
+                        print(
+                            f"♻️ Clip {source_id} looks like published short {dup['id']}"
+                        )
+                        used_clips.add(source_id)
+                        rejected.append(source_id)
+                        # a downloaded clip is ours to drop; a cached VOD is not
+                        if dl.vod_url == str(clip.get("url", "")):
+                            with contextlib.suppress(OSError):
+                                os.remove(dl.vod_path)
+                        continue
+                break
+
+            if rejected:
+                mark_used(state_path, MODE, rejected)
+            if not clip:
+                print(
+                    "🚫 All fetched clips have already been used — skipping this cycle."
+                )
+                return broadcaster_id
+
+            # the clip is marked used when this job finishes (or is given up on)
+            ck = JobCheckpoint.start(
+                state_path,
+                broadcaster_id,
+                MODE,
+                id=source_id,
+                title=str(clip.get("title", "")),
+                url=str(clip.get("url", "")),
+                game_name=str(clip.get("game_name", "")),
+                video_id=clip.get("video_id"),
+                vod_offset=clip.get("vod_offset"),
+                duration=highlight_duration,
+            )
+            ck.complete("download", vod_path=dl.vod_path, vod_url=dl.vod_url)
+            ck.complete(
+                "highlight",
+                start_sec=highlight_start,
+                duration_sec=highlight_duration,
+                score=float(score_clip(clip)),
+                vod_id=dedup_vod_id,
+                vod_start=dedup_vod_start,
+                fingerprint=asdict(fp) if fp is not None else None,
+            )
 
-        # ✅ mark clip as used immediately (prevents repeats even if later steps crash)
-        used_clips.add(source_id)
-        state["used_clips"] = list(used_clips)[-150:]
-        _save_state(state_path, state)
+        elif not os.path.exists(ck.data("download").get("vod_path", "")):
+            src = ck.data("source")
+            print(f"🔥 Clip: {src.get('title', '')}")
+            dl, highlight_start = _fetch_clip(
+                src, s, broadcaster_id, float(src["duration"])
+            )
+            ck.complete("download", vod_path=dl.vod_path, vod_url=dl.vod_url)
+            ck.complete("highlight", start_sec=highlight_start)
 
     # =====================================================
     # 📼 VODS MODE
     # =====================================================
     else:
-        vods = twitch.get_latest_vods(broadcaster_id, limit=5)
-        vod = choose_vod(vods, state_path=state_path)
-
-        # ✅ choose_vod now returns None when everything was used
-        if not vod:
-            print("🚫 No unused VOD found — skipping this cycle.")
-            return
-
-        source_id = str(vod.get("id", ""))
-        source_title = str(vod.get("title", ""))
-        source_url = str(vod.get("url", ""))
-        game_id = str(vod.get("game_id", ""))
-
-        game = twitch.get_game(game_id) if game_id else {}
-        game_name = str(game.get("name", ""))
+        if ck is None:
+            vods = twitch.get_latest_vods(broadcaster_id, limit=5)
+            vod = choose_vod(vods, state_path=state_path)
+
+            # ✅ choose_vod now returns None when everything was used
+            if not vod:
+                print("🚫 No unused VOD found — skipping this cycle.")
+                return broadcaster_id
+
+            game_id = str(vod.get("game_id", ""))
+            game = twitch.get_game(game_id) if game_id else {}
+
+            ck = JobCheckpoint.start(
+                state_path,
+                broadcaster_id,
+                MODE,
+                id=str(vod.get("id", "")),
+                title=str(vod.get("title", "")),
+                url=str(vod.get("url", "")),
+                game_name=str(game.get("name", "")),
+            )
 
-        print(f"📼 VOD: {source_title}")
+        src = ck.data("source")
+        source_id = src["id"]
+        source_url = src["url"]
+        print(f"📼 VOD: {src['title']}")
         print(f"🔗 URL: {source_url}")
 
-        dl = download_twitch_vod(source_url, out_dir=s.vod_dir, prefer_height=720)
-        print("✅ Downloaded:", dl.vod_path)
-
-        wav_cache = os.path.join(s.audio_dir, f"{sha1(dl.vod_path)}.wav")
-        highlight = pick_best_highlight(
-            video_path=dl.vod_path,
-            wav_cache_path=wav_cache,
-            min_sec=s.highlight_min_sec,
-            max_sec=s.highlight_max_sec,
-        )
-
-        highlight_start = float(highlight.start_sec)
-        highlight_duration = float(highlight.duration_sec)
-        highlight_score = float(highlight.score)
+        if ck.done("download") and os.path.exists(ck.data("download")["vod_path"]):
+            print("♻️ Download exists:", ck.data("download")["vod_path"])
+        else:
+            with span("main.download"):
+                dl = download_twitch_vod(
+                    source_url,
+                    out_dir=s.vod_dir,
+                    prefer_height=720,
+                    manifest_path=shard_path_for(s, MANIFEST_NAME, broadcaster_id),
+                )
+            ck.complete("download", vod_path=dl.vod_path, vod_url=dl.vod_url)
+            print("✅ Downloaded:", dl.vod_path)
+        vod_path = ck.data("download")["vod_path"]
+
+        if not ck.done("highlight"):
+            # 💬 optional chat replay: "ytdlp" fetches rechat, or a local JSON path
+            chat = None
+            chat_source = os.getenv("CHAT_SOURCE", "").strip()
+            if chat_source:
+                try:
+                    if chat_source.lower() == "ytdlp":
+                        chat_path = download_twitch_chat(
+                            source_url,
+                            out_dir=os.path.join(s.twitch_cache_dir, "chat"),
+                        )
+                    else:
+                        chat_path = chat_source
+                    chat = chat_density(load_chat_offsets(chat_path))
+                    print(f"💬 Chat replay: {int(chat.sum())} messages")
+                except Exception as e:
+                    print("⚠️ Chat replay unavailable:", e)
+
+            wav_cache = None
+            if os.getenv("CACHE_ANALYSIS_WAV", "false").lower() == "true":
+                wav_cache = os.path.join(s.audio_dir, f"{sha1(vod_path)}.wav")
+            with span("main.highlight"):
+                highlight = pick_best_highlight(
+                    video_path=vod_path,
+                    wav_cache_path=wav_cache,
+                    min_sec=s.highlight_min_sec,
+                    max_sec=s.highlight_max_sec,
+                    weights=s.highlight_weights or None,
+                    chat=chat,
+                    candidates=int(os.getenv("HIGHLIGHT_CANDIDATES", "5")),
+                    scan_max_sec=float(os.getenv("HIGHLIGHT_SCAN_MAX_SEC", "0"))
+                    or None,
+                )
+
+            highlight_start = float(highlight.start_sec)
+            highlight_duration = float(highlight.duration_sec)
+
+            fp = None
+            if dedup is not None:
+                dup = dedup.find_source(
+                    source_id, highlight_start, highlight_start + highlight_duration
+                )
+                if dup is None:
+                    fp = _fingerprint(vod_path, highlight_start, highlight_duration)
+                    dup = dedup.find(fp) if fp is not None else None
+                if dup:
+                    print(f"♻️ Highlight duplicates short {dup['id']} — skipping.")
+                    ck.finish()
+                    return broadcaster_id
+
+            ck.complete(
+                "highlight",
+                start_sec=highlight_start,
+                duration_sec=highlight_duration,
+                score=float(highlight.score),
+                vod_id=source_id,
+                vod_start=highlight_start,
+                fingerprint=asdict(fp) if fp is not None else None,
+            )
 
-        print(
-            f"✨ Highlight start={highlight_start:.1f}s "
-            f"dur={highlight_duration:.1f}s "
-            f"score={highlight_score:.3f}"
-        )
+    # -----------------------
+    # Job inputs from the checkpoint (fresh or resumed alike)
+    # -----------------------
+    src = ck.data("source")
+    source_id = str(src.get("id", ""))
+    source_title = str(src.get("title", ""))
+    source_url = str(src.get("url", ""))
+    game_name = str(src.get("game_name", ""))
+
+    dl = DownloadResult(
+        vod_path=ck.data("download")["vod_path"],
+        vod_url=ck.data("download")["vod_url"],
+    )
 
-    if dl is None:
-        print("❌ Internal error: download result is missing.")
-        return
+    hl = ck.data("highlight")
+    highlight_start = float(hl["start_sec"])
+    highlight_duration = float(hl["duration_sec"])
+    highlight_score = float(hl["score"])
+    dedup_vod_id = str(hl.get("vod_id") or "")
+    dedup_vod_start = float(hl.get("vod_start") or 0.0)
+    fp = Fingerprint(**hl["fingerprint"]) if hl.get("fingerprint") else None
+
+    print(
+        f"✨ Highlight start={highlight_start:.1f}s "
+        f"dur={highlight_duration:.1f}s "
+        f"score={highlight_score:.3f}"
+    )
 
     # =====================================================
     # 🎞️ Render paths (cache key)
@@ -212,21 +510,43 @@ def main() -> None:
     out_path = os.path.join(s.renders_dir, out_name)
     srt_path = out_path.replace(".mp4", ".srt")
 
+    # 📐 other formats of the same highlight (square, landscape) come out of the
+    # same ffmpeg run as the vertical short
+    extra_paths = {
+        name: out_path.replace(".mp4", f"_{name}.mp4") for name in _extra_layouts()
+    }
+
     # =====================================================
     # 🎞️ 1) Render base short (NO subtitles)
     # =====================================================
-    if os.path.exists(out_path):
+    # ⚙️ preset / CRF / fps from backlog, target time-to-publish and measured speed
+    policy = EncodePolicy(shard_path_for(s, "encoder_speed.json", broadcaster_id))
+    backlog_sec = _pending_render_sec(job_state_paths(s), broadcaster_id)
+    # one job at a time here; the executor applies the RENDER_THREAD_BUDGET
+    # split and feeds finished renders back into the policy
+    renders = RenderExecutor(jobs=1, policy=policy)
+
+    # a file left by a crashed render is not trusted; only a completed stage is
+    if ck.done("render") and all(
+        os.path.exists(p) for p in [out_path, *extra_paths.values()]
+    ):
         print("♻️ Render exists:", out_path)
     else:
-        rr = render_shorts(
-            input_path=dl.vod_path,
-            output_path=out_path,
-            start_sec=highlight_start,
-            duration_sec=highlight_duration,
-            logo_path=s.logo_path,
-            subscribe_path=s.subscribe_path,
-            subtitles_path=None,
-        )
+        enc = policy.choose(highlight_duration, 1 + len(extra_paths), backlog_sec)
+        print(f"⚙️ Encoder: {enc.preset} crf+{enc.crf_offset} {enc.fps}fps")
+        with span("main.render"):
+            rr = renders.submit(
+                input_path=dl.vod_path,
+                output_path=out_path,
+                start_sec=highlight_start,
+                duration_sec=highlight_duration,
+                logo_path=s.logo_path,
+                subscribe_path=s.subscribe_path,
+                subtitles_path=None,
+                extra_outputs=extra_paths,
+                encoder=enc,
+            ).result()
+        ck.complete("render", path=out_path, extra_paths=extra_paths, encode=rr.encode)
         print("🎬 Rendered base:", rr.output_path)
 
     print("🎬 Base render path:", out_path)
@@ -236,14 +556,27 @@ def main() -> None:
     # =====================================================
     subtitles_ready = False
     if os.getenv("ENABLE_SUBTITLES", "true").lower() == "true":
-        if not os.path.exists(srt_path):
+        if not ck.done("subtitles"):
             print("📝 Generating subtitles...")
             try:
-                transcribe_to_srt(out_path, srt_path)  # ✅ transcribe the final short
+                # ✅ transcribe the short's source range; cached segments of the
+                # same VOD (earlier renders, overlapping windows) are reused
+                with span("main.subtitles"):
+                    transcribe_range_to_srt(
+                        dl.vod_path,
+                        highlight_start,
+                        highlight_duration,
+                        srt_path,
+                        cache_dir=os.path.join(s.twitch_cache_dir, "transcripts"),
+                        source_key=dl.vod_url,
+                    )
             except Exception as e:
                 print("⚠️ Subtitle generation failed:", e)
+            ck.complete(
+                "subtitles", path=srt_path if os.path.exists(srt_path) else None
+            )
 
-        if os.path.exists(srt_path):
+        if ck.data("subtitles").get("path") and os.path.exists(srt_path):
             subtitles_ready = True
             print("✅ Subtitles ready:", srt_path)
         else:
@@ -255,26 +588,38 @@ def main() -> None:
     # 🔥 3) Burn subtitles ONLY IF ready
     # =====================================================
     if subtitles_ready:
-        out_subbed = out_path.replace(".mp4", "_subbed.mp4")
-
-        if not os.path.exists(out_subbed):
+        if ck.done("burn"):
+            print("♻️ Subtitles already burned:", out_path)
+        else:
+            out_subbed = out_path.replace(".mp4", "_subbed.mp4")
+            extra_subbed = {
+                name: p.replace(".mp4", "_subbed.mp4")
+                for name, p in extra_paths.items()
+            }
             print("🔥 Burning subtitles...")
-            rr2 = render_shorts(
-                input_path=dl.vod_path,
-                output_path=out_subbed,
-                start_sec=highlight_start,
-                duration_sec=highlight_duration,
-                logo_path=s.logo_path,
-                subscribe_path=s.subscribe_path,
-                subtitles_path=srt_path,
-            )
+            enc = policy.choose(highlight_duration, 1 + len(extra_paths), backlog_sec)
+            with span("main.burn_subtitles"):
+                rr2 = renders.submit(
+                    input_path=dl.vod_path,
+                    output_path=out_subbed,
+                    start_sec=highlight_start,
+                    duration_sec=highlight_duration,
+                    logo_path=s.logo_path,
+                    subscribe_path=s.subscribe_path,
+                    subtitles_path=srt_path,
+                    extra_outputs=extra_subbed,
+                    encoder=enc,
+                ).result()
             print("✅ Subbed render:", rr2.output_path)
 
-        if os.path.exists(out_subbed):
             os.replace(out_subbed, out_path)
+            for name, p in extra_subbed.items():
+                os.replace(p, extra_paths[name])
+            ck.complete("burn", encode=rr2.encode)
             print("♻️ Replaced base with subbed:", out_path)
     else:
         print("➡️ Using base render (no subtitles)")
+    renders.shutdown()
 
     # =====================================================
     # 🧾 4) Metadata
@@ -301,6 +646,11 @@ def main() -> None:
             "score": highlight_score,
         },
         "render_path": out_path,
+        "extra_renders": extra_paths,
+        # settings of the render that produced the file, with its speed and size
+        "encode": (ck.data("burn") if subtitles_ready else ck.data("render")).get(
+            "encode"
+        ),
         "subtitles_path": srt_path if subtitles_ready else None,
         "youtube": {
             "title": title,
@@ -315,19 +665,67 @@ def main() -> None:
     # =====================================================
     # 🚀 5) Upload YouTube
     # =====================================================
-    resp = upload_video(
-        file_path=out_path,
-        title=title,
-        description=desc,
-        tags=tags,
-        privacy="public",
-    )
-    print("🎉 Uploaded to YouTube:", resp.get("id"))
+    if ck.done("upload"):
+        resp = {"id": ck.data("upload").get("youtube_id")}
+        print("♻️ Already uploaded:", resp.get("id"))
+    else:
+        # the resumable session is checkpointed so a crash mid-upload continues
+        # where the server left off instead of sending the file again
+        with span("main.upload", bytes=os.path.getsize(out_path)):
+            resp = upload_video(
+                file_path=out_path,
+                title=title,
+                description=desc,
+                tags=tags,
+                privacy="public",
+                resume_uri=ck.data("upload").get("session_uri"),
+                on_session=lambda uri: ck.note("upload", session_uri=uri),
+            )
+        ck.complete("upload", youtube_id=resp.get("id"))
+        print("🎉 Uploaded to YouTube:", resp.get("id"))
+
+    if dedup is not None and fp is not None:
+        dedup.add(
+            out_name,
+            fp,
+            vod_id=dedup_vod_id,
+            start_sec=dedup_vod_start,
+            end_sec=dedup_vod_start + highlight_duration,
+            youtube_id=resp.get("id"),
+        )
+        dedup.save()
+    ck.finish()
 
     print("\n✅ DONE")
     print("🎞️ Render:", out_path)
     print("📄 Meta:", meta_path)
+    return broadcaster_id
+
+
+def _apply_cli_overrides(argv: Optional[List[str]] = None) -> None:
+    """
+    CLI switches mirror the PROFILE_* env vars (settings read them later).
+    """
+    import argparse
+
+    ap = argparse.ArgumentParser(prog="python -m src.main")
+    ap.add_argument(
+        "--profile",
+        metavar="STAGES",
+        help='comma-separated stage names, e.g. "highlight.scene_change" or "all"',
+    )
+    ap.add_argument("--profile-mode", choices=profiling.MODES)
+    ap.add_argument("--tracemalloc", action="store_true")
+    args = ap.parse_args(argv)
+
+    if args.profile:
+        os.environ["PROFILE_STAGES"] = args.profile
+    if args.profile_mode:
+        os.environ["PROFILE_MODE"] = args.profile_mode
+    if args.tracemalloc:
+        os.environ["PROFILE_TRACEMALLOC"] = "true"
 
 
 if __name__ == "__main__":
+    _apply_cli_overrides()
     main()
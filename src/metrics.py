@@ -0,0 +1,291 @@
+import functools
+import json
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple, TypeVar
+
+from . import profiling
+from .utils import utc_ts
+
+try:
+    import resource  # not available on Windows
+except ImportError:  # pragma: no cover
+    resource = None  # type: ignore[assignment]
+
+F = TypeVar("F", bound=Callable[..., Any])
+
+_lock = threading.Lock()
+_local = threading.local()
+
+_jsonl_path: Optional[str] = None
+_prom_path: Optional[str] = None
+_run_id = ""
+
+# per-stage aggregates exported to the Prometheus textfile
+_totals: Dict[str, Dict[str, float]] = {}
+_last: Dict[str, Dict[str, float]] = {}
+# free-standing gauges (queue depths, throughput) set with gauge()
+_gauges: Dict[str, Tuple[float, str]] = {}
+
+_PROM_FIELDS = (
+    ("wall_sec", "Wall-clock seconds spent in the stage"),
+    ("cpu_sec", "CPU seconds (stage thread + its tool subprocesses) in the stage"),
+    ("read_bytes", "Bytes read from storage by the stage thread and its tools"),
+    ("write_bytes", "Bytes written to storage by the stage thread and its tools"),
+    ("source_sec", "Seconds of source media processed by the stage"),
+)
+# last-run only: a high-water mark does not add up across runs
+_RSS_FIELDS = (
+    ("process_peak_rss_mb", "Process peak RSS in MiB at the end of the stage"),
+    ("peak_rss_growth_mb", "MiB the stage raised the process peak RSS by"),
+)
+
+
+def configure(logs_dir: str, prom_path: Optional[str] = None, run_id: str = "") -> None:
+    """
+    Enable writing spans to <logs_dir>/metrics.jsonl and a Prometheus textfile.
+    Until this is called spans are still measured but nothing is written.
+    """
+    global _jsonl_path, _prom_path, _run_id
+    os.makedirs(logs_dir, exist_ok=True)
+    _jsonl_path = os.path.join(logs_dir, "metrics.jsonl")
+    _prom_path = prom_path or os.path.join(logs_dir, "streamflare.prom")
+    _run_id = run_id
+
+
+def _stack() -> List[Dict[str, Any]]:
+    st = getattr(_local, "stack", None)
+    if st is None:
+        st = []
+        _local.stack = st
+    return st
+
+
+def rss_mb(ru_maxrss: float) -> float:
+    # Linux reports KiB, macOS reports bytes
+    if sys.platform == "darwin":
+        return float(ru_maxrss) / (1024 * 1024)
+    return float(ru_maxrss) / 1024
+
+
+def _maxrss_mb(who: int) -> float:
+    if resource is None:
+        return 0.0
+    return rss_mb(resource.getrusage(who).ru_maxrss)
+
+
+def _thread_io() -> Tuple[float, float]:
+    """
+    Storage bytes read / written by the calling thread (/proc/thread-self/io),
+    so concurrent jobs in other threads are not counted.
+    """
+    read = write = 0.0
+    try:
+        with open("/proc/thread-self/io", "r", encoding="utf-8") as f:
+            for line in f:
+                key, _, val = line.partition(":")
+                if key == "read_bytes":
+                    read = float(val)
+                elif key == "write_bytes":
+                    write = float(val)
+    except OSError:
+        pass
+    return read, write
+
+
+def charge_child(
+    cpu_sec: float, read_bytes: float, write_bytes: float, peak_rss_mb: float = 0.0
+) -> None:
+    """
+    Charge a reaped subprocess (its own rusage, see subproc.reap) to every
+    open span of the calling thread. ffmpeg / yt-dlp do most of the heavy
+    lifting out of process; process-wide RUSAGE_CHILDREN would also pick up
+    tools run by other jobs at the same time.
+    """
+    for frame in _stack():
+        child = frame["child"]
+        child[0] += cpu_sec
+        child[1] += read_bytes
+        child[2] += write_bytes
+        child[3] = max(child[3], peak_rss_mb)
+
+
+def annotate(**fields: Any) -> None:
+    """
+    Attach extra fields (e.g. source_sec) to the innermost open span.
+    """
+    st = _stack()
+    if st:
+        st[-1]["fields"].update(fields)
+
+
+@contextmanager
+def span(stage: str, **fields: Any) -> Iterator[Dict[str, Any]]:
+    """
+    Measure a pipeline stage: wall time, CPU time, storage bytes, and the
+    process RSS high-water mark (ru_maxrss is per process, so the stage's own
+    share is only visible as how much it raised the mark).
+    Yields the field dict so callers can add values while the stage runs.
+    """
+    st = _stack()
+    parent = st[-1]["stage"] if st else None
+    frame: Dict[str, Any] = {
+        "stage": stage,
+        "fields": dict(fields),
+        "child": [0.0, 0.0, 0.0, 0.0],  # cpu_sec, read/write bytes, peak RSS MiB
+    }
+    st.append(frame)
+
+    prof = profiling.start(stage)
+    rss0 = _maxrss_mb(resource.RUSAGE_SELF) if resource is not None else 0.0
+    io0 = _thread_io()
+    cpu0 = time.thread_time()
+    t0 = time.perf_counter()
+    ok = True
+    error = None
+    try:
+        yield frame["fields"]
+    except BaseException as e:
+        ok = False
+        error = f"{type(e).__name__}: {e}"[:300]
+        raise
+    finally:
+        wall = time.perf_counter() - t0
+        io1 = _thread_io()
+        child_cpu, child_read, child_write, child_rss = frame["child"]
+        cpu = time.thread_time() - cpu0 + child_cpu
+        if prof is not None:
+            frame["fields"].update(profiling.finish(prof))
+        st.pop()
+
+        rec: Dict[str, Any] = {
+            "ts": utc_ts(),
+            "run_id": _run_id,
+            "stage": stage,
+            "parent": parent,
+            "ok": ok,
+            "wall_sec": round(wall, 4),
+            "cpu_sec": round(cpu, 4),
+            "process_peak_rss_mb": None,
+            "peak_rss_growth_mb": None,
+            # largest single tool subprocess reaped during the stage
+            "children_peak_rss_mb": round(child_rss, 1) if child_rss else None,
+            "read_bytes": int(io1[0] - io0[0] + child_read),
+            "write_bytes": int(io1[1] - io0[1] + child_write),
+        }
+        if resource is not None:
+            rss1 = _maxrss_mb(resource.RUSAGE_SELF)
+            rec["process_peak_rss_mb"] = round(rss1, 1)
+            rec["peak_rss_growth_mb"] = round(rss1 - rss0, 1)
+        rec.update(frame["fields"])
+        src = rec.get("source_sec")
+        if src and wall > 0:
+            rec["realtime_x"] = round(float(src) / wall, 3)
+        if error:
+            rec["error"] = error
+
+        _record(rec)
+
+
+def timed(stage: str) -> Callable[[F], F]:
+    """
+    Decorator form of span() for helper functions.
+    """
+
+    def deco(fn: F) -> F:
+        @functools.wraps(fn)
+        def wrapper(*args: Any, **kwargs: Any) -> Any:
+            with span(stage):
+                return fn(*args, **kwargs)
+
+        return wrapper  # type: ignore[return-value]
+
+    return deco
+
+
+def gauge(name: str, value: float, help_text: str = "") -> None:
+    """
+    Set streamflare_<name> in the Prometheus textfile (not written to jsonl).
+    """
+    with _lock:
+        _gauges[name] = (float(value), help_text)
+        if _jsonl_path is None:
+            return
+        try:
+            _write_prom()
+        except OSError as e:
+            print("⚠️ Metrics write failed:", e)
+
+
+def _record(rec: Dict[str, Any]) -> None:
+    stage = rec["stage"]
+    with _lock:
+        tot = _totals.setdefault(stage, {"runs": 0.0, "failures": 0.0})
+        tot["runs"] += 1
+        if not rec["ok"]:
+            tot["failures"] += 1
+        for key, _ in _PROM_FIELDS:
+            val = rec.get(key)
+            if isinstance(val, (int, float)) and not isinstance(val, bool):
+                tot[key] = tot.get(key, 0.0) + float(val)
+
+        last: Dict[str, float] = {}
+        for key in [k for k, _ in _PROM_FIELDS + _RSS_FIELDS]:
+            val = rec.get(key)
+            if isinstance(val, (int, float)):
+                last[key] = float(val)
+        _last[stage] = last
+
+        if _jsonl_path is None:
+            return
+
+        try:
+            with open(_jsonl_path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(rec) + "\n")
+            _write_prom()
+        except OSError as e:
+            print("⚠️ Metrics write failed:", e)
+
+
+def _write_prom() -> None:
+    if not _prom_path:
+        return
+
+    lines: List[str] = []
+    for key, help_text in _PROM_FIELDS:
+        name = f"streamflare_stage_{key}_total"
+        lines.append(f"# HELP {name} {help_text} (cumulative).")
+        lines.append(f"# TYPE {name} counter")
+        for stage, tot in sorted(_totals.items()):
+            if key in tot:
+                lines.append(f'{name}{{stage="{stage}"}} {tot[key]:.6g}')
+
+    for key, help_text in _PROM_FIELDS + _RSS_FIELDS:
+        name = f"streamflare_stage_last_{key}"
+        lines.append(f"# HELP {name} {help_text} (last run).")
+        lines.append(f"# TYPE {name} gauge")
+        for stage, last in sorted(_last.items()):
+            if key in last:
+                lines.append(f'{name}{{stage="{stage}"}} {last[key]:.6g}')
+
+    for key in ("runs", "failures"):
+        name = f"streamflare_stage_{key}_total"
+        lines.append(f"# TYPE {name} counter")
+        for stage, tot in sorted(_totals.items()):
+            lines.append(f'{name}{{stage="{stage}"}} {tot[key]:.0f}')
+
+    for gname, (value, help_text) in sorted(_gauges.items()):
+        name = f"streamflare_{gname}"
+        if help_text:
+            lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} gauge")
+        lines.append(f"{name} {value:.6g}")
+
+    # atomic replace so node_exporter never reads a half-written file
+    tmp = _prom_path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write("\n".join(lines) + "\n")
+    os.replace(tmp, _prom_path)
@@ -0,0 +1,168 @@
+import cProfile
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from datetime import datetime, timezone
+from typing import Any, Dict, Optional
+
+# Opt-in profiling for named stages (the same names used by metrics spans).
+# Disabled unless configure() is given at least one stage, in which case the
+# only cost on other stages is a frozenset membership test.
+
+_stages: frozenset = frozenset()
+_mode = "cprofile"
+_tracemalloc = False
+_out_dir = ""
+_local = threading.local()
+
+MODES = ("cprofile", "sample")
+
+
+def configure(
+    logs_dir: str,
+    stages: list[str],
+    mode: str = "cprofile",
+    trace_memory: bool = False,
+) -> None:
+    """
+    stages: stage names such as "highlight.scene_change", or "all".
+    mode: "cprofile" (.prof for pstats/snakeviz) or "sample" (.collapsed
+    stacks for flamegraph.pl / speedscope).
+    """
+    global _stages, _mode, _tracemalloc, _out_dir
+    mode = (mode or "cprofile").lower()
+    if mode not in MODES:
+        raise ValueError(f"PROFILE_MODE must be one of {MODES}, got {mode!r}")
+
+    _stages = frozenset(stages)
+    _mode = mode
+    _tracemalloc = trace_memory
+    _out_dir = os.path.join(logs_dir, "profiles")
+    if _stages:
+        os.makedirs(_out_dir, exist_ok=True)
+        print(f"🔬 Profiling {', '.join(sorted(_stages))} ({_mode})")
+
+
+def wants(stage: str) -> bool:
+    return bool(_stages) and (stage in _stages or "all" in _stages)
+
+
+def _stamp() -> str:
+    return datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%S_%fZ")
+
+
+class _Sampler(threading.Thread):
+    """
+    Wall-clock sampler of one thread's Python stack, aggregated into
+    collapsed-stack lines ("outer;inner count").
+    """
+
+    def __init__(self, target_ident: int, interval: float) -> None:
+        super().__init__(daemon=True)
+        self.target_ident = target_ident
+        self.interval = interval
+        self.stacks: Counter = Counter()
+        self._stop_evt = threading.Event()
+
+    def run(self) -> None:
+        while not self._stop_evt.wait(self.interval):
+            frame = sys._current_frames().get(self.target_ident)
+            names = []
+            while frame is not None:
+                code = frame.f_code
+                mod = os.path.splitext(os.path.basename(code.co_filename))[0]
+                names.append(f"{mod}:{code.co_name}")
+                frame = frame.f_back
+            if names:
+                self.stacks[";".join(reversed(names))] += 1
+
+    def stop(self) -> None:
+        self._stop_evt.set()
+        self.join()
+
+
+class ProfileSession:
+    def __init__(self, stage: str) -> None:
+        self.stage = stage
+        self.base = os.path.join(_out_dir, f"{stage}_{_stamp()}")
+        self._prof: Optional[cProfile.Profile] = None
+        self._sampler: Optional[_Sampler] = None
+        self._own_tracemalloc = False
+
+    def start(self) -> None:
+        if _tracemalloc and not tracemalloc.is_tracing():
+            tracemalloc.start(10)
+            self._own_tracemalloc = True
+        if tracemalloc.is_tracing():
+            tracemalloc.reset_peak()
+
+        if _mode == "sample":
+            interval = float(os.getenv("PROFILE_SAMPLE_MS", "5")) / 1000.0
+            self._sampler = _Sampler(threading.get_ident(), interval)
+            self._sampler.start()
+        else:
+            self._prof = cProfile.Profile()
+            self._prof.enable()
+
+    def stop(self) -> Dict[str, Any]:
+        out: Dict[str, Any] = {}
+
+        if self._prof is not None:
+            self._prof.disable()
+            path = self.base + ".prof"
+            self._prof.dump_stats(path)
+            out["profile_path"] = path
+
+        if self._sampler is not None:
+            self._sampler.stop()
+            path = self.base + ".collapsed"
+            with open(path, "w", encoding="utf-8") as f:
+                for stack, count in self._sampler.stacks.most_common():
+                    f.write(f"{stack} {count}\n")
+            out["profile_path"] = path
+
+        if tracemalloc.is_tracing() and (_tracemalloc or self._own_tracemalloc):
+            _, peak = tracemalloc.get_traced_memory()
+            snap = tracemalloc.take_snapshot()
+            path = self.base + ".tracemalloc"
+            snap.dump(path)
+            with open(self.base + ".top.txt", "w", encoding="utf-8") as f:
+                for stat in snap.statistics("lineno")[:30]:
+                    f.write(f"{stat}\n")
+            out["tracemalloc_path"] = path
+            out["tracemalloc_peak_mb"] = round(peak / (1024 * 1024), 2)
+            if self._own_tracemalloc:
+                tracemalloc.stop()
+
+        return out
+
+
+def start(stage: str) -> Optional[ProfileSession]:
+    """
+    Begin profiling a stage if it was selected. Nested selected stages in the
+    same thread are covered by the outer session rather than restarted.
+    """
+    if not wants(stage) or getattr(_local, "active", False):
+        return None
+    sess = ProfileSession(stage)
+    _local.active = True
+    try:
+        sess.start()
+    except Exception:
+        _local.active = False
+        raise
+    return sess
+
+
+def finish(sess: ProfileSession) -> Dict[str, Any]:
+    t0 = time.perf_counter()
+    try:
+        out = sess.stop()
+    finally:
+        _local.active = False
+    print(f"🔬 Profile {sess.stage} → {out.get('profile_path')}")
+    out["profile_write_sec"] = round(time.perf_counter() - t0, 3)
+    return out
@@ -0,0 +1,185 @@
+# src/render_pool.py
+"""
+Run several render_shorts jobs at once inside a fixed CPU thread budget.
+
+One 1080x1920 libx264 encode does not keep a many-core host busy, but N
+encodes with default threading each size their pools to the whole machine
+and fight over it. The executor splits the budget instead: N jobs with
+budget // N threads each (filter graph and encoder).
+
+    RENDER_THREAD_BUDGET   total threads for renders (default: all cores)
+    RENDER_JOBS            parallel jobs (default: one per 8 threads of budget)
+
+With an EncodePolicy, each job's preset / CRF / frame rate is chosen at
+submit time from the work already queued ahead of it (see encode_policy),
+and finished renders feed the policy's speed estimates.
+
+`python -m benchmarks.run --only render_pool` sweeps jobs x threads on the
+current host and reports the setting with the best total throughput.
+"""
+
+import os
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from .editor import RenderResult, render_shorts
+from .encode_policy import EncodePolicy
+from .metrics import gauge, span
+
+# libx264 frame threading stops scaling well past ~8 threads at 1080x1920
+THREADS_PER_JOB_HINT = 8
+
+
+def plan(budget: int = 0, jobs: int = 0) -> Tuple[int, int]:
+    """
+    (jobs, threads per job) for a thread budget. 0 means "from env / auto".
+    """
+    budget = (
+        budget or int(os.getenv("RENDER_THREAD_BUDGET", "0")) or os.cpu_count() or 1
+    )
+    jobs = jobs or int(os.getenv("RENDER_JOBS", "0"))
+    if jobs <= 0:
+        jobs = max(budget // THREADS_PER_JOB_HINT, 1)
+    jobs = max(min(jobs, budget), 1)
+    return jobs, max(budget // jobs, 1)
+
+
+def _work_sec(render_kwargs: Dict[str, Any]) -> float:
+    # seconds of output a render_shorts call produces, over all its formats
+    outputs = 1 + len(render_kwargs.get("extra_outputs") or {})
+    return float(render_kwargs.get("duration_sec", 0.0)) * outputs
+
+
+class RenderExecutor:
+    """
+    Thread pool of ffmpeg renders. Each job runs in its own metrics span
+    ("render_pool.job") and queue depth / throughput are published as gauges.
+    """
+
+    def __init__(
+        self,
+        jobs: int = 0,
+        threads: Optional[int] = None,
+        budget: int = 0,
+        policy: Optional[EncodePolicy] = None,
+    ) -> None:
+        # threads=None takes the planned split; 0 leaves ffmpeg's own defaults
+        self.jobs, planned = plan(budget, jobs)
+        self.threads = planned if threads is None else threads
+        self._pool = ThreadPoolExecutor(
+            max_workers=self.jobs, thread_name_prefix="render"
+        )
+        self._lock = threading.Lock()
+        self.queued = 0
+        self.running = 0
+        self.completed = 0
+        self.failed = 0
+        self.rendered_sec = 0.0
+        self.policy = policy
+        # output seconds submitted but not finished, for the encode policy
+        self.backlog_sec = 0.0
+        self._started_at: Optional[float] = None
+
+    @property
+    def queue_depth(self) -> int:
+        return self.queued
+
+    def submit(
+        self, then: Optional[Callable[[RenderResult], Any]] = None, **render_kwargs: Any
+    ) -> Future:
+        """
+        Queue one render_shorts call. `then`, if given, runs in the worker after
+        a successful render and its return value becomes the future's result.
+        """
+        with self._lock:
+            if self._started_at is None:
+                self._started_at = time.perf_counter()
+            if self.policy is not None and "encoder" not in render_kwargs:
+                # the workers share the backlog, so a job waits ~backlog / jobs
+                render_kwargs["encoder"] = self.policy.choose(
+                    float(render_kwargs.get("duration_sec", 0.0)),
+                    outputs=1 + len(render_kwargs.get("extra_outputs") or {}),
+                    backlog_sec=self.backlog_sec / self.jobs,
+                )
+            self.backlog_sec += _work_sec(render_kwargs)
+            self.queued += 1
+            self._publish()
+        return self._pool.submit(self._run, time.perf_counter(), then, render_kwargs)
+
+    def _run(
+        self,
+        queued_at: float,
+        then: Optional[Callable[[RenderResult], Any]],
+        render_kwargs: Dict[str, Any],
+    ) -> Any:
+        with self._lock:
+            self.queued -= 1
+            self.running += 1
+            self._publish()
+
+        ok = False
+        rr = None
+        try:
+            with span(
+                "render_pool.job",
+                jobs=self.jobs,
+                threads=self.threads,
+                queue_wait_sec=round(time.perf_counter() - queued_at, 3),
+            ):
+                rr = render_shorts(threads=self.threads, **render_kwargs)
+            ok = True
+        finally:
+            with self._lock:
+                self.running -= 1
+                self.backlog_sec = max(self.backlog_sec - _work_sec(render_kwargs), 0.0)
+                if ok:
+                    self.completed += 1
+                    self.rendered_sec += float(render_kwargs.get("duration_sec", 0.0))
+                else:
+                    self.failed += 1
+                self._publish()
+
+        if self.policy is not None and rr is not None:
+            self.policy.record(rr.encode)
+        return then(rr) if then is not None else rr
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            elapsed = (
+                time.perf_counter() - self._started_at if self._started_at else 0.0
+            )
+            return {
+                "jobs": self.jobs,
+                "threads_per_job": self.threads,
+                "queued": self.queued,
+                "running": self.running,
+                "completed": self.completed,
+                "failed": self.failed,
+                "rendered_sec": round(self.rendered_sec, 3),
+                # seconds of output video per wall second since the first submit
+                "throughput_x": (
+                    round(self.rendered_sec / elapsed, 3) if elapsed else 0.0
+                ),
+            }
+
+    def _publish(self) -> None:
+        # caller holds self._lock
+        elapsed = time.perf_counter() - self._started_at if self._started_at else 0.0
+        gauge("render_queue_depth", self.queued, "Renders waiting for a worker")
+        gauge("render_running", self.running, "Renders in progress")
+        gauge(
+            "render_throughput_x",
+            self.rendered_sec / elapsed if elapsed else 0.0,
+            "Seconds of video rendered per wall second",
+        )
+
+    def shutdown(self, wait: bool = True) -> None:
+        self._pool.shutdown(wait=wait)
+
+    def __enter__(self) -> "RenderExecutor":
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self.shutdown(wait=True)
@@ -1,19 +1,37 @@
+import os
+import threading
 import time
 import traceback
 from datetime import datetime
+from typing import Any, Dict, Optional, Set, Tuple
 
 from .config import get_settings
-from .main import main as run_once
+from .main import MODE, main as run_once
+from .sharding import shard_path_for, state_path_for
+from .utils import read_json, write_json
 
+# "interval": one round-robin run every UPLOAD_INTERVAL_HOURS (original mode)
+# "events":   runs are queued by EventSub notifications / polling as soon as
+#             new content appears; the interval is kept as a per-broadcaster
+#             rate cap and as the round-robin fallback timer
+TRIGGER = os.getenv("SCHEDULER_TRIGGER", "interval").lower()
+POLL_MINUTES = float(os.getenv("EVENT_POLL_MINUTES", "10"))
+# a VOD is only complete a little after stream.offline
+OFFLINE_DELAY_SEC = int(os.getenv("EVENT_OFFLINE_DELAY_SEC", "120"))
 
-def run_scheduler():
-    s = get_settings()
 
-    interval_hours = int(
+def _interval_hours(s: Any) -> int:
+    return int(
         getattr(s, "upload_interval_hours", None)
-        or int(__import__("os").getenv("UPLOAD_INTERVAL_HOURS", "15"))
+        or int(os.getenv("UPLOAD_INTERVAL_HOURS", "15"))
     )
 
+
+def run_scheduler():
+    s = get_settings()
+
+    interval_hours = _interval_hours(s)
+
     interval_seconds = interval_hours * 60 * 60
 
     print("🕒 StreamFlare Scheduler Started")
@@ -40,6 +58,176 @@ def run_scheduler():
         time.sleep(sleep_for)
 
 
+class RunQueue:
+    """
+    Pending runs, at most one per broadcaster ("" = next in round-robin).
+    Each entry has a not-before time; get() returns the earliest due entry.
+    """
+
+    def __init__(self) -> None:
+        self._cv = threading.Condition()
+        self._due: Dict[str, Tuple[float, str]] = {}
+
+    def put(self, broadcaster_id: str, reason: str, not_before: float = 0.0) -> None:
+        with self._cv:
+            cur = self._due.get(broadcaster_id)
+            if cur is None or not_before < cur[0]:
+                self._due[broadcaster_id] = (not_before, reason)
+            self._cv.notify_all()
+
+    def get(self, timeout: float) -> Optional[Tuple[str, str]]:
+        deadline = time.time() + timeout
+        with self._cv:
+            while True:
+                now = time.time()
+                if self._due:
+                    bid, (at, reason) = min(self._due.items(), key=lambda kv: kv[1][0])
+                    if at <= now:
+                        del self._due[bid]
+                        return bid, reason
+                    wait = min(at, deadline) - now
+                else:
+                    wait = deadline - now
+                if wait <= 0:
+                    return None
+                self._cv.wait(wait)
+
+    def __len__(self) -> int:
+        with self._cv:
+            return len(self._due)
+
+
+def _poll_new_content(s: Any, queue: RunQueue, seen: Dict[str, Set[str]]) -> None:
+    """
+    Polling fallback: one Helix call per broadcaster, queueing a run when a VOD
+    (or, in clips mode, a clip) shows up that is neither used nor already queued.
+    While a broadcaster is live its newest archive VOD is still being recorded,
+    so VOD polling skips them and leaves the run to stream.offline / a later poll.
+    """
+    from .twitch_client import TwitchClient
+
+    twitch = TwitchClient(s.twitch_client_id, s.twitch_client_secret)
+    for broadcaster_id in s.broadcaster_ids:
+        state = read_json(state_path_for(s, broadcaster_id), {})
+        used = set(state.get("used_clips" if MODE == "clips" else "used_vods", []))
+        try:
+            if MODE == "clips":
+                items = twitch.get_top_clips(broadcaster_id, lookback_hours=6, limit=5)
+            elif twitch.get_live_stream(broadcaster_id):
+                continue
+            else:
+                items = twitch.get_latest_vods(broadcaster_id, limit=1)
+        except Exception as e:
+            print(f"⚠️ Poll failed for {broadcaster_id}:", e)
+            continue
+
+        # only ids the latest poll returned are remembered, so seen stays small
+        returned = [str(it["id"]) for it in items if it.get("id")]
+        known = seen.get(broadcaster_id, set()) & set(returned)
+        fresh = [i for i in returned if i not in used | known]
+        known.update(fresh)
+        seen[broadcaster_id] = known
+        if fresh:
+            queue.put(
+                broadcaster_id, f"poll: new {'clip' if MODE == 'clips' else 'vod'}"
+            )
+
+
+def _last_run(s: Any, broadcaster_id: str) -> float:
+    path = shard_path_for(s, "scheduler.json", broadcaster_id or None)
+    return float(read_json(path, {}).get("last_run", {}).get(broadcaster_id, 0.0))
+
+
+def _record_run(s: Any, broadcaster_id: str, when: float) -> None:
+    """
+    Rate-cap time of a run. Sharded, it is kept with the broadcaster (see
+    shard_path_for) so the cap still holds after the broadcaster moves node.
+    """
+    path = shard_path_for(s, "scheduler.json", broadcaster_id or None)
+    data = read_json(path, {})
+    data.setdefault("last_run", {})[broadcaster_id] = when
+    write_json(path, data)
+
+
+def run_event_scheduler() -> None:
+    s = get_settings()
+    interval_seconds = _interval_hours(s) * 60 * 60
+
+    queue = RunQueue()
+
+    def on_event(event_type: str, broadcaster_id: str, event: Dict[str, Any]) -> None:
+        if broadcaster_id not in s.broadcaster_ids:
+            return
+        delay = OFFLINE_DELAY_SEC if event_type == "stream.offline" else 0
+        print(f"📨 {event_type} for {broadcaster_id}")
+        queue.put(broadcaster_id, event_type, not_before=time.time() + delay)
+
+    print("🕒 StreamFlare Scheduler Started (event-driven)")
+    if s.node_count > 1:
+        print(
+            f"🧩 Node {s.node_id}/{s.node_count}: "
+            f"{len(s.broadcaster_ids)}/{len(s.all_broadcaster_ids)} broadcasters"
+        )
+    print(f"⏱ Rate cap: one run per broadcaster every {interval_seconds / 3600:.1f}h")
+
+    from . import eventsub
+
+    if eventsub.SECRET:
+        eventsub.start_receiver(on_event)
+        callback = os.getenv("EVENTSUB_CALLBACK_URL", "")
+        if callback:
+            from .twitch_client import TwitchClient
+
+            twitch = TwitchClient(s.twitch_client_id, s.twitch_client_secret)
+            eventsub.subscribe(twitch, s.broadcaster_ids, callback)
+    elif POLL_MINUTES <= 0:
+        print("⚠️ No EVENTSUB_SECRET and polling disabled: interval runs only")
+
+    seen: Dict[str, Set[str]] = {}
+    next_poll = time.time() if POLL_MINUTES > 0 else float("inf")
+    next_interval = time.time()
+
+    while True:
+        now = time.time()
+        if now >= next_interval:
+            queue.put("", "interval")
+            next_interval = now + interval_seconds
+        if now >= next_poll:
+            _poll_new_content(s, queue, seen)
+            next_poll = now + POLL_MINUTES * 60
+
+        item = queue.get(timeout=max(min(next_interval, next_poll) - time.time(), 1.0))
+        if item is None:
+            continue
+        broadcaster_id, reason = item
+
+        # the interval is a rate cap per broadcaster; defer, don't drop
+        last = _last_run(s, broadcaster_id) if broadcaster_id else 0.0
+        if time.time() - last < interval_seconds:
+            queue.put(broadcaster_id, reason, not_before=last + interval_seconds)
+            print(
+                f"⏳ {broadcaster_id} rate-capped; {reason} deferred "
+                f"{(last + interval_seconds - time.time()) / 3600:.2f}h"
+            )
+            continue
+
+        print(f"▶️ Run for {broadcaster_id or 'next broadcaster'} ({reason})")
+        try:
+            done = run_once(broadcaster_id=broadcaster_id or None)
+            print("✅ Run completed successfully")
+        except Exception:
+            done = broadcaster_id
+            print("❌ Run failed:")
+            traceback.print_exc()
+
+        if done:
+            _record_run(s, done, time.time())
+        print(f"📋 Queued runs: {len(queue)}\n")
+
+
 # 🔥 THIS IS WHAT WAS MISSING
 if __name__ == "__main__":
-    run_scheduler()
+    if TRIGGER == "events":
+        run_event_scheduler()
+    else:
+        run_scheduler()
@@ -0,0 +1,134 @@
+# src/sharding.py
+"""
+Consistent-hash sharding of broadcasters across worker nodes.
+
+Nodes are numbered 0..SHARD_NODE_COUNT-1 and each one is placed on a hash
+ring SHARD_VNODES times. A broadcaster belongs to the first node point at or
+after its own hash, so every node computes the same assignment from its id
+and the node count alone, with no coordination. Adding a node (or removing
+the highest-numbered one) only moves the broadcasters that land on its
+points, roughly 1/N of them.
+
+State follows the shard, not the node: with more than one node every
+broadcaster gets its own state.json (used ids, in-flight job), dedup index,
+download manifest, encoder speed and scheduler rate-cap times under
+STREAMFLARE_SHARD_DIR. A node that takes over a broadcaster picks up where
+the previous owner left off when that directory is shared, and no two nodes
+ever write the same file. Media files, logs and the round-robin pointer
+stay in the node's own cache directory.
+
+    python -m src.sharding --nodes 3 --ids 1,2,3,4,5   # show the assignment
+"""
+
+import argparse
+import bisect
+import os
+from typing import Any, Dict, List, Optional
+
+from .utils import safe_filename, sha1
+
+VNODES = int(os.getenv("SHARD_VNODES", "160"))
+
+
+def _point(key: str) -> int:
+    return int(sha1(key)[:16], 16)
+
+
+class HashRing:
+    """
+    Maps keys to node numbers in [0, node_count).
+    """
+
+    def __init__(self, node_count: int, vnodes: int = VNODES) -> None:
+        self.node_count = max(int(node_count), 1)
+        points = sorted(
+            (_point(f"node-{n}#{v}"), n)
+            for n in range(self.node_count)
+            for v in range(max(vnodes, 1))
+        )
+        self._hashes = [h for h, _ in points]
+        self._nodes = [n for _, n in points]
+
+    def owner(self, key: str) -> int:
+        if self.node_count == 1:
+            return 0
+        i = bisect.bisect_left(self._hashes, _point(key)) % len(self._hashes)
+        return self._nodes[i]
+
+
+def owned_broadcasters(
+    broadcaster_ids: List[str], node_id: int, node_count: int
+) -> List[str]:
+    """
+    The subset of broadcaster_ids this node processes, in configured order.
+    """
+    if node_count <= 1:
+        return list(broadcaster_ids)
+    ring = HashRing(node_count)
+    return [b for b in broadcaster_ids if ring.owner(b) == node_id]
+
+
+def shard_path_for(s: Any, name: str, broadcaster_id: Optional[str] = None) -> str:
+    """
+    Cache file `name` for broadcaster_id. Sharded, it lives under
+    shard_dir/<broadcaster>/ and so moves with the broadcaster; unsharded, and
+    for node-level keys (broadcaster_id None), it is the single cache_dir/name.
+    """
+    if s.node_count <= 1 or not broadcaster_id:
+        return os.path.join(s.cache_dir, name)
+    return os.path.join(s.shard_dir, safe_filename(broadcaster_id), name)
+
+
+def state_path_for(s: Any, broadcaster_id: Optional[str] = None) -> str:
+    """
+    state.json holding used ids and the in-flight job for broadcaster_id.
+    """
+    return shard_path_for(s, "state.json", broadcaster_id)
+
+
+def job_state_paths(s: Any) -> List[str]:
+    """
+    Every state file that can hold a job this node is responsible for.
+    """
+    if s.node_count <= 1:
+        return [state_path_for(s)]
+    return [state_path_for(s, b) for b in s.broadcaster_ids]
+
+
+def moved(
+    broadcaster_ids: List[str], old_count: int, new_count: int
+) -> Dict[str, Dict[str, int]]:
+    """
+    Broadcasters whose owner changes when the node count does.
+    """
+    old, new = HashRing(old_count), HashRing(new_count)
+    out = {}
+    for b in broadcaster_ids:
+        a, z = old.owner(b), new.owner(b)
+        if a != z:
+            out[b] = {"from": a, "to": z}
+    return out
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    ap = argparse.ArgumentParser(prog="python -m src.sharding")
+    ap.add_argument(
+        "--nodes", type=int, default=int(os.getenv("SHARD_NODE_COUNT", "1"))
+    )
+    ap.add_argument("--ids", default=os.getenv("TWITCH_BROADCASTER_IDS", ""))
+    ap.add_argument("--resize", type=int, default=0, help="show moves to this count")
+    args = ap.parse_args(argv)
+
+    ids = [x.strip() for x in args.ids.split(",") if x.strip()]
+    for n in range(max(args.nodes, 1)):
+        owned = owned_broadcasters(ids, n, args.nodes)
+        print(f"🧩 node {n}: {len(owned)} broadcaster(s) {', '.join(owned)}")
+    if args.resize:
+        moves = moved(ids, args.nodes, args.resize)
+        print(f"🔀 {args.nodes} → {args.resize} nodes moves {len(moves)}/{len(ids)}")
+        for b, m in moves.items():
+            print(f"   {b}: node {m['from']} → node {m['to']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,263 @@
+# src/subproc.py
+"""
+Shared runner for ffmpeg / yt-dlp subprocesses.
+
+- progress is streamed as it arrives (ffmpeg `-progress pipe:1`, yt-dlp
+  `--newline`), logged every PROGRESS_LOG_SEC as percent / speed / ETA and
+  published as streamflare_<label>_{progress_ratio,speed_x,eta_sec} gauges
+- only the last STDERR_TAIL_LINES lines of stderr are kept
+- a process that shows no progress and prints nothing for stall_sec
+  (SUBPROCESS_STALL_SEC) is killed and StalledProcessError is raised, so a
+  hung tool can no longer block the scheduler
+"""
+
+import os
+import re
+import subprocess
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import Deque, Dict, List, Optional
+
+from .metrics import annotate, charge_child, gauge, rss_mb
+
+STALL_SEC = float(os.getenv("SUBPROCESS_STALL_SEC", "300"))
+PROGRESS_LOG_SEC = float(os.getenv("SUBPROCESS_PROGRESS_LOG_SEC", "15"))
+STDERR_TAIL_LINES = 200
+
+_YTDLP_PROGRESS = re.compile(
+    r"\[download\]\s+(?P<pct>[\d.]+)%"
+    r"(?:.*?\bat\s+(?P<rate>\S+))?"
+    r"(?:.*?\bETA\s+(?P<eta>[\d:]+))?"
+)
+
+
+class StalledProcessError(RuntimeError):
+    pass
+
+
+@dataclass
+class ToolResult:
+    returncode: int
+    stdout: str  # stdout minus progress lines
+    stderr: str  # bounded tail
+    wall_sec: float
+
+
+def _hms_to_sec(text: str) -> float:
+    sec = 0.0
+    for part in text.split(":"):
+        sec = sec * 60 + float(part or 0)
+    return sec
+
+
+def _tool_kind(cmd: List[str]) -> str:
+    exe = os.path.basename(cmd[0]) if cmd else ""
+    if exe.startswith("ffmpeg"):
+        return "ffmpeg"
+    if "yt_dlp" in cmd[:3] or exe.startswith("yt-dlp"):
+        return "ytdlp"
+    return ""
+
+
+def _with_progress(cmd: List[str], kind: str) -> List[str]:
+    if kind == "ffmpeg":
+        return [cmd[0], "-progress", "pipe:1", "-nostats", *cmd[1:]]
+    if kind == "ytdlp":
+        return [*cmd, "--newline"]
+    return list(cmd)
+
+
+class _Progress:
+    """
+    Latest progress of one process, fed line by line from its stdout.
+    """
+
+    def __init__(self, kind: str, total_sec: Optional[float]) -> None:
+        self.kind = kind
+        self.total_sec = total_sec
+        self.ratio: Optional[float] = None
+        self.speed_x: Optional[float] = None
+        self.eta_sec: Optional[float] = None
+        self.rate = ""
+        self.marker = ""  # changes whenever work advances
+        self._block: Dict[str, str] = {}
+
+    def feed(self, line: str) -> bool:
+        """
+        True if the line was progress output (kept out of ToolResult.stdout).
+        """
+        if self.kind == "ffmpeg" and "=" in line and " " not in line.strip():
+            key, _, val = line.strip().partition("=")
+            self._block[key] = val
+            if key == "progress":
+                self._ffmpeg_block()
+            return True
+        m = _YTDLP_PROGRESS.search(line) if self.kind == "ytdlp" else None
+        if m:
+            self.ratio = float(m.group("pct")) / 100.0
+            self.rate = m.group("rate") or ""
+            if m.group("eta"):
+                self.eta_sec = _hms_to_sec(m.group("eta"))
+            self.marker = m.group("pct")
+            return True
+        return False
+
+    def _ffmpeg_block(self) -> None:
+        b, self._block = self._block, {}
+        out_us = b.get("out_time_us") or b.get("out_time_ms") or ""
+        if out_us.lstrip("-").isdigit():
+            done = max(int(out_us), 0) / 1e6
+            if self.total_sec:
+                self.ratio = min(done / self.total_sec, 1.0)
+            speed = b.get("speed", "").rstrip("x").strip()
+            try:
+                self.speed_x = float(speed)
+            except ValueError:
+                self.speed_x = None
+            if self.total_sec and self.speed_x:
+                self.eta_sec = max(self.total_sec - done, 0.0) / self.speed_x
+            self.marker = f"{out_us}:{b.get('total_size', '')}"
+
+    def describe(self) -> str:
+        parts = []
+        if self.ratio is not None:
+            parts.append(f"{self.ratio * 100:.0f}%")
+        if self.speed_x:
+            parts.append(f"@ {self.speed_x:.2f}x")
+        elif self.rate:
+            parts.append(f"@ {self.rate}")
+        if self.eta_sec is not None:
+            parts.append(f"ETA {self.eta_sec:.0f}s")
+        return " ".join(parts) or "running"
+
+
+def reap(p: subprocess.Popen, block: bool = True) -> Optional[int]:
+    """
+    Wait for p with os.wait4 and charge its own CPU / block I/O to the open
+    metrics spans of this thread. Returns the exit code, or None if block is
+    False and p is still running.
+    """
+    if p.returncode is not None:
+        return p.returncode
+    if not hasattr(os, "wait4"):  # Windows: no per-child rusage
+        return p.wait() if block else p.poll()
+    try:
+        pid, status, ru = os.wait4(p.pid, 0 if block else os.WNOHANG)
+    except ChildProcessError:  # already reaped elsewhere
+        return p.wait() if block else p.poll()
+    if pid == 0:
+        return None
+    p.returncode = os.waitstatus_to_exitcode(status)
+    charge_child(
+        ru.ru_utime + ru.ru_stime,
+        ru.ru_inblock * 512.0,
+        ru.ru_oublock * 512.0,
+        rss_mb(ru.ru_maxrss),
+    )
+    return p.returncode
+
+
+def run_tool(
+    cmd: List[str],
+    label: str,
+    total_sec: Optional[float] = None,
+    stall_sec: Optional[float] = None,
+    progress: bool = True,
+) -> ToolResult:
+    """
+    Run cmd to completion like subprocess.run(capture_output=True, text=True),
+    with streamed progress and stall detection. total_sec (seconds of media
+    the process will produce) enables percent and ETA for ffmpeg.
+    """
+    stall_sec = STALL_SEC if stall_sec is None else stall_sec
+    kind = _tool_kind(cmd) if progress else ""
+    cmd = _with_progress(cmd, kind)
+
+    prog = _Progress(kind, total_sec)
+    out_lines: List[str] = []
+    err_tail: Deque[str] = deque(maxlen=STDERR_TAIL_LINES)
+    last_activity = [time.monotonic()]
+
+    def _read_stdout(stream) -> None:
+        for line in stream:
+            before = prog.marker
+            if not prog.feed(line):
+                out_lines.append(line)
+                last_activity[0] = time.monotonic()
+            elif prog.marker != before:
+                last_activity[0] = time.monotonic()
+
+    def _read_stderr(stream) -> None:
+        for line in stream:
+            err_tail.append(line)
+            last_activity[0] = time.monotonic()
+
+    t0 = time.monotonic()
+    p = subprocess.Popen(
+        cmd,
+        stdin=subprocess.DEVNULL,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        text=True,
+        encoding="utf-8",
+        errors="replace",
+    )
+    readers = [
+        threading.Thread(target=_read_stdout, args=(p.stdout,), daemon=True),
+        threading.Thread(target=_read_stderr, args=(p.stderr,), daemon=True),
+    ]
+    for r in readers:
+        r.start()
+
+    stalled = False
+    next_log = t0 + PROGRESS_LOG_SEC
+    try:
+        while reap(p, block=False) is None:
+            time.sleep(0.2)
+            now = time.monotonic()
+            if stall_sec > 0 and now - last_activity[0] > stall_sec:
+                stalled = True
+                break
+            if now >= next_log:
+                next_log = now + PROGRESS_LOG_SEC
+                print(f"⏳ {label}: {prog.describe()}")
+                _publish(label, prog)
+    finally:
+        if reap(p, block=False) is None:
+            p.terminate()
+            deadline = time.monotonic() + 5
+            while reap(p, block=False) is None and time.monotonic() < deadline:
+                time.sleep(0.1)
+            if reap(p, block=False) is None:
+                p.kill()
+                reap(p)
+        for r in readers:
+            r.join(timeout=5)
+
+    wall = time.monotonic() - t0
+    stderr = "".join(err_tail)
+    if prog.speed_x:
+        annotate(tool_speed_x=prog.speed_x)
+    if stalled:
+        annotate(stalled=True)
+        raise StalledProcessError(
+            f"{label} stalled: no progress for {stall_sec:.0f}s, killed\n{stderr}"
+        )
+    return ToolResult(
+        returncode=p.returncode,
+        stdout="".join(out_lines),
+        stderr=stderr,
+        wall_sec=wall,
+    )
+
+
+def _publish(label: str, prog: _Progress) -> None:
+    name = re.sub(r"[^a-z0-9_]", "_", label.lower())
+    if prog.ratio is not None:
+        gauge(f"{name}_progress_ratio", prog.ratio, f"{label} progress (0-1)")
+    if prog.speed_x:
+        gauge(f"{name}_speed_x", prog.speed_x, f"{label} speed (x realtime)")
+    if prog.eta_sec is not None:
+        gauge(f"{name}_eta_sec", prog.eta_sec, f"{label} estimated seconds left")
@@ -1,30 +1,161 @@
+import bisect
+import copy
 import os
-from typing import Any, Dict, List
+from typing import Any, Dict, List, Optional, Tuple
 
-import whisper
+import numpy as np
+
+from .audio_stream import iter_ffmpeg_pcm, speech_regions
+from .metrics import annotate, timed
+from .utils import media_duration_sec, read_json, sha1, write_json
+
+WHISPER_SR = 16000
+# extra audio decoded either side of a gap so words at its edges have context
+CONTEXT_PAD_SEC = 2.0
+MIN_GAP_SEC = 0.5
+# voice-activity pre-pass: Whisper only sees speech, not music/game audio/silence
+VAD = os.getenv("SUBTITLE_VAD", "true").lower() == "true"
+VAD_JOIN_SEC = 0.3  # silence between stitched speech regions
+
+# CPU inference: "fp32" (whisper as shipped) or "int8" (dynamic quantization
+# of the Linear layers; ~2x faster encoder on x86 at a small accuracy cost)
+MODEL_NAME = os.getenv("WHISPER_MODEL", "base")
+INFERENCE = os.getenv("WHISPER_INFERENCE", "fp32").lower()
+# torch intra-op threads; leave cores for concurrent ffmpeg renders (0 = all)
+THREADS = int(os.getenv("WHISPER_THREADS", "0"))
 
 _model = None
 
 
+def load_model(
+    name: str = MODEL_NAME, inference: str = INFERENCE, threads: int = THREADS
+) -> Any:
+    if inference not in ("fp32", "int8"):
+        raise ValueError(f"Unknown WHISPER_INFERENCE: {inference}")
+    import torch
+    import whisper
+
+    if threads > 0:
+        torch.set_num_threads(threads)
+    model = whisper.load_model(name, device="cpu")
+    if inference == "int8":
+        model = _quantize_int8(model)
+    return model
+
+
+def _quantize_int8(model: Any) -> Any:
+    """
+    Copy of model with every Linear layer dynamically quantized to int8.
+    """
+    import torch
+
+    model = copy.deepcopy(model)
+    # quantize_dynamic matches exact types; whisper's Linear subclass only adds
+    # a dtype cast (a no-op in fp32), so swap in plain nn.Linear on its weights
+    for parent in list(model.modules()):
+        for name, child in parent.named_children():
+            cls = type(child)
+            # torch's own subclasses (e.g. in MultiheadAttention) are left alone
+            if not issubclass(cls, torch.nn.Linear) or cls.__module__.startswith(
+                "torch."
+            ):
+                continue
+            plain = torch.nn.Linear(
+                child.in_features,
+                child.out_features,
+                bias=child.bias is not None,
+                device="meta",
+            )
+            plain.weight = child.weight
+            plain.bias = child.bias
+            setattr(parent, name, plain)
+    return torch.ao.quantization.quantize_dynamic(
+        model, {torch.nn.Linear}, dtype=torch.qint8, inplace=True
+    )
+
+
 def _get_model():
     global _model
     if _model is None:
-        _model = whisper.load_model("base")
+        _model = load_model()
     return _model
 
 
-def transcribe_to_srt(video_path: str, out_srt: str) -> str:
-    model = _get_model()
+@timed("subtitles.transcribe")
+def transcribe_to_srt(video_path: str, out_srt: str, vad: Optional[bool] = None) -> str:
+    """
+    SRT for a whole file. vad overrides SUBTITLE_VAD for this call.
+    """
+    blocks = list(iter_ffmpeg_pcm(video_path, sr=WHISPER_SR))
+    pcm = np.concatenate(blocks) if blocks else np.zeros(0, dtype=np.float32)
+    segments, speech_sec = _transcribe_pcm(pcm, vad=vad)
+    annotate(
+        segments=len(segments),
+        source_sec=media_duration_sec(video_path),
+        speech_sec=round(speech_sec, 3),
+    )
+
+    _write_srt(segments, out_srt)
+    return out_srt
 
-    result: Dict[str, Any] = model.transcribe(
-        video_path,
+
+def _whisper(pcm: np.ndarray) -> List[Dict[str, Any]]:
+    result: Dict[str, Any] = _get_model().transcribe(
+        pcm,
         language="en",
         fp16=False,
         verbose=False,
     )
+    return [dict(seg) for seg in result.get("segments", [])]
+
+
+def _transcribe_pcm(
+    pcm: np.ndarray, offset: float = 0.0, vad: Optional[bool] = None
+) -> Tuple[List[Dict[str, Any]], float]:
+    """
+    (segments timed from offset, seconds of speech sent to Whisper) for a mono
+    WHISPER_SR buffer. With VAD on, only speech regions are transcribed: they
+    are stitched into one shorter buffer and segment times mapped back.
+    """
+    total = pcm.size / WHISPER_SR
+    use_vad = VAD if vad is None else vad
+    regions = speech_regions(pcm, WHISPER_SR) if use_vad else [(0.0, total)]
+    if not regions:
+        return [], 0.0
+
+    gap = np.zeros(int(VAD_JOIN_SEC * WHISPER_SR), dtype=np.float32)
+    pieces: List[np.ndarray] = []
+    index: List[Tuple[float, float, float]] = []  # (stitched at, source at, len)
+    pos = 0.0
+    for a, b in regions:
+        if pieces:
+            pieces.append(gap)
+            pos += VAD_JOIN_SEC
+        piece = pcm[int(a * WHISPER_SR) : int(b * WHISPER_SR)]
+        pieces.append(piece)
+        index.append((pos, a, piece.size / WHISPER_SR))
+        pos += piece.size / WHISPER_SR
+    stitched_at = [at for at, _, _ in index]
+
+    def _source_time(t: float) -> float:
+        at, src, length = index[max(bisect.bisect_right(stitched_at, t) - 1, 0)]
+        return offset + src + min(max(t - at, 0.0), length)
+
+    segments = []
+    for seg in _whisper(np.concatenate(pieces)):
+        start = _source_time(float(seg["start"]))
+        end = max(_source_time(float(seg["end"])), start)
+        segments.append(
+            {
+                "start": round(start, 3),
+                "end": round(end, 3),
+                "text": str(seg.get("text", "")).strip(),
+            }
+        )
+    return segments, sum(length for _, _, length in index)
 
-    segments: List[Dict[str, Any]] = [dict(seg) for seg in result.get("segments", [])]
 
+def _write_srt(segments: List[Dict[str, Any]], out_srt: str) -> None:
     os.makedirs(os.path.dirname(out_srt), exist_ok=True)
 
     with open(out_srt, "w", encoding="utf-8") as f:
@@ -37,6 +168,135 @@ def transcribe_to_srt(video_path: str, out_srt: str) -> str:
             f.write(f"{_fmt(start)} --> {_fmt(end)}\n")
             f.write(text + "\n\n")
 
+
+def _merge_spans(spans: List[List[float]]) -> List[List[float]]:
+    merged: List[List[float]] = []
+    for a, b in sorted(spans):
+        if merged and a <= merged[-1][1]:
+            merged[-1][1] = max(merged[-1][1], b)
+        else:
+            merged.append([a, b])
+    return merged
+
+
+def _uncovered(
+    spans: List[List[float]], start: float, end: float
+) -> List[Tuple[float, float]]:
+    gaps: List[Tuple[float, float]] = []
+    cur = start
+    for a, b in spans:
+        if b <= cur:
+            continue
+        if a >= end:
+            break
+        if a > cur:
+            gaps.append((cur, a))
+        cur = max(cur, b)
+    if cur < end:
+        gaps.append((cur, end))
+    return gaps
+
+
+def _splice(
+    cached: List[Dict[str, Any]], new: List[Dict[str, Any]], a: float, b: float
+) -> List[Dict[str, Any]]:
+    """
+    Cached segments plus the new ones overlapping the gap [a, b), sorted. A
+    phrase that starts in the context pad and runs into the gap is kept, and
+    a cached segment it overlaps (the same phrase cut at the old boundary) is
+    dropped for it.
+    """
+    kept = [n for n in new if n["end"] > a and n["start"] < b]
+    out = [
+        c
+        for c in cached
+        if not any(c["end"] > n["start"] and c["start"] < n["end"] for n in kept)
+    ]
+    return sorted(out + kept, key=lambda seg: seg["start"])
+
+
+def _window(
+    segments: List[Dict[str, Any]], start_sec: float, end_sec: float
+) -> List[Dict[str, Any]]:
+    """
+    Segments overlapping [start_sec, end_sec), clipped to it and re-timed
+    from start_sec.
+    """
+    return [
+        {
+            "start": max(s["start"], start_sec) - start_sec,
+            "end": min(s["end"], end_sec) - start_sec,
+            "text": s["text"],
+        }
+        for s in segments
+        if s["end"] > start_sec and s["start"] < end_sec
+    ]
+
+
+def _transcribe_span(
+    video_path: str, start: float, end: float
+) -> Tuple[List[Dict[str, Any]], float]:
+    blocks = list(
+        iter_ffmpeg_pcm(video_path, sr=WHISPER_SR, start_sec=start, max_sec=end - start)
+    )
+    if not blocks:
+        return [], 0.0
+    return _transcribe_pcm(np.concatenate(blocks), offset=start)
+
+
+@timed("subtitles.transcribe_range")
+def transcribe_range_to_srt(
+    video_path: str,
+    start_sec: float,
+    duration_sec: float,
+    out_srt: str,
+    cache_dir: str,
+    source_key: str = "",
+) -> str:
+    """
+    SRT for [start_sec, start_sec + duration_sec) of a source video, timed from
+    start_sec (i.e. matching a render cut with -ss start_sec).
+
+    Transcripts are cached per source (source_key, e.g. the VOD URL; default:
+    the file path and size) as segments with absolute source timestamps plus
+    the spans already covered. Only the uncovered parts of the window go
+    through Whisper, so re-renders and overlapping highlights reuse earlier work.
+    """
+    key = sha1(
+        source_key or f"{os.path.abspath(video_path)}|{os.path.getsize(video_path)}"
+    )
+    cache_path = os.path.join(cache_dir, f"{key}.json")
+    cache = read_json(cache_path, {"spans": [], "segments": []})
+    spans: List[List[float]] = _merge_spans(cache.get("spans", []))
+    segments: List[Dict[str, Any]] = cache.get("segments", [])
+
+    end_sec = start_sec + duration_sec
+    transcribed = speech = 0.0
+    for a, b in _uncovered(spans, start_sec, end_sec):
+        if b - a < MIN_GAP_SEC:
+            continue
+        lo = max(a - CONTEXT_PAD_SEC, 0.0)
+        new, speech_sec = _transcribe_span(video_path, lo, b + CONTEXT_PAD_SEC)
+        speech += speech_sec
+        segments = _splice(segments, new, a, b)
+        spans = _merge_spans(spans + [[a, b]])
+        transcribed += b - a
+
+    if transcribed:
+        write_json(
+            cache_path,
+            {"source_key": source_key, "spans": spans, "segments": segments},
+        )
+
+    window = _window(segments, start_sec, end_sec)
+    annotate(
+        segments=len(window),
+        source_sec=duration_sec,
+        transcribed_sec=round(transcribed, 3),
+        speech_sec=round(speech, 3),
+    )
+
+    _write_srt(window, out_srt)
     return out_srt
 
 
@@ -1,7 +1,11 @@
+import os
 import requests
 from typing import Any, Dict, Optional
 from datetime import datetime, timedelta, timezone
 
+# overridable so a local stand-in can serve recorded responses (benchmarks/e2e.py)
+HELIX_URL = os.getenv("TWITCH_HELIX_URL", "https://api.twitch.tv/helix").rstrip("/")
+OAUTH_URL = os.getenv("TWITCH_OAUTH_URL", "https://id.twitch.tv/oauth2").rstrip("/")
 
 
 class TwitchClient:
@@ -14,7 +18,7 @@ class TwitchClient:
         if self._token:
             return self._token
 
-        url = "https://id.twitch.tv/oauth2/token"
+        url = f"{OAUTH_URL}/token"
         payload = {
             "client_id": self.client_id,
             "client_secret": self.client_secret,
@@ -35,7 +39,7 @@ class TwitchClient:
     ):
         started_at = (datetime.now(timezone.utc) - timedelta(hours=lookback_hours)).isoformat()
 
-        url = "https://api.twitch.tv/helix/clips"
+        url = f"{HELIX_URL}/clips"
         params = {
         "broadcaster_id": broadcaster_id,
         "first": limit,
@@ -54,7 +58,7 @@ class TwitchClient:
         }
 
     def get_user(self, user_id: str) -> Dict[str, Any]:
-        url = "https://api.twitch.tv/helix/users"
+        url = f"{HELIX_URL}/users"
         r = requests.get(
             url, headers=self._headers(), params={"id": user_id}, timeout=30
         )
@@ -66,7 +70,7 @@ class TwitchClient:
         self, broadcaster_id: str, limit: int = 5
     ) -> list[Dict[str, Any]]:
         # type=archive returns past broadcasts (VODs)
-        url = "https://api.twitch.tv/helix/videos"
+        url = f"{HELIX_URL}/videos"
         params = {
             "user_id": broadcaster_id,
             "type": "archive",
@@ -79,10 +83,44 @@ class TwitchClient:
     def get_game(self, game_id: str) -> Dict[str, Any]:
         if not game_id:
             return {}
-        url = "https://api.twitch.tv/helix/games"
+        url = f"{HELIX_URL}/games"
         r = requests.get(
             url, headers=self._headers(), params={"id": game_id}, timeout=30
         )
         r.raise_for_status()
         data = r.json().get("data", [])
         return data[0] if data else {}
+
+    def get_live_stream(self, user_id: str) -> Dict[str, Any]:
+        # empty when the broadcaster is offline
+        url = f"{HELIX_URL}/streams"
+        r = requests.get(
+            url, headers=self._headers(), params={"user_id": user_id}, timeout=30
+        )
+        r.raise_for_status()
+        data = r.json().get("data", [])
+        return data[0] if data else {}
+
+    def create_eventsub_subscription(
+        self,
+        sub_type: str,
+        condition: Dict[str, str],
+        callback_url: str,
+        secret: str,
+        version: str = "1",
+    ) -> Dict[str, Any]:
+        url = f"{HELIX_URL}/eventsub/subscriptions"
+        body = {
+            "type": sub_type,
+            "version": version,
+            "condition": condition,
+            "transport": {
+                "method": "webhook",
+                "callback": callback_url,
+                "secret": secret,
+            },
+        }
+        r = requests.post(url, headers=self._headers(), json=body, timeout=30)
+        r.raise_for_status()
+        data = r.json().get("data", [])
+        return data[0] if data else {}
@@ -1,6 +1,7 @@
 import hashlib
 import json
 import os
+import subprocess
 from datetime import datetime
 from typing import Any, Dict
 
@@ -36,3 +37,30 @@ def safe_filename(name: str) -> str:
     while "  " in out:
         out = out.replace("  ", " ")
     return out[:180]
+
+
+# a probe only reads the container header; anything slower is hung
+PROBE_TIMEOUT_SEC = 30
+
+
+def media_duration_sec(path: str) -> float:
+    """
+    Container duration via ffprobe. Returns 0.0 when it cannot be determined.
+    """
+    cmd = [
+        "ffprobe",
+        "-v",
+        "error",
+        "-show_entries",
+        "format=duration",
+        "-of",
+        "default=noprint_wrappers=1:nokey=1",
+        path,
+    ]
+    try:
+        p = subprocess.run(
+            cmd, capture_output=True, text=True, timeout=PROBE_TIMEOUT_SEC
+        )
+        return float(p.stdout.strip() or 0.0)
+    except (OSError, ValueError, subprocess.TimeoutExpired):
+        return 0.0
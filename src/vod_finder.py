@@ -47,6 +47,7 @@ def choose_vod(
     """
     Select the first VOD that has NOT been used before.
     If all VODs are used → return None (do NOT repeat).
+    The VOD is marked used when its job finishes (see checkpoint.py), not here.
     """
 
     if not vods:
@@ -61,9 +62,6 @@ def choose_vod(
             continue
 
         if vod_id not in used_vods:
-            used_vods.add(vod_id)
-            state["used_vods"] = list(used_vods)[-100:]  # keep last 100
-            _save_state(state_path, state)
             return vod
 
     # 🚫 All VODs already used — do NOT repeat
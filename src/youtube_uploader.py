@@ -3,13 +3,16 @@ import pickle
 
 from google_auth_oauthlib.flow import InstalledAppFlow
 from googleapiclient.discovery import build
+from googleapiclient.errors import HttpError
 from googleapiclient.http import MediaFileUpload
-from google.auth.transport.requests import Request
+from google.auth.transport.requests import AuthorizedSession, Request
 
 SCOPES = ["https://www.googleapis.com/auth/youtube.upload"]
+# chunked (not one-shot) so an interrupted upload has a session to resume
+UPLOAD_CHUNK_BYTES = int(float(os.getenv("UPLOAD_CHUNK_MB", "16")) * 1024 * 1024)
 
 
-def get_authenticated_service():
+def _load_credentials():
     creds = None
     token_file = "youtube_token.pkl"
 
@@ -30,11 +33,53 @@ def get_authenticated_service():
         with open(token_file, "wb") as f:
             pickle.dump(creds, f)
 
-    return build("youtube", "v3", credentials=creds)
+    return creds
 
 
-def upload_video(file_path, title, description, tags=None, privacy="public"):
-    youtube = get_authenticated_service()
+def get_authenticated_service(creds=None):
+    return build("youtube", "v3", credentials=creds or _load_credentials())
+
+
+def _session_offset(creds, session_uri, size):
+    """
+    Ask an upload session how much it already has, per the resumable upload
+    protocol: an empty PUT with "Content-Range: bytes */<size>".
+    Returns (offset, None) to continue from, (size, video) if the upload had
+    already completed, or (None, None) if the session is gone.
+    """
+    r = AuthorizedSession(creds).put(
+        session_uri,
+        headers={"Content-Range": f"bytes */{size}", "Content-Length": "0"},
+        allow_redirects=False,
+    )
+    if r.status_code in (200, 201):
+        return size, r.json()
+    if r.status_code in (404, 410):
+        return None, None
+    if r.status_code == 308:
+        # "Range: bytes=0-<last byte received>"; absent when nothing arrived
+        received = r.headers.get("Range", "")
+        return (int(received.rsplit("-", 1)[1]) + 1 if received else 0), None
+    r.raise_for_status()
+    raise RuntimeError(f"Unexpected upload status {r.status_code} for {session_uri}")
+
+
+def upload_video(
+    file_path,
+    title,
+    description,
+    tags=None,
+    privacy="public",
+    resume_uri=None,
+    on_session=None,
+):
+    """
+    Resumable upload in UPLOAD_CHUNK_MB chunks. on_session(uri) is called once
+    the upload session exists; passing that uri back as resume_uri continues
+    an interrupted upload from what the server already has.
+    """
+    creds = _load_credentials()
+    youtube = get_authenticated_service(creds)
 
     body = {
         "snippet": {
@@ -45,16 +90,44 @@ def upload_video(file_path, title, description, tags=None, privacy="public"):
         "status": {"privacyStatus": privacy},
     }
 
-    media = MediaFileUpload(file_path, chunksize=-1, resumable=True)
+    media = MediaFileUpload(file_path, chunksize=UPLOAD_CHUNK_BYTES, resumable=True)
     request = youtube.videos().insert(
         part="snippet,status",
         body=body,
         media_body=media,
     )
+    if resume_uri:
+        offset, video = _session_offset(creds, resume_uri, os.path.getsize(file_path))
+        if video is not None:
+            print("Upload already complete! Video ID:", video["id"])
+            return video
+        if offset is None:
+            print("⚠️ Upload session expired, starting over")
+            resume_uri = None
+        else:
+            print(f"Resuming upload at byte {offset}")
+            request.resumable_uri = resume_uri
+            request.resumable_progress = offset
 
+    session_uri = resume_uri
     response = None
     while response is None:
-        status, response = request.next_chunk()
+        try:
+            status, response = request.next_chunk()
+        except HttpError as e:
+            if not resume_uri or e.resp.status not in (404, 410):
+                raise
+            print("⚠️ Upload session expired, starting over")
+            return upload_video(
+                file_path, title, description, tags, privacy, None, on_session
+            )
+        if (
+            on_session
+            and request.resumable_uri
+            and request.resumable_uri != session_uri
+        ):
+            session_uri = request.resumable_uri
+            on_session(session_uri)
         if status:
             print(f"Uploading... {int(status.progress() * 100)}%")
 
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# tests import the app as the `src` package, like python -m src.main does
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
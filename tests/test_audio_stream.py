@@ -0,0 +1,34 @@
+import numpy as np
+import pytest
+
+from src.audio_stream import VAD_PAD_SEC, speech_regions
+
+SR = 16000
+
+
+def tone(sec: float, hz: float, amp: float = 0.3) -> np.ndarray:
+    t = np.arange(int(sec * SR)) / SR
+    return (amp * np.sin(2 * np.pi * hz * t)).astype(np.float32)
+
+
+def hiss(sec: float, amp: float = 1e-3) -> np.ndarray:
+    rng = np.random.default_rng(0)
+    return (amp * rng.standard_normal(int(sec * SR))).astype(np.float32)
+
+
+def test_speech_regions_finds_voice_band_tones():
+    pcm = np.concatenate(
+        [hiss(2.0), tone(1.0, 440.0), hiss(2.0), tone(1.0, 1000.0), hiss(2.0)]
+    )
+    regions = speech_regions(pcm, SR)
+    assert len(regions) == 2
+    for (a, b), (ta, tb) in zip(regions, [(2.0, 3.0), (5.0, 6.0)]):
+        assert a == pytest.approx(ta - VAD_PAD_SEC, abs=0.05)
+        assert b == pytest.approx(tb + VAD_PAD_SEC, abs=0.05)
+
+
+def test_speech_regions_ignores_silence_and_hum():
+    assert speech_regions(hiss(3.0), SR) == []
+    # loud, but below the voice band
+    assert speech_regions(np.concatenate([hiss(1.0), tone(2.0, 60.0)]), SR) == []
+    assert speech_regions(np.zeros(0, dtype=np.float32), SR) == []
@@ -0,0 +1,94 @@
+import json
+from typing import Callable, List
+
+import pytest
+
+from src.chat_signal import chat_density, chat_spike_regions, load_chat_offsets
+
+DURATION_SEC = 300
+
+# 20 messages over seconds 100-101, 8 over 220-221, and four stray ones
+BURST_A = [100.0 + i / 10 for i in range(20)]
+BURST_B = [220.5 + i / 10 for i in range(8)]
+STRAY = [10.2, 50.0, 160.7, 280.9]
+OFFSETS = sorted(BURST_A + BURST_B + STRAY)
+
+
+def _rechat(path: str, offsets: List[float]) -> None:
+    comments = [
+        {"_id": str(i), "content_offset_seconds": o, "message": {"body": "PogChamp"}}
+        for i, o in enumerate(offsets)
+    ]
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({"video": {"id": "1"}, "comments": comments}, f)
+
+
+def _plain_list(path: str, offsets: List[float]) -> None:
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(offsets, f)
+
+
+def _json_lines(path: str, offsets: List[float]) -> None:
+    with open(path, "w", encoding="utf-8") as f:
+        for o in offsets:
+            f.write(json.dumps({"offset": o, "text": "KEKW"}) + "\n")
+        f.write("\n")  # blank trailing line is ignored
+
+
+@pytest.fixture(params=[_rechat, _plain_list, _json_lines])
+def chat_file(request: pytest.FixtureRequest, tmp_path) -> str:
+    write: Callable[[str, List[float]], None] = request.param
+    path = str(tmp_path / "chat.json")
+    # shuffled on disk; the loader sorts
+    write(path, OFFSETS[::-1])
+    return path
+
+
+def test_load_chat_offsets(chat_file: str) -> None:
+    assert load_chat_offsets(chat_file) == pytest.approx(OFFSETS)
+
+
+def test_chat_density_bins(chat_file: str) -> None:
+    density = chat_density(load_chat_offsets(chat_file), DURATION_SEC)
+
+    assert len(density) == DURATION_SEC
+    assert density.sum() == len(OFFSETS)
+    assert density[100] == 10 and density[101] == 10
+    assert density[220] == 5 and density[221] == 3
+    for o in STRAY:
+        assert density[int(o)] == 1
+    assert density[102:220].sum() == 1  # only the stray message at 160
+
+
+def test_chat_density_without_duration(chat_file: str) -> None:
+    density = chat_density(load_chat_offsets(chat_file))
+    # long enough to hold the last message's second
+    assert len(density) > int(OFFSETS[-1])
+    assert density[int(OFFSETS[-1])] == 1
+    assert density.sum() == len(OFFSETS)
+
+
+def test_chat_spike_regions(chat_file: str) -> None:
+    density = chat_density(load_chat_offsets(chat_file), DURATION_SEC)
+
+    # the busiest 20s windows start at 82 (burst A) and 202 (burst B); the
+    # third peak is the earliest stray message. Padding: 20s before, 5s after
+    assert chat_spike_regions(density, 20, top_n=1) == [(62.0, 107.0)]
+    assert chat_spike_regions(density, 20, top_n=2) == [(62.0, 107.0), (182.0, 227.0)]
+    assert chat_spike_regions(density, 20, top_n=3) == [
+        (0.0, 25.0),
+        (62.0, 107.0),
+        (182.0, 227.0),
+    ]
+
+
+def test_chat_spike_regions_merge_overlaps(chat_file: str) -> None:
+    density = chat_density(load_chat_offsets(chat_file), DURATION_SEC)
+
+    regions = chat_spike_regions(density, 20, top_n=2, pad_before_sec=120)
+    assert regions == [(0.0, 227.0)]
+
+
+def test_chat_spike_regions_empty() -> None:
+    assert chat_spike_regions(chat_density([], DURATION_SEC), 20) == []
+    assert chat_spike_regions(chat_density([]), 20) == []
@@ -0,0 +1,57 @@
+from src.checkpoint import MAX_ATTEMPTS, JobCheckpoint
+from src.utils import read_json
+
+
+def test_resume_at_first_incomplete_stage(tmp_path):
+    path = str(tmp_path / "state.json")
+    ck = JobCheckpoint.start(path, "b1", "vods", id="v1")
+    ck.complete("download", video_path="v.mp4")
+    ck.note("highlight", partial=True)
+
+    again = JobCheckpoint.resume(path, "vods")
+    assert again is not None and again.broadcaster_id == "b1"
+    assert again.next_stage == "highlight"
+    assert again.data("download")["video_path"] == "v.mp4"
+    assert again.attempts == 2
+    assert read_json(path, {})["jobs"]["b1"]["attempts"] == 2
+
+
+def test_resume_nothing_pending(tmp_path):
+    path = str(tmp_path / "state.json")
+    assert JobCheckpoint.resume(path, "vods") is None
+    JobCheckpoint.start(path, "b1", "vods", id="v1")
+    assert JobCheckpoint.resume(path, "vods", broadcaster_id="b2") is None
+
+
+def test_attempts_count_up_to_the_cap(tmp_path):
+    path = str(tmp_path / "state.json")
+    JobCheckpoint.start(path, "b1", "vods", id="v1")
+    for n in range(2, MAX_ATTEMPTS + 2):
+        ck = JobCheckpoint.resume(path, "vods")
+        assert ck is not None and ck.attempts == n
+    assert ck.attempts > MAX_ATTEMPTS
+
+
+def test_other_mode_job_is_given_up_after_the_cap(tmp_path):
+    path = str(tmp_path / "state.json")
+    JobCheckpoint.start(path, "b1", "clips", id="c1")
+    for _ in range(MAX_ATTEMPTS - 1):
+        assert JobCheckpoint.resume(path, "vods") is None
+        assert "b1" in read_json(path, {})["jobs"]
+
+    assert JobCheckpoint.resume(path, "vods") is None
+    state = read_json(path, {})
+    assert state["jobs"] == {}
+    assert state["used_clips"] == ["c1"]
+
+
+def test_finish_marks_source_used(tmp_path):
+    path = str(tmp_path / "state.json")
+    ck = JobCheckpoint.start(path, "b1", "vods", id="v1")
+    JobCheckpoint.start(path, "b2", "clips", id="c1")
+    ck.finish()
+
+    state = read_json(path, {})
+    assert list(state["jobs"]) == ["b2"]
+    assert state["used_vods"] == ["v1"]
+    assert "used_clips" not in state
@@ -0,0 +1,94 @@
+import random
+from typing import List
+
+import pytest
+
+from src.dedup import (
+    FRAME_RADIUS,
+    MIN_MATCH_SEC,
+    BKTree,
+    DedupIndex,
+    Fingerprint,
+    fingerprint_range,
+    hamming,
+)
+
+
+def _hashes(n: int, seed: int) -> List[int]:
+    rng = random.Random(seed)
+    return [rng.getrandbits(64) for _ in range(n)]
+
+
+def _flip(h: int, bits: int, seed: int) -> int:
+    for b in random.Random(seed).sample(range(64), bits):
+        h ^= 1 << b
+    return h
+
+
+def test_bktree_search_returns_everything_within_radius() -> None:
+    stored = _hashes(500, seed=1)
+    tree = BKTree()
+    for i, h in enumerate(stored):
+        tree.add(h, i)
+    tree.add(stored[0], "again")  # same hash keeps both payloads
+
+    assert tree.size == 501
+    for radius in (0, 4, 20, 28):
+        for q in (stored[0], _flip(stored[3], 3, seed=radius), _hashes(1, 99)[0]):
+            want = sorted(
+                (hamming(q, h), i)
+                for i, h in enumerate(stored)
+                if hamming(q, h) <= radius
+            )
+            got = sorted((d, p) for d, p in tree.search(q, radius) if p != "again")
+            assert got == want
+
+    exact = [p for _, p in tree.search(stored[0], 0)]
+    assert sorted(exact, key=str) == [0, "again"]
+    assert BKTree().search(stored[0], 64) == []
+
+
+def test_find_votes_for_the_shifted_offset(tmp_path) -> None:
+    published = _hashes(40, seed=2)
+    index = DedupIndex(str(tmp_path / "dedup.json"))
+    index.add("other", Fingerprint(frames=_hashes(40, seed=3)))
+    index.add("short-1", Fingerprint(frames=published), "vod-1", 0.0, 40.0)
+    index.save()
+
+    # a clip of seconds 12..32 of the same moment, re-encoded (a few bits off)
+    clip = [_flip(h, 3, seed=i) for i, h in enumerate(published[12:32])]
+    reloaded = DedupIndex(str(tmp_path / "dedup.json"))
+    hit = reloaded.find(Fingerprint(frames=clip))
+    assert hit is not None and hit["id"] == "short-1"
+
+    assert reloaded.find(Fingerprint(frames=_hashes(20, seed=4))) is None
+    # too short an overlap to call it the same moment
+    assert reloaded.find(Fingerprint(frames=published[: MIN_MATCH_SEC - 1])) is None
+    # too far off per frame
+    far = [_flip(h, FRAME_RADIUS + 8, seed=i) for i, h in enumerate(published)]
+    assert reloaded.find(Fingerprint(frames=far)) is None
+
+
+def test_find_needs_audio_to_agree_when_both_sides_have_it(tmp_path) -> None:
+    frames = _hashes(20, seed=5)
+    audio = [h >> 32 for h in _hashes(20, seed=6)]
+    index = DedupIndex(str(tmp_path / "dedup.json"))
+    index.add("short-1", Fingerprint(frames=frames, audio=audio))
+
+    assert index.find(Fingerprint(frames=frames, audio=audio)) is not None
+    other_audio = [h >> 32 for h in _hashes(20, seed=7)]
+    assert index.find(Fingerprint(frames=frames, audio=other_audio)) is None
+
+
+def test_find_source_overlap(tmp_path) -> None:
+    index = DedupIndex(str(tmp_path / "dedup.json"))
+    index.add("short-1", Fingerprint(), "vod-1", 100.0, 160.0)
+
+    assert index.find_source("vod-1", 120.0, 180.0)["id"] == "short-1"
+    assert index.find_source("vod-1", 150.0, 210.0) is None
+    assert index.find_source("vod-2", 100.0, 160.0) is None
+
+
+def test_fingerprint_unreadable_media(tmp_path) -> None:
+    with pytest.raises(RuntimeError):
+        fingerprint_range(str(tmp_path / "missing.mp4"), 0.0, 10.0)
@@ -0,0 +1,54 @@
+from src.encode_policy import DEFAULT, LADDER, EncodePolicy
+from src.utils import read_json
+
+
+def policy(tmp_path, **kw) -> EncodePolicy:
+    kw.setdefault("adaptive", True)
+    kw.setdefault("slowest", "slow")
+    return EncodePolicy(str(tmp_path / "encoder_speed.json"), **kw)
+
+
+def stats(preset: str, speed_x: float, duration_sec: float = 60.0) -> dict:
+    return {
+        "preset": preset,
+        "duration_sec": duration_sec,
+        "outputs": 1,
+        "fps": 30,
+        "wall_sec": duration_sec / speed_x,
+    }
+
+
+def test_no_measurements_uses_the_default(tmp_path):
+    p = policy(tmp_path)
+    assert p.speed("veryfast") is None
+    assert p.choose(60.0, outputs=2, backlog_sec=600.0) == DEFAULT
+
+
+def test_tighter_target_moves_down_the_ladder(tmp_path):
+    p = policy(tmp_path, target_sec=1000.0)
+    p.record(stats("veryfast", 1.0))
+    # 60s of output: slow (0.3x) predicts 200s, within the budget
+    assert p.choose(60.0) == LADDER[0]
+
+    p.target_sec = 90.0  # slow 200s, medium 120s, fast 100s, faster 75s
+    assert p.choose(60.0).preset == "faster"
+
+    # a backlog counts against the same budget: 120s of work, superfast 80s
+    assert p.choose(60.0, backlog_sec=60.0).preset == "superfast"
+
+    p.target_sec = 1.0  # nothing fits: the fastest rung
+    assert p.choose(60.0) == LADDER[-1]
+
+
+def test_record_round_trips_through_the_json_file(tmp_path):
+    p = policy(tmp_path)
+    p.record(stats("fast", 2.0))
+    p.record(stats("fast", 4.0))  # EWMA: 0.7 * 2 + 0.3 * 4
+    assert read_json(p.path, {})["speed_x"] == {"fast": 2.6}
+
+    again = policy(tmp_path)
+    assert again.speed("fast") == 2.6
+    assert again.speed("veryfast") == 2.6 / 0.6
+    # zero wall time is not a measurement
+    again.record({"preset": "slow", "duration_sec": 60.0, "wall_sec": 0})
+    assert "slow" not in again.speeds
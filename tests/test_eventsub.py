@@ -0,0 +1,112 @@
+import json
+import threading
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Iterator, List, Tuple
+
+import pytest
+import requests
+
+from src.eventsub import PATH, send_test_event, sign, start_receiver
+
+SECRET = "test-secret-0123456789"
+
+
+class Receiver:
+    def __init__(self) -> None:
+        self.events: List[Tuple[str, str, Dict[str, Any]]] = []
+        self.fired = threading.Event()
+        self.url = ""
+
+    def __call__(self, event_type: str, broadcaster_id: str, event: Dict) -> None:
+        self.events.append((event_type, broadcaster_id, event))
+        self.fired.set()
+
+
+@pytest.fixture
+def receiver() -> Iterator[Receiver]:
+    rx = Receiver()
+    server = start_receiver(rx, secret=SECRET, port=0)
+    rx.url = f"http://127.0.0.1:{server.server_address[1]}{PATH}"
+    try:
+        yield rx
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def _post(
+    url: str,
+    body: Dict[str, Any],
+    kind: str = "notification",
+    msg_id: str = "",
+    sent: datetime = None,
+    secret: str = SECRET,
+) -> requests.Response:
+    data = json.dumps(body).encode("utf-8")
+    msg_id = msg_id or str(uuid.uuid4())
+    timestamp = (sent or datetime.now(timezone.utc)).strftime("%Y-%m-%dT%H:%M:%S.%fZ")
+    headers = {
+        "Twitch-Eventsub-Message-Id": msg_id,
+        "Twitch-Eventsub-Message-Timestamp": timestamp,
+        "Twitch-Eventsub-Message-Signature": sign(secret, msg_id, timestamp, data),
+        "Twitch-Eventsub-Message-Type": kind,
+    }
+    return requests.post(url, data=data, headers=headers, timeout=5)
+
+
+def _offline(broadcaster_id: str) -> Dict[str, Any]:
+    return {
+        "subscription": {"type": "stream.offline", "version": "1"},
+        "event": {"broadcaster_user_id": broadcaster_id},
+    }
+
+
+def test_signed_event_reaches_the_callback(receiver: Receiver) -> None:
+    assert send_test_event(receiver.url, SECRET, "stream.offline", "1234") == 204
+    assert receiver.fired.wait(5)
+    assert [(t, b) for t, b, _ in receiver.events] == [("stream.offline", "1234")]
+
+
+def test_bad_signature_is_rejected(receiver: Receiver) -> None:
+    assert send_test_event(receiver.url, "wrong-secret", "stream.offline", "1") == 403
+    assert not receiver.fired.wait(0.3)
+
+
+def test_replayed_message_is_not_delivered_twice(receiver: Receiver) -> None:
+    msg_id = str(uuid.uuid4())
+    assert _post(receiver.url, _offline("42"), msg_id=msg_id).status_code == 204
+    assert receiver.fired.wait(5)
+    receiver.fired.clear()
+
+    # acknowledged so Twitch stops retrying, but not handed on again
+    assert _post(receiver.url, _offline("42"), msg_id=msg_id).status_code == 200
+    assert not receiver.fired.wait(0.3)
+    assert len(receiver.events) == 1
+
+
+def test_stale_message_is_rejected(receiver: Receiver) -> None:
+    sent = datetime.now(timezone.utc) - timedelta(minutes=11)
+    assert _post(receiver.url, _offline("42"), sent=sent).status_code == 403
+    assert not receiver.fired.wait(0.3)
+
+
+def test_callback_verification_echoes_the_challenge(receiver: Receiver) -> None:
+    body = {"challenge": "pogchamp-kappa", "subscription": {"type": "stream.offline"}}
+    r = _post(receiver.url, body, kind="webhook_callback_verification")
+    assert r.status_code == 200 and r.text == "pogchamp-kappa"
+    assert not receiver.events
+
+
+def test_unknown_event_type_is_acknowledged_not_delivered(receiver: Receiver) -> None:
+    body = {
+        "subscription": {"type": "channel.follow", "version": "2"},
+        "event": {"broadcaster_user_id": "42"},
+    }
+    assert _post(receiver.url, body).status_code == 204
+    assert not receiver.fired.wait(0.3)
+
+
+def test_wrong_path_is_404(receiver: Receiver) -> None:
+    url = receiver.url.rsplit("/", 1)[0] + "/other"
+    assert _post(url, _offline("42")).status_code == 404
@@ -0,0 +1,64 @@
+import cv2
+import numpy as np
+
+from src.highlight_picker import _best_window, _scene_series
+
+WEIGHTS = {"voice": 1.0}
+
+
+def _part(values) -> dict:
+    return {"voice": np.asarray(values, dtype=np.float64)}
+
+
+def test_best_window_skips_ranges_shorter_than_min_sec() -> None:
+    # the 20s range is far hotter, but a cut there would be under 40s
+    short = _part(np.full(20, 10.0))
+    long = _part(np.r_[np.zeros(30), np.ones(50), np.zeros(20)])
+    ranges = [(100.0, 120.0), (300.0, 400.0)]
+
+    score, start, length = _best_window(ranges, [short, long], WEIGHTS, 40, 60)
+
+    assert length >= 40
+    assert 300.0 <= start and start + length <= 400.0
+    assert score > 0
+
+
+def test_best_window_clamps_long_cuts_to_the_range() -> None:
+    part = _part(np.ones(50))
+    score, start, length = _best_window([(0.0, 50.0)], [part], WEIGHTS, 40, 60)
+    assert (start, length) == (0.0, 50.0)
+    assert 0 < score <= 1
+
+
+def test_best_window_no_range_long_enough() -> None:
+    parts = [_part(np.ones(20)), _part(np.ones(39))]
+    ranges = [(0.0, 20.0), (100.0, 139.0)]
+    score, _, length = _best_window(ranges, parts, WEIGHTS, 40, 60)
+    assert score < 0
+    assert length == 60.0
+
+
+def _ntsc_clip(path: str, busy_sec: int, seconds: int = 10) -> None:
+    # black 29.97 fps video with one second of noise starting at busy_sec
+    fps = 30000 / 1001
+    rng = np.random.default_rng(0)
+    out = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"MJPG"), fps, (160, 90))
+    for i in range(int(seconds * fps) + 1):
+        frame = np.zeros((90, 160, 3), dtype=np.uint8)
+        if busy_sec <= i / fps < busy_sec + 1:
+            frame = rng.integers(0, 255, frame.shape, dtype=np.uint8)
+        out.write(frame)
+    out.release()
+
+
+def test_scene_series_buckets_samples_by_timestamp(tmp_path) -> None:
+    path = str(tmp_path / "ntsc.avi")
+    _ntsc_clip(path, busy_sec=6)
+
+    series = _scene_series(path)
+
+    # 29.97 fps samples every 14th frame, ~2.14 a second; a fixed reshape by
+    # fps_sample drifts, a timestamp bucket does not
+    assert len(series) == 10
+    # noise starts at 6s; the first black frame after it lands in second 7
+    assert set(np.flatnonzero(series > 1.0)) == {6, 7}
@@ -0,0 +1,139 @@
+import os
+import shutil
+import subprocess
+from typing import List, Tuple
+
+import numpy as np
+import pytest
+
+from src import live
+from src.live import SEGMENT_SEC, LiveScorer, Segment, SegmentWatcher, parse_playlist
+
+STREAM_SEC = 60
+BURST = (36, 46)  # loud noise over a noisy picture; quiet and static elsewhere
+
+pytestmark = pytest.mark.skipif(not shutil.which("ffmpeg"), reason="needs ffmpeg")
+
+
+@pytest.fixture(scope="module")
+def stream(tmp_path_factory) -> str:
+    """
+    A finished 60s stream cut into ~4s segments, listed in an m3u8 playlist.
+    """
+    out = tmp_path_factory.mktemp("live")
+    a, b = BURST
+    cmd = [
+        "ffmpeg", "-nostdin", "-v", "error",
+        "-f", "lavfi", "-i", f"color=gray:s=320x180:r=30:d={STREAM_SEC}",
+        "-f", "lavfi", "-i", f"anoisesrc=color=pink:amplitude=0.5:d={STREAM_SEC}",
+        "-vf", f"noise=alls=100:allf=t:enable='between(t,{a},{b})'",
+        "-af", f"volume='if(between(t,{a},{b}),1,0.02)':eval=frame",
+        "-c:v", "libx264", "-preset", "ultrafast",
+        "-force_key_frames", f"expr:gte(t,n_forced*{SEGMENT_SEC})",
+        "-c:a", "aac",
+        "-f", "segment", "-segment_time", str(SEGMENT_SEC), "-reset_timestamps", "1",
+        "-segment_list", str(out / "full.m3u8"), "-segment_list_type", "m3u8",
+        str(out / "seg_%03d.mp4"),
+    ]  # fmt: skip
+    subprocess.run(cmd, check=True)
+    return str(out / "full.m3u8")
+
+
+def _write_playlist(
+    path: str, seq: int, entries: List[Tuple[float, str]], ended: bool = False
+) -> None:
+    lines = ["#EXTM3U", f"#EXT-X-MEDIA-SEQUENCE:{seq}"]
+    for dur, uri in entries:
+        lines += [f"#EXTINF:{dur:.6f},", uri]
+    if ended:
+        lines.append("#EXT-X-ENDLIST")
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("\n".join(lines) + "\n")
+
+
+def test_parse_playlist(stream: str) -> None:
+    seq, entries, ended = parse_playlist(stream)
+
+    assert seq == 0 and ended
+    assert len(entries) >= STREAM_SEC // SEGMENT_SEC - 1
+    assert sum(d for d, _ in entries) == pytest.approx(STREAM_SEC, abs=1.5)
+    for _, uri in entries:
+        assert os.path.exists(os.path.join(os.path.dirname(stream), uri))
+
+
+def test_parse_playlist_missing(tmp_path) -> None:
+    assert parse_playlist(str(tmp_path / "nope.m3u8")) == (0, [], False)
+
+
+def test_segment_watcher_follows_a_sliding_playlist(stream: str) -> None:
+    _, entries, _ = parse_playlist(stream)
+    durs = [d for d, _ in entries]
+    live = os.path.join(os.path.dirname(stream), "live.m3u8")
+    watcher = SegmentWatcher(live, keep=4)
+
+    # the newest entry may still be written; it is held back
+    _write_playlist(live, 0, entries[:3])
+    assert [s.seq for s in watcher.poll()] == [0, 1]
+    assert watcher.poll() == []
+
+    _write_playlist(live, 0, entries[:6])
+    new = watcher.poll()
+    assert [s.seq for s in new] == [2, 3, 4]
+    assert new[0].start_sec == pytest.approx(sum(durs[:2]))
+    assert new[0].path == os.path.join(os.path.dirname(stream), entries[2][1])
+
+    # the window slid past segment 5 before we looked; the clock skips it
+    _write_playlist(live, 6, entries[6:9])
+    new = watcher.poll()
+    assert [s.seq for s in new] == [6, 7]
+    assert new[0].start_sec == pytest.approx(sum(durs[:5]) + SEGMENT_SEC)
+
+    _write_playlist(live, 6, entries[6:], ended=True)
+    new = watcher.poll()
+    assert watcher.ended
+    assert [s.seq for s in new] == list(range(8, len(entries)))
+    assert [s.seq for s in watcher.recent] == list(
+        range(len(entries) - 4, len(entries))
+    )
+
+
+def test_live_scorer_fires_once_on_the_burst(stream: str) -> None:
+    watcher = SegmentWatcher(stream, keep=len(parse_playlist(stream)[1]))
+    scorer = LiveScorer(window_sec=8, ring_sec=120, cooldown_sec=300)
+
+    cuts = []
+    for seg in watcher.poll():
+        cut = scorer.add_segment(seg)
+        if cut:
+            cuts.append(cut)
+
+    assert scorer.seconds == pytest.approx(STREAM_SEC, abs=1)
+    assert len(cuts) == 1
+    start, dur, score = cuts[0]
+    assert dur == 8 and score >= scorer.threshold
+    assert BURST[0] <= start and start + dur <= BURST[1]
+
+    segs = watcher.covering(start, start + dur)
+    assert segs[0].start_sec <= start
+    assert segs[-1].start_sec + segs[-1].duration_sec >= start + dur
+
+
+def test_live_scorer_rebases_over_dropped_segments(monkeypatch) -> None:
+    sr = live.ANALYSIS_SR
+    monkeypatch.setattr(
+        live,
+        "iter_ffmpeg_pcm",
+        lambda path, sr: iter([np.full(SEGMENT_SEC * sr, 0.1, dtype=np.float32)]),
+    )
+    monkeypatch.setattr(
+        live, "frame_diffs", lambda path, max_sec, prev: (np.zeros(0), 0, None, 0)
+    )
+    scorer = LiveScorer(window_sec=8, ring_sec=120)
+    # segment 2 was dropped from the playlist before the watcher saw it
+    for seq in (0, 1, 3):
+        start = float(seq * SEGMENT_SEC)
+        scorer.add_segment(Segment(seq, f"{seq}.ts", start, float(SEGMENT_SEC)))
+
+    assert scorer.seconds == pytest.approx(4 * SEGMENT_SEC, abs=1)
+    # the ring stays contiguous on stream time, so first == 0 still holds
+    assert scorer.seconds - len(scorer.audio) == 0
@@ -0,0 +1,26 @@
+from src.render_pool import THREADS_PER_JOB_HINT, plan
+
+
+def test_plan_splits_the_budget():
+    assert plan(budget=32, jobs=4) == (4, 8)
+    assert plan(budget=10, jobs=3) == (3, 3)
+
+
+def test_plan_defaults_to_one_job_per_hint(monkeypatch):
+    monkeypatch.delenv("RENDER_JOBS", raising=False)
+    monkeypatch.delenv("RENDER_THREAD_BUDGET", raising=False)
+    assert plan(budget=4 * THREADS_PER_JOB_HINT) == (4, THREADS_PER_JOB_HINT)
+    assert plan(budget=THREADS_PER_JOB_HINT - 1) == (1, THREADS_PER_JOB_HINT - 1)
+
+
+def test_plan_clamps_jobs_to_the_budget():
+    assert plan(budget=2, jobs=8) == (2, 1)
+    assert plan(budget=1, jobs=1) == (1, 1)
+
+
+def test_plan_reads_env(monkeypatch):
+    monkeypatch.setenv("RENDER_THREAD_BUDGET", "12")
+    monkeypatch.setenv("RENDER_JOBS", "2")
+    assert plan() == (2, 6)
+    # explicit arguments win
+    assert plan(budget=8, jobs=4) == (4, 2)
@@ -0,0 +1,127 @@
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from src import scheduler, twitch_client
+from src.scheduler import RunQueue, _poll_new_content
+from src.utils import write_json
+
+
+def test_get_returns_due_entries_in_not_before_order() -> None:
+    q = RunQueue()
+    now = time.time()
+    q.put("b", "poll", not_before=now - 1)
+    q.put("a", "stream.offline", not_before=now - 5)
+    q.put("", "interval", not_before=now - 3)
+
+    assert [q.get(timeout=0) for _ in range(3)] == [
+        ("a", "stream.offline"),
+        ("", "interval"),
+        ("b", "poll"),
+    ]
+    assert len(q) == 0
+    assert q.get(timeout=0.05) is None
+
+
+def test_one_entry_per_broadcaster_keeps_the_earliest() -> None:
+    q = RunQueue()
+    now = time.time()
+    q.put("a", "poll", not_before=now + 60)
+    q.put("a", "stream.offline", not_before=now - 1)
+    q.put("a", "poll again", not_before=now + 120)
+
+    assert len(q) == 1
+    assert q.get(timeout=0) == ("a", "stream.offline")
+
+
+def test_deferred_broadcaster_does_not_hold_up_others() -> None:
+    q = RunQueue()
+    # rate-capped: the scheduler puts the run back with a later not_before
+    q.put("capped", "stream.offline", not_before=time.time() + 0.4)
+    q.put("free", "poll")
+
+    assert q.get(timeout=0) == ("free", "poll")
+    assert q.get(timeout=0.05) is None  # not due yet, and still queued
+    assert len(q) == 1
+
+    t0 = time.time()
+    assert q.get(timeout=5) == ("capped", "stream.offline")
+    assert 0.2 < time.time() - t0 < 2
+
+
+def test_put_wakes_a_waiting_get() -> None:
+    q = RunQueue()
+    threading.Timer(0.1, q.put, args=("a", "stream.offline")).start()
+
+    t0 = time.time()
+    assert q.get(timeout=5) == ("a", "stream.offline")
+    assert time.time() - t0 < 2
+
+
+class FakeTwitch:
+    live: set = set()
+    vods: dict = {}
+
+    def __init__(self, *_args) -> None:
+        pass
+
+    def get_live_stream(self, user_id: str) -> dict:
+        return {"user_id": user_id, "type": "live"} if user_id in self.live else {}
+
+    def get_latest_vods(self, broadcaster_id: str, limit: int = 5) -> list:
+        return [{"id": v} for v in self.vods.get(broadcaster_id, [])[:limit]]
+
+
+@pytest.fixture
+def poll_env(monkeypatch, tmp_path):
+    monkeypatch.setattr(twitch_client, "TwitchClient", FakeTwitch)
+    monkeypatch.setattr(scheduler, "MODE", "vods")
+    FakeTwitch.live, FakeTwitch.vods = set(), {}
+    return SimpleNamespace(
+        twitch_client_id="id",
+        twitch_client_secret="secret",
+        broadcaster_ids=["a", "b"],
+        node_count=1,
+        cache_dir=str(tmp_path),
+    )
+
+
+def _drain(q: RunQueue) -> list:
+    out = []
+    while True:
+        item = q.get(timeout=0)
+        if item is None:
+            return out
+        out.append(item[0])
+
+
+def test_poll_skips_live_broadcasters(poll_env) -> None:
+    FakeTwitch.vods = {"a": ["v-recording"], "b": ["v-done"]}
+    FakeTwitch.live = {"a"}
+    q, seen = RunQueue(), {}
+
+    _poll_new_content(poll_env, q, seen)
+    assert _drain(q) == ["b"]
+
+    # once a goes offline its now-complete VOD is picked up
+    FakeTwitch.live = set()
+    _poll_new_content(poll_env, q, seen)
+    assert _drain(q) == ["a"]
+
+
+def test_poll_queues_new_ids_once_and_prunes_seen(poll_env) -> None:
+    write_json(f"{poll_env.cache_dir}/state.json", {"used_vods": ["v0"]})
+    FakeTwitch.vods = {"a": ["v0"], "b": ["v1"]}
+    q, seen = RunQueue(), {}
+
+    _poll_new_content(poll_env, q, seen)
+    assert _drain(q) == ["b"]
+    _poll_new_content(poll_env, q, seen)
+    assert _drain(q) == []  # already queued once
+
+    FakeTwitch.vods = {"a": ["v0"], "b": ["v2"]}
+    _poll_new_content(poll_env, q, seen)
+    assert _drain(q) == ["b"]
+    assert seen == {"a": set(), "b": {"v2"}}
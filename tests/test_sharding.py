@@ -0,0 +1,109 @@
+import os
+from collections import Counter
+from types import SimpleNamespace
+
+import pytest
+
+from src.sharding import (
+    HashRing,
+    job_state_paths,
+    moved,
+    owned_broadcasters,
+    state_path_for,
+)
+
+IDS = [str(10_000_000 + i * 7919) for i in range(1000)]
+
+
+@pytest.mark.parametrize("nodes", [1, 2, 3, 4, 7])
+def test_every_broadcaster_has_exactly_one_owner(nodes: int) -> None:
+    owned = [owned_broadcasters(IDS, n, nodes) for n in range(nodes)]
+
+    counts = Counter(b for part in owned for b in part)
+    assert set(counts) == set(IDS)
+    assert set(counts.values()) == {1}
+    for part in owned:
+        # configured order is kept, and load is roughly even
+        assert part == [b for b in IDS if b in set(part)]
+        assert len(part) == pytest.approx(len(IDS) / nodes, rel=0.35)
+
+
+def test_assignment_is_deterministic() -> None:
+    a, b = HashRing(5), HashRing(5)
+    assert [a.owner(k) for k in IDS] == [b.owner(k) for k in IDS]
+
+
+@pytest.mark.parametrize("nodes", [1, 2, 3, 4, 6])
+def test_adding_a_node_moves_about_one_share(nodes: int) -> None:
+    moves = moved(IDS, nodes, nodes + 1)
+
+    # only keys landing on the new node's points move, ~1/(N+1) of them
+    assert len(moves) / len(IDS) == pytest.approx(1 / (nodes + 1), abs=0.05)
+    assert {m["to"] for m in moves.values()} == {nodes}
+
+
+def test_removing_the_last_node_only_moves_its_keys() -> None:
+    moves = moved(IDS, 4, 3)
+    assert set(moves) == set(owned_broadcasters(IDS, 3, 4))
+    assert {m["from"] for m in moves.values()} == {3}
+
+
+def test_state_paths(tmp_path) -> None:
+    ids = ["111", "222"]
+    single = SimpleNamespace(
+        node_count=1, cache_dir=str(tmp_path), shard_dir="", broadcaster_ids=ids
+    )
+    assert state_path_for(single, "111") == os.path.join(tmp_path, "state.json")
+    assert job_state_paths(single) == [os.path.join(tmp_path, "state.json")]
+
+    shard_dir = str(tmp_path / "shards")
+    sharded = SimpleNamespace(
+        node_count=3, cache_dir=str(tmp_path), shard_dir=shard_dir, broadcaster_ids=ids
+    )
+    assert state_path_for(sharded) == os.path.join(tmp_path, "state.json")
+    assert state_path_for(sharded, "111") == os.path.join(
+        shard_dir, "111", "state.json"
+    )
+    assert job_state_paths(sharded) == [
+        os.path.join(shard_dir, b, "state.json") for b in ids
+    ]
+
+
+def _node_settings(monkeypatch, tmp_path, node_id: int, nodes: int, ids):
+    from src.config import get_settings
+
+    monkeypatch.setenv("STREAMFLARE_CACHE_DIR", str(tmp_path / "cache"))
+    monkeypatch.setenv("STREAMFLARE_SHARD_DIR", str(tmp_path / "shared"))
+    monkeypatch.setenv("TWITCH_BROADCASTER_IDS", ",".join(ids))
+    monkeypatch.setenv("SHARD_NODE_COUNT", str(nodes))
+    monkeypatch.setenv("SHARD_NODE_ID", str(node_id))
+    return get_settings()
+
+
+def test_dedup_history_and_rate_cap_follow_a_moved_broadcaster(
+    monkeypatch, tmp_path
+) -> None:
+    from src import main, scheduler
+    from src.dedup import Fingerprint
+
+    monkeypatch.setenv("DEDUP_ENABLED", "true")
+    ids = IDS[:50]
+    bid, move = next(iter(moved(ids, 3, 4).items()))
+
+    old = _node_settings(monkeypatch, tmp_path, move["from"], 3, ids)
+    assert bid in old.broadcaster_ids
+    index = main._dedup_index(old, bid)
+    index.add("yt-1", Fingerprint(frames=[1, 2, 3]), "vod-9", 100.0, 160.0)
+    index.save()
+    scheduler._record_run(old, bid, 1234.5)
+
+    new = _node_settings(monkeypatch, tmp_path, move["to"], 4, ids)
+    assert bid in new.broadcaster_ids
+    assert new.cache_dir != old.cache_dir
+
+    dup = main._dedup_index(new, bid).find_source("vod-9", 110.0, 150.0)
+    assert dup is not None and dup["id"] == "yt-1"
+    assert scheduler._last_run(new, bid) == 1234.5
+    # other broadcasters do not see it
+    other = next(b for b in new.broadcaster_ids if b != bid)
+    assert main._dedup_index(new, other).find_source("vod-9", 110.0, 150.0) is None
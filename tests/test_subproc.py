@@ -0,0 +1,82 @@
+import sys
+import time
+
+import pytest
+
+from src.subproc import (
+    STDERR_TAIL_LINES,
+    StalledProcessError,
+    _Progress,
+    _with_progress,
+    run_tool,
+)
+
+
+def py(code: str):
+    return [sys.executable, "-c", code]
+
+
+def test_stalled_child_is_killed():
+    code = (
+        "import sys, time\n"
+        "print('warming up', file=sys.stderr, flush=True)\n"
+        "time.sleep(60)\n"
+    )
+    t0 = time.monotonic()
+    with pytest.raises(StalledProcessError) as e:
+        run_tool(py(code), "stall", stall_sec=1.0)
+    assert time.monotonic() - t0 < 30
+    assert "stall stalled" in str(e.value)
+    assert "warming up" in str(e.value)
+
+
+def test_failing_child_keeps_the_stderr_tail():
+    code = (
+        "import sys\n"
+        "print('out')\n"
+        "for i in range(500): print('err', i, file=sys.stderr)\n"
+        "sys.exit(3)\n"
+    )
+    r = run_tool(py(code), "fail", stall_sec=30.0)
+    assert r.returncode == 3
+    assert r.stdout == "out\n"
+    lines = r.stderr.splitlines()
+    assert len(lines) == STDERR_TAIL_LINES
+    assert lines[0] == f"err {500 - STDERR_TAIL_LINES}"
+    assert lines[-1] == "err 499"
+
+
+def test_ffmpeg_progress_blocks():
+    assert _with_progress(["ffmpeg", "-i", "x"], "ffmpeg")[:4] == [
+        "ffmpeg",
+        "-progress",
+        "pipe:1",
+        "-nostats",
+    ]
+    prog = _Progress("ffmpeg", total_sec=100.0)
+    block = ["frame=250", "out_time_us=25000000", "speed=2.5x", "total_size=1024"]
+    assert all(prog.feed(line + "\n") for line in block)
+    assert prog.ratio is None  # nothing until the block closes
+    assert prog.feed("progress=continue\n")
+    assert prog.ratio == pytest.approx(0.25)
+    assert prog.speed_x == pytest.approx(2.5)
+    assert prog.eta_sec == pytest.approx(30.0)
+    assert prog.describe() == "25% @ 2.50x ETA 30s"
+
+    marker = prog.marker
+    prog.feed("out_time_us=N/A\n")
+    prog.feed("speed=N/A\n")
+    prog.feed("progress=continue\n")
+    assert prog.marker == marker  # no new position, not counted as work
+
+    # ordinary output is not swallowed
+    assert not prog.feed("Input #0, mov,mp4 from 'x.mp4':\n")
+
+
+def test_ytdlp_progress_line():
+    prog = _Progress("ytdlp", total_sec=None)
+    assert prog.feed("[download]  42.5% of 1.00GiB at 3.20MiB/s ETA 01:05\n")
+    assert prog.ratio == pytest.approx(0.425)
+    assert prog.rate == "3.20MiB/s"
+    assert prog.eta_sec == 65.0
+    assert not prog.feed("[info] Downloading format 720p\n")
@@ -0,0 +1,121 @@
+import numpy as np
+import pytest
+
+from src import subtitles
+from src.subtitles import _merge_spans, _splice, _uncovered, _window
+
+
+def seg(start, end, text="x"):
+    return {"start": start, "end": end, "text": text}
+
+
+def test_merge_spans_joins_overlapping_and_touching():
+    assert _merge_spans([[5, 8], [0, 2], [2, 3], [7, 10]]) == [[0, 3], [5, 10]]
+    assert _merge_spans([]) == []
+
+
+def test_uncovered_returns_gaps_inside_the_window():
+    spans = [[0, 10], [20, 30], [50, 60]]
+    assert _uncovered(spans, 5, 40) == [(10, 20), (30, 40)]
+    assert _uncovered(spans, 0, 10) == []
+    assert _uncovered([], 3, 7) == [(3, 7)]
+    assert _uncovered(spans, 35, 55) == [(35, 50)]
+
+
+def test_splice_keeps_a_phrase_running_into_the_gap():
+    cached = [seg(0, 4, "old a"), seg(8.5, 11, "cut at boundary")]
+    # re-transcribed [10 - pad, 20 + pad]: the phrase starting at 8.5 now runs on
+    new = [seg(8.5, 12, "whole phrase"), seg(13, 15, "inside"), seg(21, 22, "pad")]
+    out = _splice(cached, new, 10, 20)
+    assert [s["text"] for s in out] == ["old a", "whole phrase", "inside"]
+
+
+def test_window_clips_and_rebases():
+    segments = [seg(0, 4), seg(9, 12, "a"), seg(15, 16, "b"), seg(19, 25, "c")]
+    assert _window(segments, 10, 20) == [
+        seg(0, 2, "a"),
+        seg(5, 6, "b"),
+        seg(9, 10, "c"),
+    ]
+
+
+def test_transcribe_range_fills_only_the_gap(tmp_path, monkeypatch):
+    calls = []
+
+    def fake_span(path, start, end):
+        calls.append((start, end))
+        return [seg(start + 1, end - 1, f"{start:g}")], end - start
+
+    monkeypatch.setattr(subtitles, "_transcribe_span", fake_span)
+    srt = str(tmp_path / "out.srt")
+    cache = str(tmp_path / "cache")
+    subtitles.transcribe_range_to_srt("v.mp4", 0, 20, srt, cache, source_key="k")
+    subtitles.transcribe_range_to_srt("v.mp4", 10, 20, srt, cache, source_key="k")
+    pad = subtitles.CONTEXT_PAD_SEC
+    assert calls == [(0.0, 20 + pad), (20 - pad, 30 + pad)]
+
+
+def test_transcribe_pcm_maps_times_back_across_the_join(monkeypatch):
+    sr = subtitles.WHISPER_SR
+    pcm = np.zeros(10 * sr, dtype=np.float32)
+    monkeypatch.setattr(subtitles, "speech_regions", lambda pcm, sr: [(1, 3), (6, 7)])
+    stitched = []
+
+    def fake_whisper(audio):
+        stitched.append(audio.size / sr)
+        # stitched timeline: region 1 at [0, 2), join [2, 2.3), region 2 [2.3, 3.3)
+        return [
+            {"start": 0.5, "end": 1.5, "text": " one "},
+            {"start": 2.1, "end": 2.8, "text": "two"},
+            {"start": 2.4, "end": 3.3, "text": "three"},
+        ]
+
+    monkeypatch.setattr(subtitles, "_whisper", fake_whisper)
+    segments, speech_sec = subtitles._transcribe_pcm(pcm, offset=100.0, vad=True)
+
+    assert stitched == [pytest.approx(2 + subtitles.VAD_JOIN_SEC + 1)]
+    assert speech_sec == pytest.approx(3.0)
+    assert segments == [
+        seg(101.5, 102.5, "one"),
+        # starts in the join: clamped to the end of region 1
+        seg(103.0, 106.5, "two"),
+        seg(106.1, 107.0, "three"),
+    ]
+
+
+def test_transcribe_pcm_without_speech_skips_whisper(monkeypatch):
+    monkeypatch.setattr(subtitles, "speech_regions", lambda pcm, sr: [])
+    monkeypatch.setattr(subtitles, "_whisper", lambda audio: pytest.fail("called"))
+    pcm = np.zeros(subtitles.WHISPER_SR, dtype=np.float32)
+    assert subtitles._transcribe_pcm(pcm, vad=True) == ([], 0.0)
+
+
+def test_int8_matches_fp32_on_a_linear_stack():
+    torch = pytest.importorskip("torch")
+
+    class CastLinear(torch.nn.Linear):
+        # like whisper.model.Linear: a subclass that quantize_dynamic won't match
+        def forward(self, x):
+            return super().forward(x)
+
+    torch.manual_seed(0)
+    fp32 = torch.nn.Sequential(
+        CastLinear(64, 128),
+        torch.nn.ReLU(),
+        CastLinear(128, 16),
+        torch.nn.Linear(16, 8),
+    ).eval()
+    x = torch.randn(32, 64)
+    with torch.no_grad():
+        want = fp32(x)
+        int8 = subtitles._quantize_int8(fp32)
+        got = int8(x)
+
+    quantized = torch.ao.nn.quantized.dynamic.Linear
+    assert all(isinstance(int8[i], quantized) for i in (0, 2, 3))
+    # the fp32 model is left as it was
+    assert type(fp32[0]) is CastLinear
+    with torch.no_grad():
+        assert torch.equal(fp32(x), want)
+    err = (got - want).abs().max() / want.abs().max()
+    assert float(err) < 0.05